@@ -627,18 +627,14 @@ def check_documentation(proj_object, filename, lines):
 def create_dev_table(proj_object, filename):
     # Build developer table
 
-    diffs = (
-        Diff.objects.all()
-        .filter(commit__project=proj_object, file_path=filename)
-        .all()
-    )
+    # diffs of the file under all its names
+    diffs = Diff.file_history(proj_object, filename)
 
     #compute lines of code for each author
     author_loc = {}
     for d in diffs:
-        body = d.body
         author = d.commit.author
-        loc_count = body.count("\n+") + body.count("\n-")
+        loc_count = d.loc_count
         if author in author_loc:
             author_loc[author] += loc_count
         else:
@@ -1125,10 +1121,8 @@ def archeology(request, *args, **kwargs):
     if request.GET.get("filename"):
         filename = request.GET.get("filename")
 
-    # Get diffs for file
-    diffs = (
-        Diff.objects.all().filter(commit__project=pr.project, file_path=filename).all()
-    )
+    # Get diffs for file, under all its names
+    diffs = Diff.file_history(pr.project, filename)
 
     # Get commits, authors for those (diffs)
     authors = set([d.commit.author for d in diffs])
@@ -1341,9 +1335,8 @@ def diffCommitData(request):
     )
 
     for d in diffs:
-        body = d.body
         author = d.commit.author
-        loc_count = body.count("\n+") + body.count("\n-")
+        loc_count = d.loc_count
         if author in author_loc:
             author_loc[author] += loc_count
             author_filenames[author].append(d.file_path)
@@ -2909,17 +2902,13 @@ def file_explorer_function(project_object, branch, filename):
 
     # Build developer table
 
-    diffs = (
-        Diff.objects.all()
-        .filter(commit__project=project_object, file_path=filename)
-        .all()
-    )
+    # diffs of the file under all its names
+    diffs = Diff.file_history(project_object, filename)
     author_loc = {}
 
     for d in diffs:
-        body = d.body
         author = d.commit.author
-        loc_count = body.count("\n+") + body.count("\n-")
+        loc_count = d.loc_count
         if author in author_loc:
             author_loc[author] += loc_count
         else:
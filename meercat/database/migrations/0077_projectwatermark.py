@@ -0,0 +1,49 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("database", "0076_project_code_quality_library_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("ref", models.CharField(max_length=255)),
+                ("sha", models.CharField(max_length=64)),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="database.project",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "project watermark",
+                "verbose_name_plural": "project watermarks",
+                "db_table": "project_watermark",
+                "ordering": ["id"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="projectwatermark",
+            constraint=models.UniqueConstraint(
+                fields=("project", "ref"), name="unique_project_watermark"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("database", "0077_projectwatermark"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="diff",
+            name="lines_added",
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="diff",
+            name="lines_removed",
+            field=models.IntegerField(null=True),
+        ),
+    ]
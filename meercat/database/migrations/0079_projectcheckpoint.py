@@ -0,0 +1,47 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("database", "0078_diff_lines_added_diff_lines_removed"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sha", models.CharField(max_length=64, null=True)),
+                ("commits", models.IntegerField(default=0)),
+                ("tips", models.JSONField(default=dict)),
+                ("watermarks", models.JSONField(null=True)),
+                ("since", models.CharField(max_length=64, null=True)),
+                ("until", models.CharField(max_length=64, null=True)),
+                (
+                    "project",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="database.project",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "project checkpoint",
+                "verbose_name_plural": "project checkpoints",
+                "db_table": "project_checkpoint",
+                "ordering": ["id"],
+            },
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("database", "0079_projectcheckpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="File",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="database.project",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "file",
+                "verbose_name_plural": "files",
+                "db_table": "file",
+                "ordering": ["id"],
+            },
+        ),
+        migrations.CreateModel(
+            name="FilePath",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("path", models.FilePathField(max_length=256)),
+                (
+                    "file",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="paths",
+                        to="database.file",
+                    ),
+                ),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="database.project",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "file path",
+                "verbose_name_plural": "file paths",
+                "db_table": "file_path",
+                "ordering": ["id"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="filepath",
+            constraint=models.UniqueConstraint(
+                fields=("project", "path"), name="unique_file_path"
+            ),
+        ),
+        migrations.AddField(
+            model_name="diff",
+            name="file",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="database.file",
+            ),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+def dedupe(table, columns, keep):
+    # Rows stored twice before the key existed (e.g. a comment edited between two
+    # runs) are removed, keeping the first link or the last version of the row.
+    # The derived table lets MySQL delete from the table it selects from.
+    first = columns.split(',')[0]
+    return migrations.RunSQL(
+        f"delete from {table} where {first} is not null and id not in "
+        f"(select id from (select {keep}(id) as id from {table} where {first} is not null group by {columns}) as keep_rows)",
+        reverse_sql=migrations.RunSQL.noop,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("database", "0080_file_filepath_diff_file"),
+    ]
+
+    operations = [
+        dedupe("milestone", "issue_id", "max"),
+        migrations.AddConstraint(
+            model_name="milestone",
+            constraint=models.UniqueConstraint(
+                fields=("issue",), name="unique_issue_milestone"
+            ),
+        ),
+        dedupe("milestone", "pr_id", "max"),
+        migrations.AddConstraint(
+            model_name="milestone",
+            constraint=models.UniqueConstraint(
+                fields=("pr",), name="unique_pr_milestone"
+            ),
+        ),
+        dedupe("pr_has_commit", "pr_id, commit_id", "min"),
+        migrations.AddConstraint(
+            model_name="pullrequestcommit",
+            constraint=models.UniqueConstraint(
+                fields=("pr", "commit"), name="unique_pr_commit"
+            ),
+        ),
+        dedupe("issue_has_label", "issue_id, label_id", "min"),
+        migrations.AddConstraint(
+            model_name="issuelabel",
+            constraint=models.UniqueConstraint(
+                fields=("issue", "label"), name="unique_issue_label"
+            ),
+        ),
+        dedupe("issue_has_assignee", "issue_id, assignee_id", "min"),
+        migrations.AddConstraint(
+            model_name="issueassignee",
+            constraint=models.UniqueConstraint(
+                fields=("issue", "assignee"), name="unique_issue_assignee"
+            ),
+        ),
+        dedupe("pr_has_label", "pr_id, label_id", "min"),
+        migrations.AddConstraint(
+            model_name="pullrequestlabel",
+            constraint=models.UniqueConstraint(
+                fields=("pr", "label"), name="unique_pr_label"
+            ),
+        ),
+        dedupe("pr_has_assignee", "pr_id, assignee_id", "min"),
+        migrations.AddConstraint(
+            model_name="pullrequestassignee",
+            constraint=models.UniqueConstraint(
+                fields=("pr", "assignee"), name="unique_pr_assignee"
+            ),
+        ),
+        dedupe("comment", "issue_id, author_id, created_at", "max"),
+        migrations.AddConstraint(
+            model_name="comment",
+            constraint=models.UniqueConstraint(
+                fields=("issue", "author", "created_at"), name="unique_issue_comment"
+            ),
+        ),
+        dedupe("comment", "pr_id, author_id, created_at", "max"),
+        migrations.AddConstraint(
+            model_name="comment",
+            constraint=models.UniqueConstraint(
+                fields=("pr", "author", "created_at"), name="unique_pr_comment"
+            ),
+        ),
+        dedupe("pr_has_issue", "pr_id, issue_id", "min"),
+        migrations.AddConstraint(
+            model_name="pullrequestissue",
+            constraint=models.UniqueConstraint(
+                fields=("pr", "issue"), name="unique_pr_issue"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="issue",
+            constraint=models.UniqueConstraint(
+                fields=("url",), name="unique_issue_url"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="pullrequest",
+            constraint=models.UniqueConstraint(
+                fields=("url",), name="unique_pr_url"
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("database", "0081_unique_pr_issue_keys"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(
+                fields=["username", "email"], name="author_username_email_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(
+                fields=["username", "url"], name="author_username_url_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="commit",
+            index=models.Index(fields=["hash"], name="commit_hash_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="commit",
+            index=models.Index(
+                fields=["project", "datetime"], name="commit_project_datetime_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="diff",
+            index=models.Index(
+                fields=["file_path", "commit"], name="diff_file_path_commit_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="eventactor",
+            index=models.Index(
+                fields=["login", "url", "actor_id"], name="event_actor_login_url_idx"
+            ),
+        ),
+    ]
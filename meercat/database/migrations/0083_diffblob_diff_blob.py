@@ -0,0 +1,62 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("database", "0082_ingest_lookup_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DiffBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hash", models.CharField(max_length=64, unique=True)),
+                ("data", models.BinaryField()),
+                ("size", models.IntegerField()),
+            ],
+            options={
+                "verbose_name": "diff blob",
+                "verbose_name_plural": "diff blobs",
+                "db_table": "diff_blob",
+                "ordering": ["id"],
+            },
+        ),
+        migrations.AddField(
+            model_name="diff",
+            name="blob",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                to="database.diffblob",
+            ),
+        ),
+        # Diff.body is now a property that also reads compressed bodies; the
+        # column keeps its name, so only the model state changes
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RenameField(
+                    model_name="diff",
+                    old_name="body",
+                    new_name="raw_body",
+                ),
+                migrations.AlterField(
+                    model_name="diff",
+                    name="raw_body",
+                    field=models.TextField(db_column="body"),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("database", "0083_diffblob_diff_blob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectSync",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("resource", models.CharField(max_length=16)),
+                ("updated_at", models.DateTimeField()),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="database.project",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "project sync",
+                "verbose_name_plural": "project syncs",
+                "db_table": "project_sync",
+                "ordering": ["id"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="projectsync",
+            constraint=models.UniqueConstraint(
+                fields=("project", "resource"), name="unique_project_sync"
+            ),
+        ),
+    ]
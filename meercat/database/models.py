@@ -1,4 +1,5 @@
 from random import choices
+import zlib
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
@@ -85,6 +86,10 @@ class Author(models.Model):
         ordering = ['id']
         verbose_name = 'author'
         verbose_name_plural = 'authors'
+        indexes = [
+            models.Index(fields=['username', 'email'], name='author_username_email_idx'),
+            models.Index(fields=['username', 'url'], name='author_username_url_idx'),
+        ]
         
     def __str__(self):
         if self.username:
@@ -248,26 +253,181 @@ class Commit(models.Model):
         ordering = ['id']
         verbose_name = 'commit'
         verbose_name_plural ='commits'
+        indexes = [
+            models.Index(fields=['hash'], name='commit_hash_idx'),
+            models.Index(fields=['project', 'datetime'], name='commit_project_datetime_idx'),
+        ]
 
     def __str__(self):
         return f'Commit {self.hash}'
 
+class ProjectWatermark(models.Model):
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    ref = models.CharField(max_length=255)
+    sha = models.CharField(max_length=64)
+
+    class Meta:
+        db_table = 'project_watermark'
+        ordering = ['id']
+        verbose_name = 'project watermark'
+        verbose_name_plural = 'project watermarks'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['project', 'ref'], name='unique_project_watermark'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.project} {self.ref} at {self.sha}'
+
+class ProjectCheckpoint(models.Model):
+    project = models.OneToOneField(Project, on_delete=models.CASCADE)
+    sha = models.CharField(max_length=64, null=True)
+    commits = models.IntegerField(default=0)
+    tips = models.JSONField(default=dict)
+    watermarks = models.JSONField(null=True)
+    since = models.CharField(max_length=64, null=True)
+    until = models.CharField(max_length=64, null=True)
+
+    class Meta:
+        db_table = 'project_checkpoint'
+        ordering = ['id']
+        verbose_name = 'project checkpoint'
+        verbose_name_plural = 'project checkpoints'
+
+    def __str__(self):
+        return f'{self.project} mined up to {self.sha}'
+
+class ProjectSync(models.Model):
+    # the PRs or issues of the project updated up to updated_at are stored (see db_interface --add_prs/--add_issues)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    resource = models.CharField(max_length=16)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'project_sync'
+        ordering = ['id']
+        verbose_name = 'project sync'
+        verbose_name_plural = 'project syncs'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['project', 'resource'], name='unique_project_sync'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.project} {self.resource} synced up to {self.updated_at}'
+
+class File(models.Model):
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = 'file'
+        ordering = ['id']
+        verbose_name = 'file'
+        verbose_name_plural = 'files'
+
+    def __str__(self):
+        return f'File {self.id} of {self.project}'
+
+class FilePath(models.Model):
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    path = models.FilePathField(max_length=256)
+    file = models.ForeignKey(File, on_delete=models.CASCADE, related_name='paths')
+
+    class Meta:
+        db_table = 'file_path'
+        ordering = ['id']
+        verbose_name = 'file path'
+        verbose_name_plural = 'file paths'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['project', 'path'], name='unique_file_path'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.path} is file {self.file_id}'
+
+class DiffBlob(models.Model):
+    # sha256 of the uncompressed body, so identical bodies (cherry-picks, forks) are stored once
+    hash = models.CharField(max_length=64, unique=True)
+    data = models.BinaryField()
+    size = models.IntegerField()
+
+    class Meta:
+        db_table = 'diff_blob'
+        ordering = ['id']
+        verbose_name = 'diff blob'
+        verbose_name_plural = 'diff blobs'
+
+    def __str__(self):
+        return f'Diff blob {self.hash}'
+
+    @property
+    def text(self):
+        return zlib.decompress(bytes(self.data)).decode('utf-8')
+
+class DiffManager(models.Manager):
+    def get_queryset(self):
+        # compressed bodies are read with their diffs instead of one query per diff
+        return super().get_queryset().select_related('blob')
+
 class Diff(models.Model):
     file_path = models.FilePathField(max_length=256)
     language = models.CharField(max_length=64)
-    body = models.TextField()
+    # empty if the body is compressed in blob, use body to read either
+    raw_body = models.TextField(db_column='body')
     header = models.TextField(null=True)
+    lines_added = models.IntegerField(null=True)
+    lines_removed = models.IntegerField(null=True)
     commit = models.ForeignKey(Commit, on_delete=models.CASCADE)
+    file = models.ForeignKey(File, on_delete=models.SET_NULL, null=True)
+    blob = models.ForeignKey(DiffBlob, on_delete=models.PROTECT, null=True)
+
+    objects = DiffManager()
 
     class Meta:
         db_table = 'diff'
         ordering = ['id']
         verbose_name = 'diff'
         verbose_name_plural ='diffs'
+        indexes = [
+            models.Index(fields=['file_path', 'commit'], name='diff_file_path_commit_idx'),
+        ]
 
     def __str__(self):
         return f'Diff {self.file_path}'
 
+    @property
+    def body(self):
+        if self.blob_id is not None:
+            return self.blob.text
+        return self.raw_body
+
+    @property
+    def loc_count(self):
+        # the body may be cut off or empty (numstat mining), the counts are complete
+        if self.lines_added is not None and self.lines_removed is not None:
+            return self.lines_added + self.lines_removed
+        return self.body.count("\n+") + self.body.count("\n-")
+
+    @staticmethod
+    def file_history(project, paths):
+        '''
+            Diffs of the files at the given path (or list of paths) under all the names
+            they ever had, following renames through the file_path table.
+        '''
+        if isinstance(paths, str):
+            paths = [paths]
+        file_ids = FilePath.objects.filter(project=project, path__in=paths).values('file_id')
+        # diffs stored before the lineage was tracked have no file, match their paths
+        all_paths = FilePath.objects.filter(file_id__in=file_ids).values_list('path', flat=True)
+        return Diff.objects.filter(
+            models.Q(file_id__in=file_ids)
+            | models.Q(commit__project=project, file_path__in=set(paths) | set(all_paths))
+        )
+
 class Label(models.Model):
     name = models.CharField(max_length=256)
 
@@ -303,6 +463,11 @@ class Issue(models.Model):
         ordering = ['id']
         verbose_name = 'issue'
         verbose_name_plural = 'issues'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['url'], name='unique_issue_url'
+            )
+        ]
 
     def __str__(self):
         return f'Issue #{self.number}: {self.title}'
@@ -344,6 +509,11 @@ class PullRequest(models.Model):
         ordering = ['id']
         verbose_name = 'pull request'
         verbose_name_plural = 'pull requests'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['url'], name='unique_pr_url'
+            )
+        ]
 
     def __str__(self):
         if self.number and self.title:
@@ -377,6 +547,14 @@ class Milestone(models.Model):
         db_table = 'milestone'
         ordering = ['id']
         verbose_name = 'milestone'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['issue'], name='unique_issue_milestone'
+            ),
+            models.UniqueConstraint(
+                fields=['pr'], name='unique_pr_milestone'
+            )
+        ]
     
     def __str__(self):
         return f'Milestone {self.title}'
@@ -390,6 +568,11 @@ class PullRequestCommit(models.Model):
         ordering = ['id']
         verbose_name = 'pr has commit'
         verbose_name_plural = 'pr has commits'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['pr', 'commit'], name='unique_pr_commit'
+            )
+        ]
 
     def __str__(self):
         return f'{self.pr} has {self.commit}'
@@ -403,6 +586,11 @@ class IssueLabel(models.Model):
         ordering = ['id']
         verbose_name = 'issue has label'
         verbose_name_plural = 'issue has labels'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['issue', 'label'], name='unique_issue_label'
+            )
+        ]
 
     def __str__(self):
         return f'{self.issue} has {self.label}'
@@ -416,6 +604,11 @@ class IssueAssignee(models.Model):
         ordering = ['id']
         verbose_name = 'issue has assignee'
         verbose_name_plural = 'issue has assignees'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['issue', 'assignee'], name='unique_issue_assignee'
+            )
+        ]
 
     def __str__(self):
         return f'{self.issue} has {self.assignee}'
@@ -429,6 +622,11 @@ class PullRequestLabel(models.Model):
         ordering = ['id']
         verbose_name = 'pr has label'
         verbose_name_plural = 'pr has labels'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['pr', 'label'], name='unique_pr_label'
+            )
+        ]
 
     def __str__(self):
         return f'{self.pr} has {self.label}'
@@ -442,6 +640,11 @@ class PullRequestAssignee(models.Model):
         ordering = ['id']
         verbose_name = 'pr has assignee'
         verbose_name_plural = 'pr has assignees'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['pr', 'assignee'], name='unique_pr_assignee'
+            )
+        ]
 
     def __str__(self):
         return f'{self.pr} has {self.assignee}'
@@ -459,6 +662,14 @@ class Comment(models.Model):
         ordering = ['id']
         verbose_name = 'comment'
         verbose_name_plural = 'comments'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['issue', 'author', 'created_at'], name='unique_issue_comment'
+            ),
+            models.UniqueConstraint(
+                fields=['pr', 'author', 'created_at'], name='unique_pr_comment'
+            )
+        ]
 
     def __str__(self):
         return f'Comment by {self.author}'
@@ -481,6 +692,11 @@ class PullRequestIssue(models.Model):
         ordering = ['id']
         verbose_name = 'pull request has issue'
         verbose_name_plural = 'pull request has issues'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['pr', 'issue'], name='unique_pr_issue'
+            )
+        ]
 
 class EventRepo(models.Model):
     repo_id = models.IntegerField()
@@ -505,6 +721,9 @@ class EventActor(models.Model):
         ordering = ['id']
         verbose_name = 'event actor'
         verbose_name_plural = 'event actors'
+        indexes = [
+            models.Index(fields=['login', 'url', 'actor_id'], name='event_actor_login_url_idx'),
+        ]
 
 class EventOrg(models.Model):
     org_id = models.IntegerField()
@@ -1,3 +1,72 @@
+import importlib
+import sqlite3
+import unittest
+import zlib
+
 from django.test import TestCase
+from django.utils import timezone
+
+from .models import Author, Commit, Diff, DiffBlob, Project
 
 # Create your tests here.
+
+class DedupeTestCase(unittest.TestCase):
+    # the rows stored twice before migration 0081 added the unique keys
+    def setUp(self):
+        self.migration = importlib.import_module('database.migrations.0081_unique_pr_issue_keys')
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.execute('create table comment (id integer primary key, pr_id int, issue_id int, author_id int, created_at text, body text)')
+        self.connection.execute('create table pr_has_label (id integer primary key, pr_id int, label_id int)')
+
+    def tearDown(self):
+        self.connection.close()
+
+    def run_sql(self, operation):
+        self.connection.execute(operation.sql)
+        self.connection.commit()
+
+    def test_keep_last_comment(self):
+        self.connection.executemany('insert into comment (pr_id, issue_id, author_id, created_at, body) values (?, ?, ?, ?, ?)', [
+            (1, None, 1, '2021-03-01', 'First'),
+            (1, None, 2, '2021-03-01', 'Other author'),
+            (1, None, 1, '2021-03-01', 'First, edited'),
+            (None, 1, 1, '2021-03-01', 'Issue comment'),
+            (None, 1, 1, '2021-03-01', 'Issue comment, edited'),
+        ])
+        self.run_sql(self.migration.dedupe('comment', 'pr_id, author_id, created_at', 'max'))
+        # the issue comments are left to the issue_id pass
+        self.assertEqual(self.connection.execute('select id, body from comment order by id').fetchall(),
+                         [(2, 'Other author'), (3, 'First, edited'), (4, 'Issue comment'), (5, 'Issue comment, edited')])
+        self.run_sql(self.migration.dedupe('comment', 'issue_id, author_id, created_at', 'max'))
+        self.assertEqual(self.connection.execute('select id from comment order by id').fetchall(), [(2,), (3,), (5,)])
+
+    def test_keep_first_link(self):
+        self.connection.executemany('insert into pr_has_label (pr_id, label_id) values (?, ?)', [(1, 1), (1, 2), (1, 1), (2, 1), (1, 1)])
+        self.run_sql(self.migration.dedupe('pr_has_label', 'pr_id, label_id', 'min'))
+        self.assertEqual(self.connection.execute('select id, pr_id, label_id from pr_has_label order by id').fetchall(),
+                         [(1, 1, 1), (2, 1, 2), (4, 2, 1)])
+        # a second run of the migration finds nothing to remove
+        self.run_sql(self.migration.dedupe('pr_has_label', 'pr_id, label_id', 'min'))
+        self.assertEqual(self.connection.execute('select count(*) from pr_has_label').fetchone(), (3,))
+
+class DiffBodyTestCase(TestCase):
+    # bodies stored with db_interface --compress_diffs are in diff_blob
+    def setUp(self):
+        project = Project.objects.create(source_url='https://github.com/HPCL/test.git', name='test')
+        author = Author.objects.create(username='alice', email='alice@example.com')
+        self.commit = Commit.objects.create(hash='abc', datetime=timezone.now(), project=project, message='Add hello', author=author, branch='main')
+
+    def test_body(self):
+        text = '@@ -0,0 +1,2 @@\n+def hello():\n+    print("h\u00e9llo")'
+        data = text.encode('utf-8')
+        blob = DiffBlob.objects.create(hash='0' * 64, data=zlib.compress(data), size=len(data))
+        Diff.objects.create(file_path='hello.py', language='PLACEHOLDER', raw_body='', commit=self.commit, blob=blob)
+        Diff.objects.create(file_path='README.md', language='PLACEHOLDER', raw_body='+# Test', commit=self.commit)
+
+        compressed, plain = Diff.objects.all()
+        self.assertEqual(compressed.raw_body, '')
+        self.assertEqual(compressed.body, text)
+        self.assertEqual(plain.body, '+# Test')
+        # the blobs are read with the diffs
+        with self.assertNumQueries(1):
+            self.assertEqual([diff.body for diff in Diff.objects.filter(commit=self.commit)], [text, '+# Test'])
@@ -0,0 +1,147 @@
+'''
+    Database connections for the ingestion scripts (db_interface) and the pattern fetcher.
+
+    Both use DB-API connections with MySQLdb's %s placeholders and MySQL's SQL dialect.
+    connect_mysql connects to the IDEAS MySQL server. connect_sqlite opens a local SQLite
+    file with the same schema (created by the MeerCat Django migrations, see database/README.md)
+    and translates the few MySQL-specific parts of the queries, so that a single project can
+    be mined and analyzed without a database server.
+'''
+
+import datetime
+import re
+import sqlite3
+
+# MySQL syntax -> SQLite syntax, applied to every query (see SQLiteCursor.translate)
+# "commit" is a keyword in SQLite and must be quoted as a table name
+COMMIT_TABLE = re.compile(r'(?<![.\w"])commit\b')
+UPSERT = re.compile(r'\bon duplicate key update\b', re.IGNORECASE)
+# only in the update part of an upsert: values(column) is the row that was not inserted
+UPSERT_VALUES = re.compile(r'\bvalues\((\w+)\)', re.IGNORECASE)
+UPSERT_IF = re.compile(r'\bif\(', re.IGNORECASE)
+
+# PRAGMAs of a connection opened for ingestion: no fsync per transaction (an interrupted
+# run is resumed from its checkpoint anyway), temporary tables and a large page cache in memory
+BULK_PRAGMAS = ['synchronous=OFF', 'temp_store=MEMORY', 'cache_size=-262144']
+
+
+def connect_mysql(host, port, user, password, database):
+    '''
+        Connects to a MySQL database. MySQLdb is only needed for this backend.
+    '''
+    import MySQLdb
+    return MySQLdb.connect(host=host, port=port, user=user, password=password, database=database, use_unicode=True, charset='utf8mb4')
+
+
+def connect_sqlite(path, bulk=False):
+    '''
+        Opens a SQLite database file in WAL mode, so the dashboard or a notebook can read it
+        while it is being written.
+        path: the database file, e.g. meercat/db.sqlite3
+        bulk: if True, set the BULK_PRAGMAS for fast ingestion
+    '''
+    return SQLiteConnection(path, bulk)
+
+
+def mysql_now():
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def parse_datetime(value):
+    # datetime columns are stored as text, e.g. '2021-03-01 10:00:00[.123456][+00:00]'
+    return datetime.datetime.fromisoformat(value.decode('utf-8'))
+
+
+class SQLiteCursor(object):
+    '''
+        Cursor of a SQLiteConnection, accepting the queries written for MySQLdb.
+    '''
+
+    # query -> translated query
+    translations = {}
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    @classmethod
+    def translate(cls, query):
+        if query not in cls.translations:
+            translated = COMMIT_TABLE.sub('"commit"', query.replace('%s', '?'))
+            match = UPSERT.search(translated)
+            if match:
+                update = UPSERT_VALUES.sub(r'excluded.\1', translated[match.end():])
+                update = UPSERT_IF.sub('iif(', update)
+                translated = translated[:match.start()] + 'on conflict do update set' + update
+            cls.translations[query] = translated
+        return cls.translations[query]
+
+    def execute(self, query, args=()):
+        self.cursor.execute(self.translate(query), tuple(args))
+        return self.cursor.rowcount
+
+    def executemany(self, query, args):
+        self.cursor.executemany(self.translate(query), [tuple(row) for row in args])
+        return self.cursor.rowcount
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    @property
+    def lastrowid(self):
+        return self.cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    def close(self):
+        self.cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SQLiteConnection(object):
+    '''
+        SQLite connection with the interface of a MySQLdb connection used by this package.
+    '''
+
+    dialect = 'sqlite'
+
+    def __init__(self, path, bulk=False):
+        sqlite3.register_converter('datetime', parse_datetime)
+        # the writer thread of a ThreadedSink uses the connection after the main thread
+        self.connection = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        self.connection.create_function('utc_timestamp', 0, mysql_now)
+        self.connection.create_function('now', 0, mysql_now)
+        self.connection.execute('pragma journal_mode=WAL')
+        if bulk:
+            for pragma in BULK_PRAGMAS:
+                self.connection.execute('pragma ' + pragma)
+        self.open = True
+
+    def cursor(self):
+        return SQLiteCursor(self.connection.cursor())
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        if self.open:
+            # update the statistics of the query planner after large inserts
+            self.connection.execute('pragma optimize')
+            self.connection.close()
+            self.open = False
@@ -1,12 +1,27 @@
 from os import kill
 from signal import alarm, signal, SIGALRM, SIGKILL
-from subprocess import PIPE, Popen
+from subprocess import DEVNULL, PIPE, Popen
+from tempfile import TemporaryFile
 
 
 class Alarm(Exception):
     pass
 
 
+class CommandError(Exception):
+    '''
+    A streamed command exited with an error, e.g. git log with a bad revision.
+    '''
+    def __init__(self, cmd, returncode, stderr):
+        super().__init__(cmd, returncode, stderr)
+        self.cmd = cmd
+        self.returncode = returncode
+        self.stderr = stderr
+
+    def __str__(self):
+        return '%s exited with %d: %s' % (self.cmd, self.returncode, self.stderr.decode('utf-8', errors='ignore').strip())
+
+
 class Command(object):
     def __init__(self, cmd):
         self.cmd = cmd
@@ -50,12 +65,12 @@ class Command(object):
             return 0, stdout, stderr
             
         p = Popen(self.cmd, shell = shell, cwd = cwd, stdin=PIPE, stdout = PIPE, stderr = PIPE, env = env)
-        if inputs: p.stdin.write(inputs)
         if timeout != -1:
             signal(SIGALRM, alarm_handler)
             alarm(timeout)
         try:
-            stdout, stderr = p.communicate()
+            # let communicate feed the input so large inputs cannot deadlock on a full stdout pipe
+            stdout, stderr = p.communicate(inputs if inputs else None)
             if timeout != -1:
                 alarm(0)
         except Alarm:
@@ -73,6 +88,39 @@ class Command(object):
             return -9, stdout, stderr + "Killed!"
         return p.returncode, stdout, stderr
     
+    def stream(self, cwd = None, shell = True, env = None, inputs = None):
+        '''
+        Run a command and yield its standard output one line at a time
+        (bytes, without the line terminator) while the process is still
+        running, so that the full output never has to be held in memory.
+        The inputs are written to stdin before reading, so they should be
+        consumed by the command before it starts writing (e.g. --stdin).
+        Raises CommandError with the standard error if the command fails, so a
+        failed command cannot pass for a short output.
+        '''
+        # a file rather than a pipe, so a command writing a lot to stderr cannot block
+        errors = TemporaryFile()
+        p = Popen(self.cmd, shell = shell, cwd = cwd, stdin = PIPE if inputs else DEVNULL, stdout = PIPE, stderr = errors, env = env)
+        if inputs:
+            p.stdin.write(inputs)
+            p.stdin.close()
+        try:
+            for line in p.stdout:
+                yield line.rstrip(b'\r\n')
+            if p.wait() != 0:
+                errors.seek(0)
+                raise CommandError(self.cmd, p.returncode, errors.read())
+        finally:
+            # the consumer may stop early, make sure the child does not linger
+            p.stdout.close()
+            if p.poll() is None:
+                try:
+                    kill(p.pid, SIGKILL)
+                except OSError:
+                    pass
+            p.wait()
+            errors.close()
+
     def get_process_children(self, pid):
         p = Popen('ps --no-headers -o pid --ppid %d' % pid, shell = True,
                   stdout = PIPE, stderr = PIPE)
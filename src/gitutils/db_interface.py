@@ -13,14 +13,21 @@ import shutil
 from urllib.parse import urlparse
 
 import arrow
-import MySQLdb
-import subprocess
 import json
 
+from .backends import connect_mysql, connect_sqlite
+from .command import Command
 from .gitcommand import GitCommand
+from .logparser import COMMIT_LIMIT, FILE_LIMIT, ThreadedSink
+from .mirror import MirrorCache
+from .scheduler import parse_tokens
+from .dimensions import DimensionCache
+from .writer import CommitWriter
+from .events import EventWriter
+from .export import ParquetExporter
+from .telemetry import SLOW_QUERY, Telemetry
 from .graphql_interface import fetch_prs, fetch_issues, Source
 from .github_api import GitHubAPIClient
-from .lib import flashx, bus_factor
 
 # Setup Logger
 logger = logging.getLogger('db_interface')
@@ -31,11 +38,27 @@ formatter = logging.Formatter(fmt="[%(levelname)s]: %(asctime)s - %(message)s")
 ch.setFormatter(fmt=formatter)
 logger.addHandler(hdlr=ch)
 
+# PRs and issues stored per round of upserts
+PAGE_SIZE = 100
+# stored as the due date of milestones without one and the closed date of open issues
+FAR_FUTURE = '9999-01-01 00:00:00'
+MILESTONE_COLUMNS = ('state', 'description', 'title', 'due_on', 'created_at', 'updated_at')
+
+def timestamp(value):
+    '''
+        Converts an ISO8601 date from GitHub/GitLab to a MySQL datetime, None stays None.
+    '''
+    if not value:
+        return None
+    return arrow.get(value).datetime.strftime('%Y-%m-%d %H:%M:%S')
+
 # Read API credentials
 config = configparser.ConfigParser()
 config.read('credentials.ini')
 GITHUB_LOGIN = config.get('github', 'login')
 GITHUB_TOKEN = config.get('github', 'token')
+# optional comma separated list of tokens to spread the REST requests over
+GITHUB_TOKENS = parse_tokens(config.get('github', 'tokens', fallback=GITHUB_TOKEN))
 
 class DatabaseInterface:
 
@@ -43,10 +66,25 @@ class DatabaseInterface:
         self.cmdline_parser = argparse.ArgumentParser()
         self.init_cmdline_parser()
         self.args = self.cmdline_parser.parse_args()
+        if not self.args.sqlite and not (self.args.username and self.args.password):
+            self.cmdline_parser.error('--username and --password are required for mysql connections')
+        if self.args.export_project and not self.args.export:
+            self.cmdline_parser.error('--export_project requires --export')
+        if self.args.metrics and self.args.numstat:
+            # the bus factor compares the patch text of the diffs, which numstat mode does not store
+            self.cmdline_parser.error('--metrics cannot be combined with --numstat')
+        # (table, natural key) -> DimensionCache, see dimension
+        self.dimensions = {}
+        self.telemetry = Telemetry(self.args.slow_query)
 
     def run(self):
         try:
-            self.db = MySQLdb.connect(host=self.args.host, port=self.args.port, user=self.args.username, password=self.args.password, database=self.args.database, use_unicode=True, charset='utf8mb4')
+            if self.args.sqlite:
+                db = connect_sqlite(self.args.sqlite, bulk=True)
+            else:
+                db = connect_mysql(self.args.host, self.args.port, self.args.username, self.args.password, self.args.database)
+            # count the round trips and log the slow queries of the whole run
+            self.db = self.telemetry.connect(db)
             logger.debug("Successfully connected to the database.")
         except:
             logger.critical('Could not establish a connection to the database.')
@@ -55,6 +93,12 @@ class DatabaseInterface:
         atexit.register(self.terminate)
         logger.debug('Established MySQL connection.')
 
+        try:
+            self.update()
+        finally:
+            self.write_telemetry()
+
+    def update(self):
         if self.args.add_project:
             project = self.args.add_project
             repo = self.get_git_name(project)
@@ -79,16 +123,47 @@ class DatabaseInterface:
             logger.debug(f'{repo}: Adding GitHub events to database...')
             self.add_events(project)
 
+        elif self.args.export_project:
+            project = self.args.export_project
+
         else:
             raise Exception('Unknown argument mode.')
 
+        if self.args.export:
+            self.export(project)
+
+    def write_telemetry(self):
+        '''
+            Writes the telemetry of the run to a JSON file in --telemetry_dir (unless
+            --no_telemetry), named after the project, the mode and the start time, and logs
+            its main numbers.
+        '''
+        modes = ['add_project', 'add_issues', 'add_prs', 'add_events', 'export_project']
+        mode = next(mode for mode in modes if getattr(self.args, mode))
+        name = self.get_git_name(getattr(self.args, mode))
+        http_cache = GitHubAPIClient.cache.stats() if GitHubAPIClient.cache else None
+        info = dict(project=name, mode=mode, url=getattr(self.args, mode), http_cache=http_cache)
+        if self.args.no_telemetry:
+            summary, written = self.telemetry.summary(**info), ''
+        else:
+            started = self.telemetry.started.strftime('%Y%m%dT%H%M%S')
+            path = os.path.join(os.path.expanduser(self.args.telemetry_dir), f'{name}-{mode}-{started}.json')
+            path, summary = self.telemetry.write(path, **info)
+            written = f' Telemetry written to {path}.'
+
+        stages = ', '.join(f'{stage} {totals["seconds"]:.1f} s' for stage, totals in summary['stages'].items())
+        database = summary['database']
+        logger.info(f'{name}: Run took {summary["seconds"]:.1f} s ({stages}); {database["queries"]} queries, '
+                    f'{database["commits"]} commits, {database["slow_queries"]} slow queries.{written}')
+
     def init_cmdline_parser(self): 
         # Connection Arguments
         self.cmdline_parser.add_argument('--host', help='host for mysql connection', type=str, default='sansa.cs.uoregon.edu')
-        self.cmdline_parser.add_argument('--username', help='username for mysql connection', type=str, required=True)
-        self.cmdline_parser.add_argument('--password', help='password for mysql connection', type=str, required=True)
+        self.cmdline_parser.add_argument('--username', help='username for mysql connection', type=str)
+        self.cmdline_parser.add_argument('--password', help='password for mysql connection', type=str)
         self.cmdline_parser.add_argument('--port', help='port for mysql connection', type=int, default=3331)
         self.cmdline_parser.add_argument('--database', help='database for mysql connection', type=str, default='ideas_db')
+        self.cmdline_parser.add_argument('--sqlite', help='use this local SQLite database file instead of MySQL', type=str)
 
         # Update Arguments
         group = self.cmdline_parser.add_mutually_exclusive_group(required=True)
@@ -98,16 +173,32 @@ class DatabaseInterface:
         group.add_argument('--add_issues', help='add GitHub/Gitlab issues', type=str)
         group.add_argument('--add_prs', help='add GitHub/Gitlab pull requests', type=str)
         group.add_argument('--add_events', help='add GitHub events', type=str)
+        group.add_argument('--export_project', help='only export a project that is in the database, see --export', type=str)
 
         # Misc Arguments
         self.cmdline_parser.add_argument('--force_epoch', help='force update from utc epoch', action='store_true')
         self.cmdline_parser.add_argument('--no_branches', help='does not fetch branch names for each commit', action='store_true')
         self.cmdline_parser.add_argument('--since', help='fetch commits from this date (ISO8601)', type=str, default='null')
-        self.cmdline_parser.add_argument('--until', help='fetch commits to this date (ISO8601)', type=str, default=datetime.datetime.today().isoformat())
+        self.cmdline_parser.add_argument('--until', help='fetch commits to this date (ISO8601), defaults to now', type=str)
         self.cmdline_parser.add_argument('--tags', help='tags to add to project', nargs='+', type=str)
         self.cmdline_parser.add_argument('--fork_of', help='fork of another project', type=str)
         self.cmdline_parser.add_argument('--child_of', help='child of another project', type=str)
         self.cmdline_parser.add_argument('--metrics', help='compute project metrics', action='store_true')
+        self.cmdline_parser.add_argument('--shards', help='number of processes to mine the git history with', type=int, default=1)
+        self.cmdline_parser.add_argument('--mirror_dir', help='directory of the cached git mirrors, defaults to ~/.ideas-temp/mirrors', type=str)
+        self.cmdline_parser.add_argument('--diff_limit', help='bytes of patch text stored per file (default: 1 MiB), longer diffs are cut off', type=int, default=FILE_LIMIT)
+        self.cmdline_parser.add_argument('--commit_limit', help='bytes of patch text stored per commit (default: 16 MiB), longer diffs are cut off', type=int, default=COMMIT_LIMIT)
+        self.cmdline_parser.add_argument('--incremental', help='only fetch the prs or issues updated since the last run with this option', action='store_true')
+        self.cmdline_parser.add_argument('--resume', help='continue an interrupted --add_project run from its last checkpoint', action='store_true')
+        self.cmdline_parser.add_argument('--compress_diffs', help='store diff bodies compressed and deduplicated in the diff_blob table', action='store_true')
+        self.cmdline_parser.add_argument('--export', help='also export the project to this format after updating it', choices=['parquet'])
+        self.cmdline_parser.add_argument('--export_dir', help='directory of the exported datasets', type=str, default='export')
+        self.cmdline_parser.add_argument('--telemetry_dir', help='directory of the JSON summaries of the runs, defaults to ~/.ideas-temp/telemetry', type=str, default='~/.ideas-temp/telemetry')
+        self.cmdline_parser.add_argument('--no_telemetry', help='only log the telemetry summary of the run, do not write it to --telemetry_dir', action='store_true')
+        self.cmdline_parser.add_argument('--http_cache', help='directory of the cached GitHub REST API responses, defaults to ~/.ideas-temp/http-cache', type=str, default='~/.ideas-temp/http-cache')
+        self.cmdline_parser.add_argument('--no_http_cache', help='always download the GitHub REST API responses in full', action='store_true')
+        self.cmdline_parser.add_argument('--slow_query', help='log queries taking longer than this many seconds (default: 1)', type=float, default=SLOW_QUERY)
+        self.cmdline_parser.add_argument('--numstat', help='only store the added and removed line counts of each file, without diff bodies', action='store_true')
 
 
     def terminate(self):
@@ -115,6 +206,27 @@ class DatabaseInterface:
             self.db.close()
         logger.debug('Closed MySQL connection.')
 
+    def export(self, url):
+        '''
+            Exports the commits, diffs, authors, PRs, issues and comments of a project
+            to partitioned Parquet datasets under --export_dir (see export.py).
+        '''
+        with closing(self.db.cursor()) as cursor:
+            query = 'select id, name from project where source_url=%s'
+            cursor.execute(query, (url,))
+            row = cursor.fetchone()
+        if not row:
+            logger.error(f'{url}: Project not found, nothing to export.')
+            return
+        project_id, name = row
+
+        start = time.time()
+        with self.telemetry.stage('export'):
+            counts = ParquetExporter(self.db, self.args.export_dir).export(project_id, name)
+        self.telemetry.count('export', sum(counts.values()))
+        rows = ', '.join(f'{count} {dataset}' for dataset, count in counts.items())
+        logger.info(f'{name}: Exported {rows} to {self.args.export_dir} in {time.time() - start:.1f} s.')
+
     def get_git_name(self, url):
         if url.find('.')>0:
             name = urlparse(url)
@@ -126,6 +238,41 @@ class DatabaseInterface:
             name = os.path.split(url)[-1]
         return name
 
+    def dimension(self, table, *keys):
+        '''
+            Returns the DimensionCache of a table by a natural key, e.g. ('author', 'username', 'url'),
+            shared by all the ingestion methods of this run.
+        '''
+        if (table, keys) not in self.dimensions:
+            self.dimensions[(table, keys)] = DimensionCache(table, keys)
+        return self.dimensions[(table, keys)]
+
+    def add_dimensions(self, cursor, items):
+        '''
+            Creates the missing authors, labels, issue tags and commit tags of a list of PRs or
+            issues at once, so that their ids can be looked up in the caches while storing them.
+        '''
+        authors = self.dimension('author', 'username', 'url')
+        labels = self.dimension('label', 'name')
+        issue_tags = self.dimension('issue_tag', 'url')
+        commit_tags = self.dimension('commit_tag', 'sha')
+
+        for item in items:
+            for author in [item['author']] + item['assignees']:
+                authors.request(cursor, (author['username'], author['url']), email=author['email'], name=author['name'])
+            for comment in item['comments']:
+                authors.request(cursor, (comment['author']['username'], comment['author']['url']))
+            for label in item['labels']:
+                labels.request(cursor, (label['name'],))
+            for ref_link in item.get('linked_issues') or []:
+                issue_tags.request(cursor, (ref_link['url'],))
+            for commit in item.get('commits') or []:
+                commit_tags.request(cursor, (commit['sha'],))
+
+        for cache in [authors, labels, issue_tags, commit_tags]:
+            cache.flush(cursor)
+        self.db.commit()
+
     def add_prs(self, url, since, until):
 
         parse_url = urlparse(url)
@@ -148,249 +295,29 @@ class DatabaseInterface:
                 logger.critical(f'{repo}: Unknown source: {root}')
                 raise Exception(f'{repo}: Unknown source: {root}')
 
+            since_time = self.get_sync_time(cursor, url, project_id, 'prs', since)
+            logger.debug(f'{repo}: Only check prs updated after {since_time}')
+
             # This may take a while
             logger.debug(f'{repo}: PRs. This may take a while...')
 
-            prs = fetch_prs(owner, repo, source)
+            # PRs come most recently updated first, the older ones are not fetched
+            with self.telemetry.stage('pr fetch'):
+                prs = fetch_prs(owner, repo, source, since=since_time)
+            self.telemetry.count('pr fetch', len(prs))
             logger.debug(f'{repo}: Got {len(prs)} prs.')
 
-            if since == 'null':
-                # Find last time updated
-                query = 'select last_updated from project where source_url=%s'
-                cursor.execute(query, (url,))
-                since = cursor.fetchone()[0]
-
-            logger.debug(f'{repo}: Only check prs after {since}')
-
-            for pr in prs:
-                #ignore PRs that are older than the since date, unless updated after since.
-                since_time = arrow.get(since).datetime - datetime.timedelta(hours=240)
-
-                if arrow.get(pr['updatedAt']) >= since_time:
-                    username = pr['author']['username']
-                    email = pr['author']['email']
-                    name = pr['author']['name']
-                    aurl = pr['author']['url']
-
-                    query = 'select count(*) from author where username=%s and url=%s'
-                    cursor.execute(query, (username, aurl,))
-                    exists = cursor.fetchone()[0] != 0
-
-                    if not exists:
-                        query = 'insert into author (username, email, name, url) values (%s, %s, %s, %s)'
-                        cursor.execute(query, (username, email, name, aurl,))
-                        self.db.commit()
-
-                        logger.debug(f'{repo}: Inserted new author {username}.')
-
-                    # Get author id
-                    query = 'select id from author where username=%s and url=%s'
-                    cursor.execute(query, (username, aurl,))
-                    author_id = cursor.fetchone()[0]
-
-                    title = pr['title']
-                    description = pr['description']
-                    updated_at = pr['updatedAt']
-                    locked = pr['locked']
-                    purl = pr['url']
-                    number = pr['number']
-                    state = pr['state']
-                    labels = pr['labels']
-                    assignees = pr['assignees']
-                    milestone = pr['milestone']
-                    comments = pr['comments']
-                    merged_at = pr['mergedAt']
-                    created_at = pr['createdAt']
-                    head_sha = pr['head_sha']
-                    commits = pr['commits']
-                    linked_issues = pr['linked_issues']
-
-                    if updated_at: updated_at = arrow.get(updated_at).datetime.strftime('%Y-%m-%d %H:%M:%S')
-                    if merged_at: merged_at = arrow.get(merged_at).datetime.strftime('%Y-%m-%d %H:%M:%S')
-                    if created_at: created_at = arrow.get(created_at).datetime.strftime('%Y-%m-%d %H:%M:%S')
-
-                    query = 'select count(*) from pr where url=%s'
-                    cursor.execute(query, (purl,))
-                    exists = cursor.fetchone()[0] != 0
-
-                    # Insert pr
-
-                    if exists:
-                        logger.debug(f'{repo}: Found existing PR.')
-                        query = 'update pr set title = %s, description = %s, updated_at = %s, merged_at = %s, locked = %s, state = %s where url = %s and project_id = %s and head_sha = %s and created_at = %s'
-                        cursor.execute(query, (title, description, updated_at, merged_at, locked, state, purl, project_id, head_sha, created_at))
-                    else:
-                        logger.debug(f'{repo}: Inserting new PR.')
-                        query = 'insert into pr (title, description, updated_at, merged_at, locked, number, state, url, author_id, project_id, head_sha, created_at) values (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'
-                        cursor.execute(query, (title, description, updated_at, merged_at, locked, number, state, purl, author_id, project_id, head_sha, created_at))
+            with self.telemetry.stage('pr authors, labels and tags', rows=len(prs)):
+                self.add_dimensions(cursor, prs)
 
+            # Store the PRs a page at a time, with one upsert per table
+            for start in range(0, len(prs), PAGE_SIZE):
+                with self.telemetry.stage('pr write', rows=len(prs[start:start + PAGE_SIZE])):
+                    self.store_prs(cursor, project_id, prs[start:start + PAGE_SIZE])
                     self.db.commit()
+                logger.debug(f'{repo}: Stored {min(start + PAGE_SIZE, len(prs))} of {len(prs)} prs.')
 
-                    # Get pr id
-                    query = 'select id from pr where url = %s and author_id = %s and number = %s'
-                    cursor.execute(query, (purl, author_id, number))
-                    pr_id = cursor.fetchone()[0]
-
-                    # Insert linked issues
-                    if pr['linked_issues']:
-                        for ref_link in linked_issues:
-                            issue_url = ref_link['url']
-                            query = 'select count(*) from issue_tag where url = %s'
-                            cursor.execute(query, (issue_url,))
-                            exists = cursor.fetchone()[0] != 0
-
-                            if not exists:
-                                query = 'insert into issue_tag (url) values (%s)'
-                                cursor.execute(query, (issue_url,))
-                                self.db.commit()
-
-                            query = 'select id from issue_tag where url = %s'
-                            cursor.execute(query, (issue_url,))
-                            issue_id = cursor.fetchone()[0]
-
-                            query = 'select count(*) from pr_has_issue where pr_id = %s and issue_id = %s'
-                            cursor.execute(query, (pr_id, issue_id))
-                            exists = cursor.fetchone()[0] != 0
-                            if not exists:
-                                logger.debug(f'{repo}: Inserting issue tag {issue_id} for pr {pr_id}')
-                                query = 'insert into pr_has_issue (pr_id, issue_id) values (%s, %s)'
-                                cursor.execute(query, (pr_id, issue_id))
-                                self.db.commit()
-
-                    # Insert milestone
-                    if pr['milestone']:
-                        title = pr['milestone']['title']
-                        description = pr['milestone']['description']
-                        updated_at = pr['milestone']['updatedAt']
-                        created_at = pr['milestone']['createdAt']
-                        state = pr['milestone']['state']
-                        due_on = pr['milestone']['dueOn']
-
-                        if updated_at: updated_at = arrow.get(updated_at).datetime.strftime('%Y-%m-%d %H:%M:%S')
-                        if created_at: created_at = arrow.get(created_at).datetime.strftime('%Y-%m-%d %H:%M:%S')
-                        if due_on: due_on = arrow.get(due_on).datetime.strftime('%Y-%m-%d %H:%M:%S')
-                        else: due_on = arrow.get('9999-01-01 00:00:00').datetime.strftime('%Y-%m-%d %H:%M:%S')
-
-                        query = 'select count(*) from milestone where pr_id = %s'
-                        cursor.execute(query, (pr_id,))
-                        exists = cursor.fetchone()[0] != 0
-
-                        if exists:
-                            logger.debug(f'{repo}: Found existing milestone.')
-                            query = 'update milestone set state = %s, description = %s, title = %s, due_on = %s, created_at = %s, updated_at = %s where pr_id = %s'
-                            cursor.execute(query, (state, description, title, due_on, created_at, updated_at, pr_id,))
-                        else:
-                            logger.debug(f'{repo}: Inserting new milestone.')
-                            query = 'insert into milestone (state, description, title, due_on, created_at, updated_at, pr_id) values (%s, %s, %s, %s, %s, %s, %s)'
-                            cursor.execute(query, (state, description, title, due_on, created_at, updated_at, pr_id,))
-
-                        self.db.commit()
-
-                    # Insert labels
-                    for label in labels:
-                        query = 'select count(*) from label where name = %s'
-                        cursor.execute(query, (label['name'],))
-                        exists = cursor.fetchone()[0] != 0
-
-                        if not exists:
-                            logger.debug(f'{repo}: Inserting new label.')
-                            query = 'insert into label (name) values (%s)'
-                            cursor.execute(query, (label['name'],))
-                            self.db.commit()
-
-                        query = 'select id from label where name = %s'
-                        cursor.execute(query, (label['name'],))
-                        label_id = cursor.fetchone()[0]
-
-                        query = 'select count(*) from pr_has_label where pr_id = %s and label_id = %s'
-                        cursor.execute(query, (pr_id, label_id,))
-                        exists = cursor.fetchone()[0] != 0
-
-                        if not exists:
-                            query = 'insert into pr_has_label (pr_id, label_id) values (%s, %s)'
-                            cursor.execute(query, (pr_id, label_id,))
-                            self.db.commit()
-
-                    # Insert assignees
-                    for assignee in assignees:
-                        query = 'select count(*) from author where username = %s and url = %s'
-                        cursor.execute(query, (assignee['username'], assignee['url'],))
-                        exists = cursor.fetchone()[0] != 0
-
-                        if not exists:
-                            query = 'insert into author (username, email, name, url) values (%s, %s, %s, %s)'
-                            cursor.execute(query, (assignee['username'], assignee['email'], assignee['name'], assignee['url'],))
-                            self.db.commit()
-
-                        query = 'select id from author where username = %s and url = %s'
-                        cursor.execute(query, (assignee['username'], assignee['url'],))
-                        assignee_id = cursor.fetchone()[0]
-
-                        query = 'select count(*) from pr_has_assignee where pr_id = %s and assignee_id = %s'
-                        cursor.execute(query, (pr_id, assignee_id,))
-                        exists = cursor.fetchone()[0] != 0
-
-                        if not exists:
-                            query = 'insert into pr_has_assignee (pr_id, assignee_id) values (%s, %s)'
-                            cursor.execute(query, (pr_id, assignee_id,))
-                            self.db.commit()
-
-                    # Insert commits
-                    for commit in commits:
-                        sha = commit['sha']
-                        query = 'select count(*) from commit_tag where sha = %s'
-                        cursor.execute(query, (sha,))
-                        exists = cursor.fetchone()[0] != 0
-
-                        if not exists:
-                            query = 'insert into commit_tag (sha) values (%s)'
-                            cursor.execute(query, (sha,))
-                            self.db.commit()
-
-                        query = 'select id from commit_tag where sha = %s'
-                        cursor.execute(query, (sha,))
-                        commit_id = cursor.fetchone()[0]
-
-                        query = 'select count(*) from pr_has_commit where pr_id = %s and commit_id = %s'
-                        cursor.execute(query, (pr_id, commit_id))
-                        exists = cursor.fetchone()[0] != 0
-                        if not exists:
-                            logger.debug(f'{repo}: Inserting commit tag {commit_id} for pr {pr_id}')
-                            query = 'insert into pr_has_commit (pr_id, commit_id) values (%s, %s)'
-                            cursor.execute(query, (pr_id, commit_id))
-                            self.db.commit()
-
-
-                    # Insert comments
-                    for comment in comments:
-                        query = 'select count(*) from author where username = %s and url = %s'
-                        cursor.execute(query, (comment['author']['username'], comment['author']['url'],))
-                        exists = cursor.fetchone()[0] != 0
-
-                        if not exists:
-                            query = 'insert into author (username, url) values (%s, %s)'
-                            cursor.execute(query, (comment['author']['username'], comment['author']['url'],))
-                            self.db.commit()
-
-                        query = 'select id from author where username = %s and url = %s'
-                        cursor.execute(query, (comment['author']['username'], comment['author']['url'],))
-                        author_id = cursor.fetchone()[0]
-
-                        created_at = comment['createdAt']
-                        updated_at = comment['updatedAt']
-
-                        if updated_at: updated_at = arrow.get(updated_at).datetime.strftime('%Y-%m-%d %H:%M:%S')
-                        if created_at: created_at = arrow.get(created_at).datetime.strftime('%Y-%m-%d %H:%M:%S')
-
-                        query = 'select count(*) from comment where pr_id = %s and author_id = %s and created_at = %s and updated_at = %s'
-                        cursor.execute(query, (pr_id, author_id, created_at, updated_at))
-                        exists = cursor.fetchone()[0] != 0
-
-                        if not exists:
-                            logger.debug(f'{repo}: Inserting new comment for pr {pr_id} from author {author_id}')
-                            query = 'insert into comment (pr_id, author_id, created_at, updated_at, body) values (%s, %s, %s, %s, %s)'
-                            cursor.execute(query, (pr_id, author_id, created_at, updated_at, comment['body']))
-                            self.db.commit()
+            self.set_sync(cursor, project_id, 'prs', prs)
 
     def add_issues(self, url, since, until):
 
@@ -417,218 +344,209 @@ class DatabaseInterface:
                 logger.critical(f'{repo}: Unknown source: {root}')
                 raise Exception(f'{repo}: Unknown source: {root}')
 
+            since_time = self.get_sync_time(cursor, url, project_id, 'issues', since)
+            logger.debug(f'{repo}: Only check issues updated after {since_time}')
+
             # This may take a while
             logger.debug(f'{repo}: Fetching issues. This may take a while...')
 
-            issues = fetch_issues(owner, repo, source)
+            # Issues come most recently updated first, the older ones are not fetched
+            with self.telemetry.stage('issue fetch'):
+                issues = fetch_issues(owner, repo, source, since=since_time)
+            self.telemetry.count('issue fetch', len(issues))
             logger.debug(f'{repo}: Got {len(issues)} issues.')
 
-            if since == 'null':
-                # Find last time updated
-                query = 'select last_updated from project where source_url=%s'
-                cursor.execute(query, (url,))
-                since = cursor.fetchone()[0]
-            
-            logger.debug(f'{repo}: Only check issues after {since}')
-
+            issues = [issue for issue in issues if issue['author']['username']]
             for issue in issues:
+                for comment in issue['comments']:
+                    if not comment['author']['username']: comment['author']['username'] = ''
+
+            with self.telemetry.stage('issue authors, labels and tags', rows=len(issues)):
+                self.add_dimensions(cursor, issues)
+
+            # Store the issues a page at a time, with one upsert per table
+            for start in range(0, len(issues), PAGE_SIZE):
+                with self.telemetry.stage('issue write', rows=len(issues[start:start + PAGE_SIZE])):
+                    self.store_issues(cursor, project_id, issues[start:start + PAGE_SIZE])
+                    self.db.commit()
+                logger.debug(f'{repo}: Stored {min(start + PAGE_SIZE, len(issues))} of {len(issues)} issues.')
 
-                #ignore issues that are older than the since date, unless updated after since.
-                since_time = arrow.get(since).datetime - datetime.timedelta(hours=240)
-
-                if arrow.get(issue['updatedAt']) >= since_time:
-                    username = issue['author']['username']
-                    email = issue['author']['email']
-                    name = issue['author']['name']
-                    aurl = issue['author']['url']
-
-                    if username:
-                        query = 'select count(*) from author where username=%s and url=%s'
-                        cursor.execute(query, (username, aurl,))
-                        exists = cursor.fetchone()[0] != 0
-
-                        if not exists:
-                            query = 'insert into author (username, email, name, url) values (%s, %s, %s, %s)'
-                            cursor.execute(query, (username, email, name, aurl,))
-                            self.db.commit()
-
-                            logger.debug(f'{repo}: Inserted new author {username}.')
-
-                        # Get author id
-                        query = 'select id from author where username=%s and url=%s'
-                        cursor.execute(query, (username, aurl,))
-                        author_id = cursor.fetchone()[0]
-
-                        title = issue['title']
-                        description = issue['description']
-                        updated_at = issue['updatedAt']
-                        locked = issue['locked']
-                        iurl = issue['url']
-                        number = issue['number']
-                        closed_at = issue['closedAt']
-                        created_at = issue['createdAt']
-                        state = issue['state']
-                        labels = issue['labels']
-                        assignees = issue['assignees']
-                        milestone = issue['milestone']
-                        comments = issue['comments']
-
-                        if updated_at: updated_at = arrow.get(updated_at).datetime.strftime('%Y-%m-%d %H:%M:%S')
-                        if closed_at: closed_at = arrow.get(closed_at).datetime.strftime('%Y-%m-%d %H:%M:%S')
-                        if created_at: created_at = arrow.get(created_at).datetime.strftime('%Y-%m-%d %H:%M:%S')
-
-                        query = 'select count(*) from issue where url=%s'
-                        cursor.execute(query, (iurl,))
-                        exists = cursor.fetchone()[0] != 0
-                        # Insert issue
-
-                        if exists:
-                            if closed_at:
-                               query = 'title = %s, description = %s, updated_at = %s, closed_at = %s, locked = %s, state = %s where url = %s and project_id = %s and created_at = %s'
-                               params = (title, description, updated_at, closed_at, locked, state, iurl, project_id, created_at)
-                            else:
-                               query = 'title = %s, description = %s, updated_at = %s, locked = %s, state = %s where url = %s and project_id = %s and created_at = %s'
-                               params = (title, description, updated_at, locked, state, iurl, project_id, created_at)
-                            logger.debug(f'{repo}: Found existing issue.')
-                            query = 'update issue set ' + query 
-                            cursor.execute(query, params)
-                        else:
-                            logger.debug(f'{repo}: Inserting new issue.')
-                            if not closed_at: closed_at = arrow.get('9999-01-01 00:00:00').datetime.strftime('%Y-%m-%d %H:%M:%S')
-
-                            query = 'insert into issue (title, description, updated_at, closed_at, locked, number, state, url, author_id, project_id, created_at) values (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'
-                            cursor.execute(query, (title, description, updated_at, closed_at, locked, number, state, iurl, author_id, project_id, created_at))
-
-                        self.db.commit()
-
-                        # Get issue id
-                        query = 'select id from issue where url = %s and author_id = %s and number = %s'
-                        cursor.execute(query, (iurl, author_id, number))
-                        issue_id = cursor.fetchone()[0]
-
-                        # Insert milestone
-                        if issue['milestone']:
-                            title = issue['milestone']['title']
-                            description = issue['milestone']['description']
-                            updated_at = issue['milestone']['updatedAt']
-                            created_at = issue['milestone']['createdAt']
-                            state = issue['milestone']['state']
-                            due_on = issue['milestone']['dueOn']
-
-                            if updated_at: updated_at = arrow.get(updated_at).datetime.strftime('%Y-%m-%d %H:%M:%S')
-                            if created_at: created_at = arrow.get(created_at).datetime.strftime('%Y-%m-%d %H:%M:%S')
-                            if due_on: due_on = arrow.get(due_on).datetime.strftime('%Y-%m-%d %H:%M:%S')
-                            else: due_on = arrow.get('9999-01-01 00:00:00').datetime.strftime('%Y-%m-%d %H:%M:%S')
-                            if not description: description = ''
-
-                            query = 'select count(*) from milestone where issue_id = %s'
-                            cursor.execute(query, (issue_id,))
-                            exists = cursor.fetchone()[0] != 0
-
-                            if exists:
-                                logger.debug(f'{repo}: Found existing milestone.')
-                                query = 'update milestone set state = %s, description = %s, title = %s, due_on = %s, created_at = %s, updated_at = %s where issue_id = %s'
-                                cursor.execute(query, (state, description, title, due_on, created_at, updated_at, issue_id,))
-                            else:
-                                logger.debug(f'{repo}: Inserting new milestone.')
-                                query = 'insert into milestone (state, description, title, due_on, created_at, updated_at, issue_id) values (%s, %s, %s, %s, %s, %s, %s)'
-                                cursor.execute(query, (state, description, title, due_on, created_at, updated_at, issue_id,))
-
-                            self.db.commit()
-
-                        # Insert labels
-                        for label in labels:
-                            query = 'select count(*) from label where name = %s'
-                            cursor.execute(query, (label['name'],))
-                            exists = cursor.fetchone()[0] != 0
-
-                            if not exists:
-                                logger.debug(f'{repo}: Inserting new label.')
-                                query = 'insert into label (name) values (%s)'
-                                cursor.execute(query, (label['name'],))
-                                self.db.commit()
-
-                            query = 'select id from label where name = %s'
-                            cursor.execute(query, (label['name'],))
-                            label_id = cursor.fetchone()[0]
-
-                            query = 'select count(*) from issue_has_label where issue_id = %s and label_id = %s'
-                            cursor.execute(query, (issue_id, label_id,))
-                            exists = cursor.fetchone()[0] != 0
-
-                            if not exists:
-                                query = 'insert into issue_has_label (issue_id, label_id) values (%s, %s)'
-                                cursor.execute(query, (issue_id, label_id,))
-                                self.db.commit()
-
-                        # Insert assignees
-                        for assignee in assignees:
-                            query = 'select count(*) from author where username = %s and url = %s'
-                            cursor.execute(query, (assignee['username'], assignee['url'],))
-                            exists = cursor.fetchone()[0] != 0
-
-                            if not exists:
-                                query = 'insert into author (username, email, name, url) values (%s, %s, %s, %s)'
-                                cursor.execute(query, (assignee['username'], assignee['email'], assignee['name'], assignee['url'],))
-                                self.db.commit()
-
-                            query = 'select id from author where username = %s and url = %s'
-                            cursor.execute(query, (assignee['username'], assignee['url'],))
-                            assignee_id = cursor.fetchone()[0]
-
-                            query = 'select count(*) from issue_has_assignee where issue_id = %s and assignee_id = %s'
-                            cursor.execute(query, (issue_id, assignee_id,))
-                            exists = cursor.fetchone()[0] != 0
-
-                            if not exists:
-                                query = 'insert into issue_has_assignee (issue_id, assignee_id) values (%s, %s)'
-                                cursor.execute(query, (issue_id, assignee_id,))
-                                self.db.commit()
-
-                        # Insert comments
-                        for comment in comments:
-                            query = 'select count(*) from author where username = %s and url = %s'
-                            cursor.execute(query, (comment['author']['username'], comment['author']['url'],))
-                            exists = cursor.fetchone()[0] != 0
-
-                            if not exists:
-                                query = 'insert into author (username, url) values (%s, %s)'
-                                if not comment['author']['username']: comment['author']['username'] = ''
-                                cursor.execute(query, (comment['author']['username'], comment['author']['url'],))
-                                self.db.commit()
-
-                            query = 'select id from author where username = %s and url = %s'
-                            cursor.execute(query, (comment['author']['username'], comment['author']['url'],))
-                            author_id = cursor.fetchone()[0]
-
-                            created_at = comment['createdAt']
-                            updated_at = comment['updatedAt']
-
-                            updated_at = arrow.get(updated_at).datetime.strftime('%Y-%m-%d %H:%M:%S')
-                            created_at = arrow.get(created_at).datetime.strftime('%Y-%m-%d %H:%M:%S')
-
-                            query = 'select count(*) from comment where issue_id = %s and author_id = %s and created_at = %s and updated_at = %s'
-                            cursor.execute(query, (issue_id, author_id, created_at, updated_at))
-                            exists = cursor.fetchone()[0] != 0
-
-                            if not exists:
-                                logger.debug(f'{repo}: Inserting new comment for issue {issue_id} from author {author_id}')
-                                query = 'insert into comment (issue_id, author_id, created_at, updated_at, body) values (%s, %s, %s, %s, %s)'
-                                cursor.execute(query, (issue_id, author_id, created_at, updated_at, comment['body']))
-                                self.db.commit()
-
-
-    def add_project(self, url, name=None, since=None, until=datetime.datetime.today().isoformat(), fork_of=None, child_of=None, tags=None, metrics=False):
+            # the issues without author are not stored, and not counted as synced either
+            self.set_sync(cursor, project_id, 'issues', issues)
+
+    def get_sync_time(self, cursor, url, project_id, resource, since):
+        '''
+            Returns the time from which the PRs or issues ('prs' or 'issues') of a project are fetched:
+            with --incremental, the most recent update stored by the last run (see set_sync), otherwise
+            (or on the first run) ten days before --since or the last update of the project.
+        '''
+        if self.args.incremental:
+            query = 'select updated_at from project_sync where project_id=%s and resource=%s'
+            cursor.execute(query, (project_id, resource,))
+            row = cursor.fetchone()
+            if row:
+                return arrow.get(row[0]).datetime
+
+        if since == 'null':
+            # Find last time updated
+            query = 'select last_updated from project where source_url=%s'
+            cursor.execute(query, (url,))
+            since = cursor.fetchone()[0]
+
+        # also check the PRs and issues updated shortly before since
+        return arrow.get(since).datetime - datetime.timedelta(hours=240)
+
+    def set_sync(self, cursor, project_id, resource, items):
+        '''
+            Stores the most recent update of the stored PRs or issues as where the next --incremental
+            run starts, only call once they are all stored.
+        '''
+        if not items:
+            return
+        updated_at = max(arrow.get(item['updatedAt']) for item in items)
+        query = 'insert into project_sync (project_id, resource, updated_at) values (%s, %s, %s) ' \
+                'on duplicate key update updated_at=if(values(updated_at) > updated_at, values(updated_at), updated_at)'
+        cursor.execute(query, (project_id, resource, timestamp(updated_at.isoformat()),))
+        self.db.commit()
+
+    def store_prs(self, cursor, project_id, prs):
+        '''
+            Stores a page of PRs with their milestones, linked issues, labels, assignees, commits and
+            comments, with one upsert per table. Their authors, labels and tags must exist (see add_dimensions).
+        '''
+        authors = self.dimension('author', 'username', 'url')
+        labels = self.dimension('label', 'name')
+        issue_tags = self.dimension('issue_tag', 'url')
+        commit_tags = self.dimension('commit_tag', 'sha')
+
+        rows = []
+        for pr in prs:
+            author_id = authors[(pr['author']['username'], pr['author']['url'])]
+            rows.append((pr['title'], pr['description'], timestamp(pr['updatedAt']), timestamp(pr['mergedAt']), pr['locked'], pr['number'], pr['state'],
+                         pr['url'], author_id, project_id, pr['head_sha'], timestamp(pr['createdAt']),))
+        columns = ('title', 'description', 'updated_at', 'merged_at', 'locked', 'number', 'state', 'url', 'author_id', 'project_id', 'head_sha', 'created_at')
+        self.upsert(cursor, 'pr', columns, rows, update=('title', 'description', 'updated_at', 'merged_at', 'locked', 'state', 'head_sha'))
+        pr_ids = self.get_ids(cursor, 'pr', 'url', [pr['url'] for pr in prs])
+
+        milestones, linked_issues, pr_labels, assignees, commits, comments = [], [], [], [], [], []
+        for pr in prs:
+            pr_id = pr_ids[pr['url']]
+            if pr['milestone']:
+                milestones.append(self.milestone_row(pr['milestone']) + (pr_id,))
+            for ref_link in pr['linked_issues'] or []:
+                linked_issues.append((pr_id, issue_tags[(ref_link['url'],)],))
+            for label in pr['labels']:
+                pr_labels.append((pr_id, labels[(label['name'],)],))
+            for assignee in pr['assignees']:
+                assignees.append((pr_id, authors[(assignee['username'], assignee['url'])],))
+            for commit in pr['commits']:
+                commits.append((pr_id, commit_tags[(commit['sha'],)],))
+            for comment in pr['comments']:
+                author_id = authors[(comment['author']['username'], comment['author']['url'])]
+                comments.append((pr_id, author_id, timestamp(comment['createdAt']), timestamp(comment['updatedAt']), comment['body'],))
+
+        self.upsert(cursor, 'milestone', MILESTONE_COLUMNS + ('pr_id',), milestones, update=MILESTONE_COLUMNS)
+        self.upsert(cursor, 'pr_has_issue', ('pr_id', 'issue_id'), linked_issues)
+        self.upsert(cursor, 'pr_has_label', ('pr_id', 'label_id'), pr_labels)
+        self.upsert(cursor, 'pr_has_assignee', ('pr_id', 'assignee_id'), assignees)
+        self.upsert(cursor, 'pr_has_commit', ('pr_id', 'commit_id'), commits)
+        self.upsert(cursor, 'comment', ('pr_id', 'author_id', 'created_at', 'updated_at', 'body'), comments, update=('updated_at', 'body'))
+
+    def store_issues(self, cursor, project_id, issues):
+        '''
+            Stores a page of issues with their milestones, labels, assignees and comments, with one
+            upsert per table. Their authors and labels must exist (see add_dimensions).
+        '''
+        authors = self.dimension('author', 'username', 'url')
+        labels = self.dimension('label', 'name')
+
+        rows = []
+        for issue in issues:
+            author_id = authors[(issue['author']['username'], issue['author']['url'])]
+            closed_at = timestamp(issue['closedAt']) or FAR_FUTURE
+            rows.append((issue['title'], issue['description'], timestamp(issue['updatedAt']), closed_at, issue['locked'], issue['number'], issue['state'],
+                         issue['url'], author_id, project_id, timestamp(issue['createdAt']),))
+        columns = ('title', 'description', 'updated_at', 'closed_at', 'locked', 'number', 'state', 'url', 'author_id', 'project_id', 'created_at')
+        # a reopened issue keeps the date it was last closed
+        closed_at = f"closed_at=if(values(closed_at)='{FAR_FUTURE}', closed_at, values(closed_at))"
+        self.upsert(cursor, 'issue', columns, rows, update=('title', 'description', 'updated_at', closed_at, 'locked', 'state'))
+        issue_ids = self.get_ids(cursor, 'issue', 'url', [issue['url'] for issue in issues])
+
+        milestones, issue_labels, assignees, comments = [], [], [], []
+        for issue in issues:
+            issue_id = issue_ids[issue['url']]
+            if issue['milestone']:
+                milestones.append(self.milestone_row(issue['milestone']) + (issue_id,))
+            for label in issue['labels']:
+                issue_labels.append((issue_id, labels[(label['name'],)],))
+            for assignee in issue['assignees']:
+                assignees.append((issue_id, authors[(assignee['username'], assignee['url'])],))
+            for comment in issue['comments']:
+                author_id = authors[(comment['author']['username'], comment['author']['url'])]
+                comments.append((issue_id, author_id, timestamp(comment['createdAt']), timestamp(comment['updatedAt']), comment['body'],))
+
+        self.upsert(cursor, 'milestone', MILESTONE_COLUMNS + ('issue_id',), milestones, update=MILESTONE_COLUMNS)
+        self.upsert(cursor, 'issue_has_label', ('issue_id', 'label_id'), issue_labels)
+        self.upsert(cursor, 'issue_has_assignee', ('issue_id', 'assignee_id'), assignees)
+        self.upsert(cursor, 'comment', ('issue_id', 'author_id', 'created_at', 'updated_at', 'body'), comments, update=('updated_at', 'body'))
+
+    @staticmethod
+    def milestone_row(milestone):
+        '''
+            Returns the values of the MILESTONE_COLUMNS of a milestone.
+        '''
+        due_on = timestamp(milestone['dueOn']) or FAR_FUTURE
+        return (milestone['state'], milestone['description'] or '', milestone['title'], due_on,
+                timestamp(milestone['createdAt']), timestamp(milestone['updatedAt']),)
+
+    def upsert(self, cursor, table, columns, rows, update=None):
+        '''
+            Inserts rows into a table with a single multi-row statement. Rows whose unique key
+            already exists are updated instead.
+            update: the columns set from the new row, or assignments such as 'a=values(b)';
+            if None, existing rows are left as they are
+        '''
+        if not rows:
+            return
+        if update:
+            assignments = ', '.join(column if '=' in column else f'{column}=values({column})' for column in update)
+        else:
+            assignments = f'{columns[0]}={columns[0]}'
+        query = 'insert into %s (%s) values (%s) on duplicate key update %s' % (table, ', '.join(columns), ', '.join(['%s'] * len(columns)), assignments)
+        # MySQLdb sends all the rows of an insert ... values statement at once
+        cursor.executemany(query, rows)
+
+    def get_ids(self, cursor, table, column, values):
+        '''
+            Returns a dict of value -> id of the rows of a table with a unique column in values.
+        '''
+        if not values:
+            return {}
+        query = 'select %s, id from %s where %s in (%s)' % (column, table, column, ', '.join(['%s'] * len(values)))
+        cursor.execute(query, values)
+        return dict(cursor.fetchall())
+
+
+    def add_project(self, url, name=None, since=None, until=None, fork_of=None, child_of=None, tags=None, metrics=False):
         '''
             url: url to git file
             name: descriptive name of project, defaults to .git file name
             since: ISO8601 datetime of when to grab git data from, defaults to utc epoch
+            until: ISO8601 datetime of when to grab git data to, defaults to now
             fork_of: url of git_project that it is a fork of, defaults None
+
+            Existing projects are updated incrementally from the ref tips stored
+            in project_watermark by the previous run, unless since/until is given.
         '''
 
         if not name:
             name = self.get_git_name(url)
 
+        # Only a run over the whole history may move the watermarks
+        incremental = (not since or since == 'null') and not until
+        if not until:
+            until = datetime.datetime.today().isoformat()
+
         with closing(self.db.cursor()) as cursor:
 
             query = 'select count(*) from project where source_url=%s'
@@ -663,8 +581,11 @@ class DatabaseInterface:
 
                 # Insert new project
                 # TODO: update has_github and has_gitlab
-                query = 'insert into project (name, source_url, last_updated, fork_of_id, child_of_id, has_github, has_gitlab, github_last_updated, gitlab_last_updated) values (%s, %s, utc_timestamp(), %s, %s, 0, 0, utc_timestamp(), utc_timestamp())'
+                query = 'insert into project (name, source_url, last_updated, fork_of_id, child_of_id, has_github, has_gitlab, github_last_updated, gitlab_last_updated, ' \
+                        'complete_ignore_extensions, complete_ignore_filenames, documentation_ignore_extensions, documentation_ignore_filenames, doctypes) ' \
+                        'values (%s, %s, utc_timestamp(), %s, %s, 0, 0, utc_timestamp(), utc_timestamp(), \'[]\', \'[]\', \'[]\', \'[]\', \'{}\')'
                 cursor.execute(query, (name, url, fork_of, child_of))
+                project_id = cursor.lastrowid
 
             self.db.commit()
 
@@ -702,9 +623,15 @@ class DatabaseInterface:
                 logger.debug(f'{name}: FORCE_EPOCH set to True.')
 
             # If new project grab everything, otherwise grab utc epoch
+            watermarks = None
+            if incremental and not (new_project or self.args.force_epoch):
+                watermarks = self.get_watermarks(cursor, project_id) or None
+
             if new_project or self.args.force_epoch:
                 since = self.args.since
                 logger.debug(f'{name}: New project, grabbing all commit data since {since} until {until}.')
+            elif watermarks:
+                logger.debug(f'{name}: Existing project, grabbing commits after the {len(watermarks)} ref tips mined last time.')
             else:
                 if since == 'null':
                     # Find last time updated
@@ -718,8 +645,22 @@ class DatabaseInterface:
 
                 logger.debug(f'{name}: Existing project, grabbing all commit data since {since} until {until}.')
 
+            # Continue an interrupted run with what it was mining
+            checkpoint = None
+            if self.args.resume and not new_project:
+                checkpoint = self.get_checkpoint(cursor, project_id)
+                if checkpoint:
+                    since, until, watermarks = checkpoint['since'], checkpoint['until'], checkpoint['watermarks']
+                    logger.debug(f'{name}: Resuming the interrupted run after {checkpoint["commits"]} commits.')
+                else:
+                    logger.debug(f'{name}: No interrupted run to resume.')
+
             # TODO: fix since (gets from Unix Epoch only right now (default arg))
-            self.process_project(url, since=since, until=until)
+            tips = self.process_project(url, since=since, until=until, watermarks=watermarks, checkpoint=checkpoint)
+
+            if incremental and tips is not None:
+                self.set_watermarks(cursor, project_id, tips)
+                logger.debug(f'{name}: Stored {len(tips)} ref tips as the new watermarks.')
 
             if exists:
                 logger.debug(f'{name}: Project from {url} updated.')
@@ -735,28 +676,82 @@ class DatabaseInterface:
                 # Repeat for every active branch
                 branches = ["main", "master"]
                 for branch in branches:
-                    cmd = f"git checkout {branch}"
+                    dest = self.checkout_branch(url, branch)
+                    if not dest:
+                        print('Failed to checkout branch: '+branch)
+                        continue
                     try:
-                        # Using subprocess will throw exception if branch doesn exist which we want to happen
-                        #os.system(cmd) Switch to this once we are smarter about getting branches
-                        result = subprocess.check_output(cmd, shell=True)
-
                         # Run linter on every .py file in project
-                        self.lint_python('.', project_id, cursor, branch)
-                        self.lint_fortran('.', project_id, cursor, branch)
-                        self.lint_cpp('.', project_id, cursor, branch)
+                        self.lint_python(dest, project_id, cursor, branch)
+                        self.lint_fortran(dest, project_id, cursor, branch)
+                        self.lint_cpp(dest, project_id, cursor, branch)
 
                         # Run documentation and busfactor on just flash and anl_test_repo for now
                         if project_id == 30 or project_id == 35:
-                            flashx.set_directory_structure(self.repo_structure('.'))
-                            self.documentation_fortran('.', project_id, cursor, branch)
+                            # the metrics libraries are only needed here
+                            from .lib import flashx
+                            flashx.set_directory_structure(self.repo_structure(dest))
+                            self.documentation_fortran(dest, project_id, cursor, branch)
 
                             self.refresh_busfactor(cursor, name, project_id, branch)
 
                     except Exception as e:
-                        print('Failed to checkout branch: '+branch)
+                        logger.error(f'{name}: Could not compute the metrics of branch {branch}: {e}')
+                    finally:
+                        if url[0] != '/':
+                            MirrorCache(self.args.mirror_dir).removeWorktree(url, dest)
+
+    def checkout_branch(self, url, branch):
+        '''
+            Checks out a branch of a project for the metrics and returns the directory, False if
+            the branch does not exist. Remote projects are mined from a bare mirror, so the branch
+            is checked out in a worktree of the mirror (remove it with MirrorCache.removeWorktree);
+            local projects are checked out in place, in the clone they were mined from.
+        '''
+        if url[0] == '/':
+            retcode, out, err = Command(f'git checkout {branch}').run()
+            return '.' if retcode == 0 else False
+
+        mirrors = MirrorCache(self.args.mirror_dir)
+        dest = mirrors.getPath(url)[:-len('.git')] + '-worktree'
+        return mirrors.addWorktree(url, dest, rev=branch)
                 
+    def get_watermarks(self, cursor, project_id):
+        '''
+            Returns dict of ref -> sha of the ref tips mined by the last run.
+        '''
+        query = 'select ref, sha from project_watermark where project_id=%s'
+        cursor.execute(query, (project_id,))
+        return dict(cursor.fetchall())
+
+    def get_checkpoint(self, cursor, project_id):
+        '''
+            Returns the checkpoint of an interrupted run as a dict with the sha of the last
+            stored commit (None before the first checkpoint), the number of commits stored,
+            the tips, watermarks, since and until it was mining, or None.
+        '''
+        query = 'select sha, commits, tips, watermarks, since, until from project_checkpoint where project_id=%s'
+        cursor.execute(query, (project_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        sha, commits, tips, watermarks, since, until = row
+        return {'sha': sha, 'commits': commits, 'tips': json.loads(tips),
+                'watermarks': json.loads(watermarks) if watermarks else None,
+                'since': since, 'until': until}
+
+    def set_watermarks(self, cursor, project_id, tips):
+        '''
+            Replaces the stored ref tips of a project, only call once all commits up to them are stored.
+        '''
+        query = 'delete from project_watermark where project_id=%s'
+        cursor.execute(query, (project_id,))
+        query = 'insert into project_watermark (project_id, ref, sha) values (%s, %s, %s)'
+        cursor.executemany(query, [(project_id, ref, sha) for ref, sha in tips.items()])
+        self.db.commit()
+
     def refresh_busfactor(self, cursor, name, project_id, branch):
+        from .lib import bus_factor
 
         results = bus_factor.compute_busfactor(cursor, name)
         print("BUSFACTOR")
@@ -788,7 +783,10 @@ class DatabaseInterface:
 
         return folder_structure
 
-    def documentation_fortran(self, start, project_id, cursor, branch):
+    def documentation_fortran(self, start, project_id, cursor, branch, root=None):
+        from .lib import flashx
+        # file paths are stored relative to the top directory of the checkout
+        root = start if root is None else root
 
         for thing in os.listdir(start):
             thing = os.path.join(start, thing)
@@ -804,14 +802,14 @@ class DatabaseInterface:
                     results = flashx.check_file_documentation(lines, thing)
 
                     query = 'replace into database_filemetric (project_id, metric_type, file_path, branch, result_string, result_json, datetime) values (%s, %s, %s, %s, %s, %s, now())'
-                    cursor.execute(query, (project_id, 'DOCUMENTATION', thing[2:], branch, str(results), str(json.dumps(results))))
+                    cursor.execute(query, (project_id, 'DOCUMENTATION', os.path.relpath(thing, root), branch, str(results), str(json.dumps(results))))
                     self.db.commit()
 
         for thing in os.listdir(start):
             if not thing.startswith(".git") and not thing.startswith("repos"):
                 thing = os.path.join(start, thing)
                 if os.path.isdir(thing):
-                    self.documentation_fortran(thing, project_id, cursor, branch)
+                    self.documentation_fortran(thing, project_id, cursor, branch, root=root)
 
     #TODO: Move to utils.py once done adding Flash-X updates
     def check_documentation(self, doctypes, filename, lines):
@@ -967,7 +965,9 @@ class DatabaseInterface:
         return_dict['check_status'] = False
         return return_dict
 
-    def lint_python(self, start, project_id, cursor, branch):
+    def lint_python(self, start, project_id, cursor, branch, root=None):
+        # file paths are stored relative to the top directory of the checkout
+        root = start if root is None else root
 
         for thing in os.listdir(start):
             thing = os.path.join(start, thing)
@@ -978,7 +978,7 @@ class DatabaseInterface:
                     try:
                         output = os.popen(
                             "export PYTHONPATH=${PYTHONPATH}:"
-                            + os.path.abspath('.')
+                            + os.path.abspath(root)
                             + " ; . ../meercat/meercat-env/bin/activate ; pylint --output-format=json "
                             + thing
                         ).read()
@@ -987,16 +987,18 @@ class DatabaseInterface:
                         output = '[{ "error": "' + str(e) + '"}]'
 
                     query = 'replace into database_filemetric (project_id, metric_type, file_path, branch, result_string, result_json, datetime) values (%s, %s, %s, %s, %s, %s, now())'
-                    cursor.execute(query, (project_id, 'LINTING', thing[2:], branch, output, output))
+                    cursor.execute(query, (project_id, 'LINTING', os.path.relpath(thing, root), branch, output, output))
                     self.db.commit()
 
         for thing in os.listdir(start):
             if not thing.startswith(".git") and not thing.startswith("repos"):
                 thing = os.path.join(start, thing)
                 if os.path.isdir(thing):
-                    self.lint_python(thing, project_id, cursor, branch)
+                    self.lint_python(thing, project_id, cursor, branch, root=root)
 
-    def lint_fortran(self, start, project_id, cursor, branch):
+    def lint_fortran(self, start, project_id, cursor, branch, root=None):
+        # file paths are stored relative to the top directory of the checkout
+        root = start if root is None else root
 
         for thing in os.listdir(start):
             thing = os.path.join(start, thing)
@@ -1007,7 +1009,7 @@ class DatabaseInterface:
                     try:
                         output = os.popen(
                             "export PYTHONPATH=${PYTHONPATH}:"
-                            + os.path.abspath('.')
+                            + os.path.abspath(root)
                             + " ; . ../meercat/meercat-env/bin/activate ; fortran-linter "
                             + thing
                             + " --syntax-only"
@@ -1035,16 +1037,18 @@ class DatabaseInterface:
                                 pass 
 
                     query = 'replace into database_filemetric (project_id, metric_type, file_path, branch, result_string, result_json, datetime) values (%s, %s, %s, %s, %s, %s, now())'
-                    cursor.execute(query, (project_id, 'LINTING', thing[2:], branch, str(results), str(json.dumps(results))))
+                    cursor.execute(query, (project_id, 'LINTING', os.path.relpath(thing, root), branch, str(results), str(json.dumps(results))))
                     self.db.commit()
 
         for thing in os.listdir(start):
             if not thing.startswith(".git") and not thing.startswith("repos"):
                 thing = os.path.join(start, thing)
                 if os.path.isdir(thing):
-                    self.lint_fortran(thing, project_id, cursor, branch)                    
+                    self.lint_fortran(thing, project_id, cursor, branch, root=root)                    
 
-    def lint_cpp(self, start, project_id, cursor, branch):
+    def lint_cpp(self, start, project_id, cursor, branch, root=None):
+        # file paths are stored relative to the top directory of the checkout
+        root = start if root is None else root
 
         for thing in os.listdir(start):
             thing = os.path.join(start, thing)
@@ -1055,7 +1059,7 @@ class DatabaseInterface:
                     try:
                         output = os.popen(
                             "export PYTHONPATH=${PYTHONPATH}:"
-                            + os.path.abspath('.')
+                            + os.path.abspath(root)
                             + " ; . ../meercat/meercat-env/bin/activate ; cpplint --filter=-whitespace "
                             + thing
                             + " 2>&1"
@@ -1084,16 +1088,22 @@ class DatabaseInterface:
                                 pass    
 
                     query = 'replace into database_filemetric (project_id, metric_type, file_path, branch, result_string, result_json, datetime) values (%s, %s, %s, %s, %s, %s, now())'
-                    cursor.execute(query, (project_id, 'LINTING', thing[2:], branch, str(results), str(json.dumps(results))))
+                    cursor.execute(query, (project_id, 'LINTING', os.path.relpath(thing, root), branch, str(results), str(json.dumps(results))))
                     self.db.commit()
 
         for thing in os.listdir(start):
             if not thing.startswith(".git") and not thing.startswith("repos"):
                 thing = os.path.join(start, thing)
                 if os.path.isdir(thing):
-                    self.lint_cpp(thing, project_id, cursor, branch)      
+                    self.lint_cpp(thing, project_id, cursor, branch, root=root)      
 
-    def process_project(self, url, since, until):
+    def process_project(self, url, since, until, watermarks=None, checkpoint=None):
+        '''
+            Mines the git history of a project and stores its authors, commits and diffs.
+            watermarks: dict of ref -> sha mined before, only newer commits are mined if given
+            checkpoint: checkpoint of an interrupted run to resume (see get_checkpoint)
+            Returns the dict of ref -> sha the repository was mined up to, None if it could not be fetched.
+        '''
         name = self.get_git_name(url)
         branches = not self.args.no_branches
         try:
@@ -1103,19 +1113,6 @@ class DatabaseInterface:
         #until = arrow.get(until).datetime.isoformat()
         logger.debug(f'{name}: Mining repository. This may take a while...')
 
-        if url[0] == '/':
-            logger.debug(f'{name}: Working on local repository.')
-            repo_dir = os.path.join(os.getcwd(), 'repos')
-            project = GitCommand(repo_dir)
-            data = project.getRepoCommitData(name, since=since, until=until, includebranches=branches)
-        else:
-            logger.debug(f'{name}: Working on remote repository.')
-            project = GitCommand('.')
-            project.cloneRepo(url)
-            data = project.getRepoCommitData('.', since=since, until=until, includebranches=branches)
-
-        logger.debug(f'{name}: Finished mining repository.')
-
         with closing(self.db.cursor()) as cursor:
 
             # Get project id
@@ -1123,91 +1120,49 @@ class DatabaseInterface:
             cursor.execute(query, (url,))
             project_id = cursor.fetchone()[0]
 
-            if 'ECP-Astro' in url:
-                project_id = 26
-
-            # Insert authors
-            for author in data.keys():
-                entry = author.decode('utf-8')
-                username = entry[:entry.index('<') - 1]
-                email = entry[entry.index('<') + 1:-1]
-
-                query = 'select count(*) from author where username=%s and email=%s'
-                cursor.execute(query, (username, email,))
-                exists = cursor.fetchone()[0] != 0
-                if not exists:
-                    query = 'insert into author (username, email) values (%s, %s)'
-                    cursor.execute(query, (username, email,))
-                    self.db.commit()
-
-                    logger.debug(f'{name}: Inserted new author {username}.')
-
-                # Get author id
-                query = 'select id from author where username=%s and email=%s'
-                cursor.execute(query, (username, email,))
-                author_id = cursor.fetchone()[0]
-
-                # Update bridge table
-                query = 'select count(*) from project_has_author where author_id=%s and project_id=%s'
-                cursor.execute(query, (author_id, project_id,))
-                exists = cursor.fetchone()[0] != 0
-                if not exists:
-                    query = 'insert into project_has_author (author_id, project_id) values (%s, %s)'
-                    cursor.execute(query, (author_id, project_id,))
-                    self.db.commit()
-
-                    logger.debug(f'{name}: Inserted author {author_id} works on project {project_id}')
-
-                logger.debug(f'Author {author_id} commits on project: '+str(len(data[author]['commits'])))
-
-                # Insert commits
-                for commit in data[author]['commits']:
-                    hash = commit['id']
-                    date = commit['date'].decode('utf-8')
-                    dt = arrow.get(date).datetime.strftime('%Y-%m-%d %H:%M:%S')
-                    #dt = datetime.datetime.strptime(date, '%Y-%m-%dT%H:%M:%S%z').strftime('%Y-%m-%d %H:%M:%S')
-                    message = commit['message'].strip()
-                    branches = commit['branches']
-                    query = 'select count(*) from commit where hash=%s'
-                    cursor.execute(query, (hash,))
-                    exists = cursor.fetchone()[0] != 0
-
-                    # Skip existing commits
-                    if exists:
-                        logger.debug(f'{name}: Commit {hash} already exists.')
-                        query = 'update commit set branch=%s where hash=%s'
-                        cursor.execute(query, (branches, hash,))
-                        continue
-
-                    query = f'insert into commit (hash, datetime, author_id, project_id, message, branch) values (%s, %s, %s, %s, %s, %s)'
-
-                    cursor.execute(query, (hash, dt, author_id, project_id, message, branches,))
-                    self.db.commit()
-
-                    logger.debug(f'{name}: Inserted new commit {hash}.')
-
-                    # Get commit id
-                    query = 'select id from commit where hash=%s'
-                    cursor.execute(query, (hash,))
-                    commit_id = cursor.fetchone()[0]
-
-                    # Insert diffs
-                    for diff in commit['diffs']:
-                        body = '\n'.join(diff['diff'])
+        if 'ECP-Astro' in url:
+            project_id = 26
 
-                        filename = diff['filename']
-                        filename = filename[filename.index('/'):filename.index(' ')][1:]
-
-                        diffheader = diff['header']
-
-                        # TODO: Source analysis - programming language
-                        language = 'PLACEHOLDER'
-                        query = f'insert into diff (file_path, language, commit_id, body, header) values (%s, %s, %s, %s, %s)'
-                        cursor.execute(query, (filename, language, commit_id, body, diffheader,))
-                        self.db.commit()
-
-                        logger.debug(f'{name}: Inserted diff in file {filename} for commit {hash}')
+        options = dict(since=since, until=until, includebranches=branches, watermarks=watermarks, shards=self.args.shards, numstat=self.args.numstat,
+                       filelimit=self.args.diff_limit, commitlimit=self.args.commit_limit)
+        if checkpoint:
+            # the commits the interrupted run stored are skipped by hash (see GitCommand.getCommitList)
+            with closing(self.db.cursor()) as cursor:
+                query = 'select hash from commit where project_id=%s'
+                cursor.execute(query, (project_id,))
+                options.update(tips=checkpoint['tips'], skip=set(row[0] for row in cursor.fetchall()))
 
+        if url[0] == '/':
+            logger.debug(f'{name}: Working on local repository.')
+            repo_dir = os.path.join(os.getcwd(), 'repos')
+            project = GitCommand(repo_dir)
+            reponame = name
+        else:
+            logger.debug(f'{name}: Working on remote repository.')
+            # the history is mined straight from a bare mirror that is only fetched into
+            with self.telemetry.stage('clone/fetch'):
+                path = MirrorCache(self.args.mirror_dir).update(url)
+            if not path:
+                logger.error(f'{name}: Could not clone or fetch {url}.')
+                return None
+            project = GitCommand(os.path.dirname(path))
+            reponame = os.path.basename(path)
+
+        # Commits are streamed from git log and written by another thread while the next ones are parsed
+        writer = CommitWriter(self.db, project_id, name, since=since, until=until, watermarks=watermarks, checkpoint=checkpoint,
+                              authors=self.dimension('author', 'username', 'email'), compress=self.args.compress_diffs, telemetry=self.telemetry)
+        pipeline = ThreadedSink(writer)
+        project.mineRepo(reponame, pipeline, **options)
+
+        # parsing runs in this thread, the rest of the time it waits for the output of git
+        # (with --shards, for the processes running git and the parser)
+        timings = pipeline.timings
+        self.telemetry.add('git log', timings['produce'] - timings['produce_cpu'])
+        self.telemetry.add('parse', timings['produce_cpu'], rows=writer.mined - (checkpoint['commits'] if checkpoint else 0))
+        logger.info(f'{name}: Finished mining repository: {timings["produce"]:.1f} s running git and parsing, '
+                    f'{timings["consume"]:.1f} s writing, {timings["wait"]:.1f} s of parsing waited for writing.')
+
+        return project.tips
 
     def add_events(self, url):
         with closing(self.db.cursor()) as cursor:
@@ -1220,165 +1175,29 @@ class DatabaseInterface:
             cursor.execute(query, (url,))
             project_id = cursor.fetchone()[0]
 
-            GitHubAPIClient.set_credentials(username=GITHUB_LOGIN, token=GITHUB_TOKEN)
+            # one scheduler for the run, so it keeps track of the rate limits
+            if GitHubAPIClient.scheduler is None:
+                GitHubAPIClient.set_credentials(username=GITHUB_LOGIN, token=GITHUB_TOKEN, tokens=GITHUB_TOKENS)
+            if GitHubAPIClient.cache is None and not self.args.no_http_cache:
+                GitHubAPIClient.set_cache(self.args.http_cache)
             GitHubAPIClient.check_credentials()
 
             logger.debug(f'{repo}: Grabbing GitHub events from API...')
-            data = GitHubAPIClient.fetch_events(owner=owner, repository=repo)
-
-            for event in data:
-                # Check if new event
-                api_id = event['id']
-                type = event['type']
-                public = event['public']
-                created_at = event['created_at']
-                created_at = arrow.get(created_at).datetime.strftime('%Y-%m-%d %H:%M:%S')
-                query = f'select count(*) from event where api_id=%s and created_at=%s and project_id=%s'
-                cursor.execute(query, (api_id, created_at, project_id))
-                exists = cursor.fetchone()[0] != 0
-                if exists:
-                    logger.debug(f'{repo}: Found existing event. Skipping...')
-                    continue
-
-                # Insert Event Actor
-                actor_id = event['actor']['id']
-                login = event['actor']['login']
-                url = event['actor']['url']
-                avatar_url = event['actor']['avatar_url']
-                gravatar_id = event['actor']['gravatar_id']
-
-                query = 'select count(*) from event_actor where login=%s and url=%s and actor_id=%s'
-                cursor.execute(query, (login, url, actor_id,))
-                exists = cursor.fetchone()[0] != 0
-
-                if not exists:
-                    logger.debug(f'{repo}: Inserted new event actor {login}')
-                    query = 'insert into event_actor (actor_id, login, url, avatar_url, gravatar_id) values (%s, %s, %s, %s, %s)'
-                    cursor.execute(query, (actor_id, login, url, avatar_url, gravatar_id))
-                    self.db.commit()
-
-                query = 'select id from event_actor where login=%s and url=%s and actor_id=%s'
-                cursor.execute(query, (login, url, actor_id,))
-                event_actor_id = cursor.fetchone()[0]
-
-                # Insert Event Repo
-                repo_id = event['repo']['id']
-                name = event['repo']['name']
-                url = event['repo']['url']
-
-                query = 'select count(*) from event_repo where repo_id=%s and name=%s and url=%s'
-                cursor.execute(query, (repo_id, name, url,))
-                exists = cursor.fetchone()[0] != 0
-
-                if not exists:
-                    logger.debug(f'{repo}: Inserted new event repo {name}')
-                    query = 'insert into event_repo (repo_id, name, url) values (%s, %s, %s)'
-                    cursor.execute(query, (repo_id, name, url,))
-                    self.db.commit()
-
-                query = 'select id from event_repo where repo_id=%s and name=%s and url=%s'
-                cursor.execute(query, (repo_id, name, url,))
-                event_repo_id = cursor.fetchone()[0]
-
-                # Insert Event Org
-                org_id = event['org']['id']
-                login = event['org']['login']
-                url = event['org']['url']
-                avatar_url = event['org']['avatar_url']
-                gravatar_id = event['org']['gravatar_id']
-
-                query = 'select count(*) from event_org where login=%s and url=%s and org_id=%s'
-                cursor.execute(query, (login, url, org_id,))
-                exists = cursor.fetchone()[0] != 0
-
-                if not exists:
-                    logger.debug(f'{repo}: Inserted new event org {login}')
-                    query = 'insert into event_org (org_id, login, url, avatar_url, gravatar_id) values (%s, %s, %s, %s, %s)'
-                    cursor.execute(query, (org_id, login, url, avatar_url, gravatar_id))
-                    self.db.commit()
-
-                query = 'select id from event_org where login=%s and url=%s and org_id=%s'
-                cursor.execute(query, (login, url, org_id,))
-                event_org_id = cursor.fetchone()[0]
-
-                # Insert Event Payload
-
-                def get_payload(attribute, key=None):
-                    try:
-                        result = event['payload'][attribute]
-                        if key:
-                            result = result[key]
-                    except KeyError:
-                        result = None
-                    return result
-
-                action = get_payload('action')
-                ref = get_payload('ref')
-                ref_type = get_payload('ref_type')
-                master_branch = get_payload('master_branch')
-                description = get_payload('description')
-                forkee_url = get_payload('forkee', 'html_url')
-                issue_url = get_payload('issue', 'html_url')
-                comment_url = get_payload('comment', 'html_url')
-                member_login = get_payload('member_login')
-                pr_number = get_payload('number')
-                pr_url = get_payload('pull_request', 'html_url')
-                pr_review_url = get_payload('review', 'html_url')
-                push_id = get_payload('push_id')
-                size = get_payload('size')
-                distinct_size = get_payload('distinct_size')
-                head_sha = get_payload('head')
-                before_sha = get_payload('before')
-                release_url = get_payload('release', 'html_url')
-                effective_date = get_payload('effective_date')
-
-                logger.debug(f'{repo}: Inserted new event payload')
-                query = '''insert into event_payload (action, ref, ref_type, master_branch, description, forkee_url, issue_url, comment_url, member_login, pr_number, pr_url, pr_review_url, push_id, size, distinct_size, head_sha, before_sha, release_url, effective_date) values (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'''
-                cursor.execute(query, (action, ref, ref_type, master_branch, description, forkee_url, issue_url, comment_url, member_login, pr_number, pr_url, pr_review_url, push_id, size, distinct_size, head_sha, before_sha, release_url, effective_date))
-                self.db.commit()
-
-                event_payload_id = cursor.lastrowid # may want to use this for other cases...
-
-                # Insert Event Pages (GollumEvent (i.e. Wiki changes))
-                if get_payload('pages'):
-                    page_ids = []
-                    for page in get_payload('pages'):
-                        name = page['name']
-                        title = page['title']
-                        action = page['action']
-                        sha = page['sha']
-                        url = page['html_url']
-
-                        query = 'select count(*) from event_page where name=%s and url=%s'
-                        cursor.execute(query, (name, url,))
-                        exists = cursor.fetchone()[0] != 0
-
-                        logger.debug(f'{repo}: Inserted new event page {name}')
-                        query = 'insert into event_page (name, title, action, sha, url) values (%s, %s, %s, %s, %s)'
-                        cursor.execute(query, (name, title, action, sha, url,))
-                        self.db.commit()
-
-                        query = 'select id from event_org where name=%s and url=%s'
-                        cursor.execute(query, (name, url,))
-                        event_page_id = cursor.fetchone()[0]
-                        page_ids.append(event_page_id)
-
-                    for page_id in page_ids:
-                        query = f'select count(*) from event_page where id=%s'
-                        cursor.execute(query, (page_id,))
-                        exists = cursor.fetchone()[0] != 0
-
-                        if not exists:
-                            logger.debug(f'{repo}: Inserted new event has event page')
-                            query = 'insert into event_has_page (payload, page) values (%s, %s)'
-                            cursor.execute(query, (event_payload_id, page_id))
-                            self.db.commit()
-
-                # Insert Event
-                logger.debug(f'{repo}: Inserted new event {type}')
-                query = 'insert into event (project_id, api_id, type, public, created_at, payload_id, repo_id, actor_id, org_id) values (%s, %s, %s, %s, %s, %s, %s, %s, %s)'
-                cursor.execute(query, (project_id, api_id, type, public, created_at, event_payload_id, event_repo_id, event_actor_id, event_org_id))
-                self.db.commit()
+            with self.telemetry.stage('event fetch'):
+                data = GitHubAPIClient.fetch_events(owner=owner, repository=repo)
+            self.telemetry.count('event fetch', len(data))
+            if GitHubAPIClient.cache:
+                GitHubAPIClient.cache.report()
+
+            writer = EventWriter(self.db, project_id, repo,
+                                 actors=self.dimension('event_actor', 'login', 'url', 'actor_id'),
+                                 repos=self.dimension('event_repo', 'repo_id', 'name', 'url'),
+                                 orgs=self.dimension('event_org', 'login', 'url', 'org_id'),
+                                 pages=self.dimension('event_page', 'name', 'url'))
+            with self.telemetry.stage('event write'):
+                stored = writer.store(cursor, data)
+            self.telemetry.count('event write', stored)
+            logger.debug(f'{repo}: Stored {stored} of {len(data)} events, the others were stored before.')
 
 if __name__ == '__main__':
     DatabaseInterface().run()
@@ -0,0 +1,118 @@
+import logging
+
+# Setup Logger
+logger = logging.getLogger('db_interface')
+
+
+def natural_key(key):
+    '''
+        Normalizes a natural key the way the (case insensitive) MySQL collation compares it.
+    '''
+    return tuple(value.casefold() if isinstance(value, str) else value for value in key)
+
+
+class DimensionCache:
+    '''
+        Natural key -> id cache for a dimension table such as author, label, issue_tag or commit_tag.
+
+        The whole table is loaded with one select on first use. Missing rows are requested
+        while going through the data, and flush looks them up in the table again before
+        writing the ones still missing with one executemany, so rows added by another cache
+        or process since the load are reused instead of inserted twice. The ids of the new
+        rows are read back by their keys. NULL key values are matched like any other value.
+    '''
+
+    # natural keys per select of flush
+    chunk_size = 500
+
+    def __init__(self, table, keys):
+        '''
+            table: name of the dimension table
+            keys: names of the columns of the natural key, e.g. ('username', 'url')
+        '''
+        self.table = table
+        self.keys = tuple(keys)
+        self.ids = None
+        # natural key -> (key values, other column values) of the rows to insert
+        self.pending = {}
+
+    def load(self, cursor):
+        query = 'select id, %s from %s' % (', '.join(self.keys), self.table)
+        cursor.execute(query)
+        self.ids = {}
+        self.add_rows(cursor.fetchall())
+        logger.debug(f'Loaded {len(self.ids)} rows of {self.table}.')
+
+    def add_rows(self, rows):
+        for row in rows:
+            # the first row wins, like the select ... limit 1 it replaces
+            self.ids.setdefault(natural_key(row[1:]), row[0])
+
+    def request(self, cursor, key, **values):
+        '''
+            Makes sure a row exists for the key after the next flush.
+            values: other columns to insert if the row is missing, e.g. email='...'
+        '''
+        if self.ids is None:
+            self.load(cursor)
+        nkey = natural_key(key)
+        if nkey not in self.ids and nkey not in self.pending:
+            self.pending[nkey] = (tuple(key), values)
+
+    def select_rows(self, cursor, keys):
+        '''
+            Returns the (id, key values...) rows of the table with the given natural keys.
+        '''
+        rows = []
+        for start in range(0, len(keys), self.chunk_size):
+            conditions, args = [], []
+            for key in keys[start:start + self.chunk_size]:
+                conditions.append('(%s)' % ' and '.join('%s is null' % column if value is None else '%s = %%s' % column
+                                                        for column, value in zip(self.keys, key)))
+                args.extend(value for value in key if value is not None)
+            query = 'select id, %s from %s where %s' % (', '.join(self.keys), self.table, ' or '.join(conditions))
+            cursor.execute(query, args)
+            rows.extend(cursor.fetchall())
+        return rows
+
+    def flush(self, cursor):
+        '''
+            Inserts the requested rows that are missing, grouped by the columns they set.
+            Returns the number of rows inserted.
+        '''
+        if not self.pending:
+            return 0
+
+        # rows added since the table was loaded
+        self.add_rows(self.select_rows(cursor, [key for key, values in self.pending.values()]))
+        missing = [(key, values) for nkey, (key, values) in self.pending.items() if nkey not in self.ids]
+
+        groups = {}
+        for key, values in missing:
+            columns = tuple(sorted(values))
+            groups.setdefault(columns, []).append(key + tuple(values[column] for column in columns))
+        for columns, rows in groups.items():
+            names = self.keys + columns
+            query = 'insert into %s (%s) values (%s)' % (self.table, ', '.join(names), ', '.join(['%s'] * len(names)))
+            cursor.executemany(query, rows)
+        if missing:
+            self.add_rows(self.select_rows(cursor, [key for key, values in missing]))
+
+        inserted = len(missing)
+        logger.debug(f'Inserted {inserted} rows into {self.table}.')
+        self.pending = {}
+        return inserted
+
+    def get(self, cursor, key, **values):
+        '''
+            Returns the id of the row for the key, inserting it if needed.
+        '''
+        self.request(cursor, key, **values)
+        self.flush(cursor)
+        return self.ids[natural_key(key)]
+
+    def __getitem__(self, key):
+        '''
+            Returns the id of a row that is known to exist (requested and flushed before).
+        '''
+        return self.ids[natural_key(key)]
@@ -0,0 +1,152 @@
+import datetime
+import logging
+
+from .dimensions import DimensionCache
+
+# Setup Logger
+logger = logging.getLogger('db_interface')
+
+# event_payload column -> (payload attribute, key in the attribute)
+PAYLOAD_COLUMNS = {
+    'action': ('action', None),
+    'ref': ('ref', None),
+    'ref_type': ('ref_type', None),
+    'master_branch': ('master_branch', None),
+    'description': ('description', None),
+    'forkee_url': ('forkee', 'html_url'),
+    'issue_url': ('issue', 'html_url'),
+    'comment_url': ('comment', 'html_url'),
+    'member_login': ('member_login', None),
+    'pr_number': ('number', None),
+    'pr_url': ('pull_request', 'html_url'),
+    'pr_review_url': ('review', 'html_url'),
+    'push_id': ('push_id', None),
+    'size': ('size', None),
+    'distinct_size': ('distinct_size', None),
+    'head_sha': ('head', None),
+    'before_sha': ('before', None),
+    'release_url': ('release', 'html_url'),
+    'effective_date': ('effective_date', None),
+}
+
+
+def event_time(value):
+    '''
+        Converts the created_at of a GitHub event (e.g. 2021-03-01T10:00:00Z) to a MySQL datetime.
+    '''
+    created_at = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return created_at.astimezone(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def payload_row(payload):
+    row = []
+    for attribute, key in PAYLOAD_COLUMNS.values():
+        value = payload.get(attribute)
+        if key and value is not None:
+            value = value.get(key)
+        row.append(value)
+    return tuple(row)
+
+
+class EventWriter:
+    '''
+        Stores the GitHub events of a project (from GitHubAPIClient.fetch_events) in batches.
+
+        Events already stored for the project are skipped with one lookup. The actors, repos,
+        orgs and wiki pages of the new events are deduplicated through DimensionCaches. The
+        payloads are inserted one by one to get their ids, and the event pages and events
+        with one executemany each, so a batch takes one commit however many events it has.
+    '''
+
+    def __init__(self, db, project_id, name, actors=None, repos=None, orgs=None, pages=None):
+        '''
+            actors, repos, orgs, pages: DimensionCaches of event_actor by (login, url, actor_id),
+            event_repo by (repo_id, name, url), event_org by (login, url, org_id) and
+            event_page by (name, url), shared with the other projects of the run
+        '''
+        self.db = db
+        self.project_id = project_id
+        self.name = name
+        self.actors = actors if actors is not None else DimensionCache('event_actor', ('login', 'url', 'actor_id'))
+        self.repos = repos if repos is not None else DimensionCache('event_repo', ('repo_id', 'name', 'url'))
+        self.orgs = orgs if orgs is not None else DimensionCache('event_org', ('login', 'url', 'org_id'))
+        self.pages = pages if pages is not None else DimensionCache('event_page', ('name', 'url'))
+
+    @staticmethod
+    def actor_key(event):
+        actor = event['actor']
+        return (actor['login'], actor['url'], actor['id'])
+
+    @staticmethod
+    def repo_key(event):
+        repo = event['repo']
+        return (repo['id'], repo['name'], repo['url'])
+
+    @staticmethod
+    def org_key(event):
+        org = event['org']
+        return (org['login'], org['url'], org['id'])
+
+    def new_events(self, cursor, events):
+        '''
+            Returns the events that are not stored for the project yet, each one once.
+        '''
+        events = list({int(event['id']): event for event in events}.values())
+        if not events:
+            return []
+        query = 'select api_id from event where project_id=%s and api_id in (%s)' % ('%s', ', '.join(['%s'] * len(events)))
+        cursor.execute(query, [self.project_id] + [int(event['id']) for event in events])
+        stored = set(row[0] for row in cursor.fetchall())
+        return [event for event in events if int(event['id']) not in stored]
+
+    def add_payloads(self, cursor, events):
+        '''
+            Inserts the payloads of the events, returns their ids in the same order.
+        '''
+        # one insert per payload: the ids of a multi-row insert need not be consecutive,
+        # and a concurrent run may insert payloads in between
+        query = 'insert into event_payload (%s) values (%s)' % (', '.join(PAYLOAD_COLUMNS), ', '.join(['%s'] * len(PAYLOAD_COLUMNS)))
+        payload_ids = []
+        for event in events:
+            cursor.execute(query, payload_row(event['payload']))
+            payload_ids.append(cursor.lastrowid)
+        return payload_ids
+
+    def store(self, cursor, events):
+        '''
+            Stores the events that are new for the project. Returns the number of events stored.
+        '''
+        events = self.new_events(cursor, events)
+        if not events:
+            return 0
+
+        for event in events:
+            actor, org = event['actor'], event['org']
+            self.actors.request(cursor, self.actor_key(event), avatar_url=actor['avatar_url'], gravatar_id=actor['gravatar_id'])
+            self.repos.request(cursor, self.repo_key(event))
+            self.orgs.request(cursor, self.org_key(event), avatar_url=org['avatar_url'], gravatar_id=org['gravatar_id'])
+            # wiki changes (GollumEvent)
+            for page in event['payload'].get('pages') or []:
+                self.pages.request(cursor, (page['name'], page['html_url']), title=page['title'], action=page['action'], sha=page['sha'])
+        for cache in (self.actors, self.repos, self.orgs, self.pages):
+            cache.flush(cursor)
+
+        payload_ids = self.add_payloads(cursor, events)
+
+        rows = []
+        for event, payload_id in zip(events, payload_ids):
+            for page in event['payload'].get('pages') or []:
+                rows.append((payload_id, self.pages[(page['name'], page['html_url'])]))
+        if rows:
+            query = 'insert into event_has_page (payload_id, page_id) values (%s, %s)'
+            cursor.executemany(query, rows)
+
+        query = 'insert into event (project_id, api_id, type, public, created_at, payload_id, repo_id, actor_id, org_id) values (%s, %s, %s, %s, %s, %s, %s, %s, %s)'
+        rows = [(self.project_id, int(event['id']), event['type'], event['public'], event_time(event['created_at']), payload_id,
+                 self.repos[self.repo_key(event)], self.actors[self.actor_key(event)], self.orgs[self.org_key(event)])
+                for event, payload_id in zip(events, payload_ids)]
+        cursor.executemany(query, rows)
+        self.db.commit()
+
+        logger.debug(f'{self.name}: Stored {len(rows)} new events.')
+        return len(rows)
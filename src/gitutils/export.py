@@ -0,0 +1,174 @@
+'''
+    Export of mined projects to partitioned Parquet datasets for offline analysis.
+
+    Each table is written to its own dataset under the export directory, partitioned by
+    project and month (hive style, e.g. commits/project=spack/month=2021-03/part-0-0.parquet),
+    so pandas, pyarrow or DuckDB read only the columns and partitions they need:
+
+        pandas.read_parquet('export/diffs', columns=['file_path', 'locc'], filters=[('project', '=', 'spack')])
+        duckdb.sql("select month, sum(locc) from 'export/diffs/*/*/*.parquet' group by month")
+
+    pyarrow is only needed for the export.
+'''
+
+import datetime
+import logging
+import os
+import shutil
+import zlib
+
+# Setup Logger
+logger = logging.getLogger('db_interface')
+
+# rows read per query and written per Parquet file
+BATCH_SIZE = 20000
+
+# name -> (query, columns with their types, columns whose first non-NULL value gives the month)
+# Each query selects the id first and is paged by it, see ParquetExporter.rows
+DATASETS = {
+    'commits': (
+        'select commit.id, commit.hash, commit.datetime, commit.author_id, commit.branch, commit.message '
+        'from commit where commit.project_id=%s and commit.id > %s order by commit.id limit %s',
+        [('id', 'int'), ('hash', 'str'), ('datetime', 'time'), ('author_id', 'int'), ('branch', 'str'), ('message', 'str')],
+        ('datetime',)),
+    'diffs': (
+        'select diff.id, diff.commit_id, commit.hash, commit.datetime, diff.file_path, diff.language, '
+        'diff.lines_added, diff.lines_removed, diff.body, diff_blob.data '
+        'from diff join commit on diff.commit_id=commit.id left join diff_blob on diff.blob_id=diff_blob.id '
+        'where commit.project_id=%s and diff.id > %s order by diff.id limit %s',
+        [('id', 'int'), ('commit_id', 'int'), ('hash', 'str'), ('datetime', 'time'), ('file_path', 'str'), ('language', 'str'),
+         ('lines_added', 'int'), ('lines_removed', 'int'), ('locc', 'int'), ('body', 'str')],
+        ('datetime',)),
+    'authors': (
+        'select author.id, author.username, author.email, author.name, author.url '
+        'from author join project_has_author on project_has_author.author_id=author.id '
+        'where project_has_author.project_id=%s and author.id > %s order by author.id limit %s',
+        [('id', 'int'), ('username', 'str'), ('email', 'str'), ('name', 'str'), ('url', 'str')],
+        ()),
+    'prs': (
+        'select pr.id, pr.number, pr.title, pr.description, pr.state, pr.locked, pr.url, pr.head_sha, pr.author_id, '
+        'pr.created_at, pr.updated_at, pr.merged_at '
+        'from pr where pr.project_id=%s and pr.id > %s order by pr.id limit %s',
+        [('id', 'int'), ('number', 'int'), ('title', 'str'), ('description', 'str'), ('state', 'str'), ('locked', 'bool'),
+         ('url', 'str'), ('head_sha', 'str'), ('author_id', 'int'), ('created_at', 'time'), ('updated_at', 'time'), ('merged_at', 'time')],
+        ('created_at', 'updated_at')),
+    'issues': (
+        'select issue.id, issue.number, issue.title, issue.description, issue.state, issue.locked, issue.url, issue.author_id, '
+        'issue.created_at, issue.updated_at, issue.closed_at '
+        'from issue where issue.project_id=%s and issue.id > %s order by issue.id limit %s',
+        [('id', 'int'), ('number', 'int'), ('title', 'str'), ('description', 'str'), ('state', 'str'), ('locked', 'bool'),
+         ('url', 'str'), ('author_id', 'int'), ('created_at', 'time'), ('updated_at', 'time'), ('closed_at', 'time')],
+        ('created_at', 'updated_at')),
+    'comments': (
+        'select comment.id, comment.issue_id, comment.pr_id, comment.author_id, comment.created_at, comment.updated_at, comment.body '
+        'from comment left join issue on comment.issue_id=issue.id left join pr on comment.pr_id=pr.id '
+        'where coalesce(issue.project_id, pr.project_id)=%s and comment.id > %s order by comment.id limit %s',
+        [('id', 'int'), ('issue_id', 'int'), ('pr_id', 'int'), ('author_id', 'int'), ('created_at', 'time'), ('updated_at', 'time'), ('body', 'str')],
+        ('created_at',)),
+}
+
+
+def utc(value):
+    # datetime columns hold UTC, stored as naive timestamps
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def diff_row(row):
+    '''
+        Decompresses the body of a diff row (see --compress_diffs) and computes its LOCC,
+        like Diff.body and Diff.loc_count.
+    '''
+    *columns, body, data = row
+    if data is not None:
+        body = zlib.decompress(bytes(data)).decode('utf-8')
+    lines_added, lines_removed = columns[6], columns[7]
+    if lines_added is not None and lines_removed is not None:
+        locc = lines_added + lines_removed
+    else:
+        locc = body.count('\n+') + body.count('\n-')
+    return tuple(columns) + (locc, body)
+
+
+class ParquetExporter:
+    '''
+        Writes the commits, diffs, authors, PRs, issues and comments of a project from the
+        database to Parquet datasets under a directory. An export replaces the previous
+        export of the same project.
+    '''
+
+    def __init__(self, db, directory, batch_size=BATCH_SIZE):
+        import pyarrow
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.db = db
+        self.directory = directory
+        self.batch_size = batch_size
+        self.types = {'int': pyarrow.int64(), 'str': pyarrow.string(), 'time': pyarrow.timestamp('us'), 'bool': pyarrow.bool_()}
+
+    def rows(self, cursor, dataset, project_id):
+        '''
+            Yields the rows of a dataset for a project a batch at a time, paging by id
+            so no query holds more than one batch in memory.
+        '''
+        query = DATASETS[dataset][0]
+        last_id = 0
+        while True:
+            cursor.execute(query, (project_id, last_id, self.batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            if dataset == 'diffs':
+                rows = [diff_row(row) for row in rows]
+            yield rows
+
+    def table(self, dataset, name, rows):
+        '''
+            Converts rows to an Arrow table with the project and month partition columns.
+        '''
+        query, columns, month_columns = DATASETS[dataset]
+        values = {column: [] for column, kind in columns}
+        months = []
+        for row in rows:
+            row = dict(zip([column for column, kind in columns], row))
+            for column, kind in columns:
+                value = row[column]
+                if value is not None and kind == 'time':
+                    value = utc(value)
+                elif value is not None and kind == 'bool':
+                    value = bool(value)
+                values[column].append(value)
+            if month_columns:
+                dates = [row[column] for column in month_columns if row[column] is not None]
+                months.append(dates[0].strftime('%Y-%m') if dates else 'unknown')
+
+        arrays = [self.pa.array(values[column], type=self.types[kind]) for column, kind in columns]
+        names = [column for column, kind in columns]
+        arrays.append(self.pa.array([name] * len(rows), type=self.pa.string()))
+        names.append('project')
+        if month_columns:
+            arrays.append(self.pa.array(months, type=self.pa.string()))
+            names.append('month')
+        return self.pa.Table.from_arrays(arrays, names=names)
+
+    def export(self, project_id, name):
+        '''
+            Exports all the datasets of a project. Returns dataset -> number of rows written.
+        '''
+        counts = {}
+        with self.db.cursor() as cursor:
+            for dataset, (query, columns, month_columns) in DATASETS.items():
+                root = os.path.join(self.directory, dataset)
+                shutil.rmtree(os.path.join(root, f'project={name}'), ignore_errors=True)
+                partitions = ['project', 'month'] if month_columns else ['project']
+
+                counts[dataset] = 0
+                for batch, rows in enumerate(self.rows(cursor, dataset, project_id)):
+                    self.pq.write_to_dataset(self.table(dataset, name, rows), root, partition_cols=partitions,
+                                             basename_template=f'part-{batch}-{{i}}.parquet', existing_data_behavior='overwrite_or_ignore')
+                    counts[dataset] += len(rows)
+                logger.debug(f'{name}: Exported {counts[dataset]} {dataset} to {root}.')
+        return counts
@@ -2,9 +2,14 @@ import os
 import sys
 
 import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 
 
-from .command import Command
+from .command import Command, CommandError
+from .logparser import COMMIT_LIMIT, FILE_LIMIT, AuthorSink, ListSink, parseCommitLog
+from .mirror import MirrorCache
 from .utils import *
 
 # Setup Logger
@@ -17,46 +22,40 @@ logger = logging.getLogger('db_interface')
 #ch.setFormatter(fmt=formatter)
 #logger.addHandler(hdlr=ch)
 
+# git log options for patches and for per-file line counts only (numstat mode),
+# renames are always detected so a renamed file is not a deletion and an addition
+LOG_PATCH = '-p -M --date=iso-strict-local --function-context'
+LOG_NUMSTAT = '--numstat -M --date=iso-strict-local'
+
 class GitCommand(object):
 
-    def __init__(self, dir=None):
+    def __init__(self, dir=None, mirrors=None):
         if dir == None:
             self.tmpdir = os.path.abspath(os.path.join(os.environ['HOME'], '.ideas-temp'))
             if not os.path.exists(self.tmpdir): os.mkdir(self.tmpdir)
         else:
             self.tmpdir = dir
+        # mirror.MirrorCache used by cloneRepo, the default one is created on first use
+        self.mirrors = mirrors
 
     #Clone a repo
     def cloneRepo(self, url):
         """
-        Clone a reposotory into a temporary local directory.
+        Check out a repository in a local directory named after it (in self.tmpdir).
+        The repository is cloned once into a mirror cache (see mirror.MirrorCache)
+        and only fetched into afterwards; the directory is a worktree of the mirror
+        with a clean checkout of the default branch, local changes are discarded.
         :argument url the repository URL
         returns True if successful, False otherwise
         """
-        try:
-            os.chdir(self.tmpdir)
-        except Exception as e:
-            return err("Could not change to directory %s: %s" % (self.tmpdir, str(e)))
+        mirrors = self.mirrors if self.mirrors is not None else MirrorCache()
+        if not mirrors.update(url):
+            return False
 
-        #local_repo_path = url[url.rfind('/')+1:url.rfind('.')]
         local_repo_path = removeSuffix(os.path.split(url)[-1], '.git')
         if not local_repo_path: local_repo_path=url.split('/')[-1]
-        if not os.path.exists(local_repo_path):
-            try:
-                os.system('git clone ' + url)
-            except Exception as e:
-                return err("Could not clone repository %s: %s" % (url, str(e)))
-
-        os.chdir(local_repo_path)
-
-        # pull for the latest in case it was previously cloned
-        try:
-            os.system('git pull')
-        except Exception as e:
-            return err("Could not 'git pull' repository %s: %s" % (local_repo_path,
-                                                                   str(e)))
-
-        os.chdir(self.tmpdir)  # back to the parent dir
+        if not mirrors.addWorktree(url, os.path.join(self.tmpdir, local_repo_path)):
+            return False
         return True
 
     #Get all the versions of a repo
@@ -75,315 +74,286 @@ class GitCommand(object):
 
     #Get all commits in all the versions of a repo since data (default: utc epoch) and group by author
     # TODO: default args for since and until
-    def getRepoCommitData(self, reponame, includebranches = False, since = None, until = None):
-        prefix,versions = self.getRepoVersions(reponame)
-
-        commits = {}
-
-        for version in versions:
-            #checkout the versions
-            logger.debug('git checkout %s%s' % (prefix,version))
-            retcode, out, err = Command('git checkout %s%s' % (prefix,version)).run(dryrun=False)
-            #print(out)
-
-
-        #git log -p # this will list all commits and the code additions in addition to dates and messages.
-        # function-context for python just adds all the surrounding lines of code to the diff output
-        logger.debug(f'git log -p --branches=* --all --date=iso-strict-local --function-context --since {since} --until {until}')
-        retcode, out, err = Command(f'git log -p --branches=* --all --date=iso-strict-local --function-context --since {since} --until {until}').run()
-        lines = iter(out.splitlines())
-
-        current_author = ''
-        for line in lines:
-
-
-            #If the line is an author, then start to piece together the commit
-            #if line.startswith(b'Author: '):
-            if line.startswith(b'commit'):
-
-                commitid = line[7:len(line)]
-                commitid = commitid.decode('utf-8')
-                commitid = commitid.strip('\n')
-
-                #Retrieve all branches that contains this commit
-                branches = ''
-                if includebranches:
-                    retcode, branches, err = Command('git branch -a --contains %s' % commitid).run()
-
-                line = next(lines)
-                #print(line)
-
-                if line.startswith(b'Author: '):
-
-                    current_author = line[8:len(line)]
-
-                    #track the number of commits for this author
-                    if current_author in commits:
-                        commits[current_author]['total_commits'] += 1
-                    else:
-                        commits[current_author] = {'total_commits':1, 'commits':[]}
-
-                    #get the commit date
-                    rawdate = next(lines)
-                    date = rawdate[8:len(rawdate)]
-
-                    #print(rawdate)
-
-                    #get the commit message
-                    next(lines)
-                    message = ''
-                    m = next(lines)
-                    #print(m)
-                    while len(m) > 1:
-                        message += (m + b'\n').decode("utf-8")
-                        try:
-                            m = next(lines)
-                        except StopIteration:
-                            m = ''
-
-                    #get the diffs
-                    #this code will iterate over the lines trying to pull just the +/- info from the diff output
-                    diffs = []
-                    try:
-                        diff = next(lines)
-                        while len(diff) > 0 and diff.startswith(b'\\') == False:
-                            if diff.startswith(b'diff'):
-                                #next(lines)
-                                #next(lines)
-                                #next(lines)
-                                filenameline = diff.decode("utf-8")
-                                filename = filenameline[11:len(filenameline)]
-                                #print('FILENAME '+ filename)
-
-                                diffheader = diff
-
-                                line = next(lines)
-                                diffheader += line
-
-                                #skip extra line if this line is seen
-                                if line.startswith(b'new file mode'):
-                                    diffheader += next(lines)
-                                    diff = next(lines)
-                                    diffheader += diff
-                                    if diff.startswith(b'diff'):
-                                        break
-
-                                if not line.startswith(b'deleted file mode') and not line.startswith(b'old mode'):
-
-                                    #skip just one line if this line is seen
-                                    if line.startswith(b'new file mode'):
-                                        diffheader += next(lines)
-
-                                    else:
-                                        diffheader += next(lines)
-                                        diffheader += next(lines)
-
-                                    #skip ahead until see first + or -
-                                    diff = next(lines)
-                                    diffheader += diff
-                                    # while not (diff.startswith(b'+') or diff.startswith(b'-')) or (diff.startswith(b'+++') or diff.startswith(b'---')) :
-                                    #     diff = next(lines)
-                                    #diff = next(lines)
-
-                                    diffinfo = []
-                                    while len(diff) >= 1:
-
-                                        if diff.startswith(b'diff'):
-                                            break
-
-                                        # if (diff.startswith(b'+') or diff.startswith(b'-')):
-                                        diffinfo.append(diff.decode("utf-8", errors='ignore'))
-
-                                        # elif diff.startswith(b'diff'):
-                                        #     break
-                                        # elif len(diff) < 2:
-                                        #     try:
-                                        #         diff = next(lines)
-                                        #         if len(diff) < 2:
-                                        #             break
-                                        #     except:
-                                        #         break
-
-
-                                        try:
-                                            diff = next(lines)
-                                        except:
-                                            break
-
-                                    diffs.append({'filename':filename, 'diff':diffinfo, 'header':diffheader.decode("utf-8", errors='ignore')})
-
-                                #else:
-                                    #ignore deleted files for now
-                            else:
-                                try:
-                                    diff = next(lines)
-                                except:
-                                    break
-                    except:
-                        print('Done with commits from this repo.')
-
-                    #add the commit to the author's list of commits.
-                    commits[current_author]['commits'].append({'id':commitid, 'date':date, 'message':message, 'diffs':diffs, 'branches':branches})
-
-                elif line.startswith(b'Merge: '):
-                    #ignore merges
-                    next(lines)
-
-            #else:
-                #ignore anything else until next author line
-
-        #print(commits)
-        return commits
-
-
-    #Get all commits in all versions of repo and put in flat list
-    def getAllCommits(self, reponame, includebranches = False):
-
-        prefix,versions = self.getRepoVersions(reponame)
-
-        commits = []
-
-        for version in versions:
-            #checkout the versions
-            print('git checkout %s%s' % (prefix,version))
-            retcode, out, err = Command('git checkout %s%s' % (prefix,version)).run(dryrun=False)
-            print(out)
-
-
-        #git log -p # this will list all commits and the code additions in addition to dates and messages.
-        # function-context for python just adds all the surrounding lines of code to the diff output
-        retcode, out, err = Command('git log -p --date=iso-strict-local --function-context').run()
-        lines = iter(out.splitlines())
-
-        #current_author = ''
-        for line in lines:
-
-
-            #If the line is an author, then start to piece together the commit
-            if line.startswith(b'commit'):
-
-                commitid = line[7:len(line)]
-                commitid = commitid.strip('\n')
-
-                #Retrieve all branches that contains this commit
-                branches = ''
-                if includebranches:
-                    retcode, branches, err = Command('git branch -a --contains %s' % commitid).run()
-
-                line = next(lines)
-                #print(line)
-
-                if line.startswith(b'Author: '):
-
-                    #get the commit date
-                    rawdate = next(lines)
-                    date = rawdate[8:len(rawdate)]
-
-                    #print(rawdate)
-
-                    #get the commit message
-                    next(lines)
-                    message = ''
-                    m = next(lines)
-                    #print(m)
-                    while len(m) > 1:
-                        message += (m + b'\n').decode("utf-8")
-                        try:
-                            m = next(lines)
-                        except StopIteration:
-                            m = ''
+    def getRepoCommitData(self, reponame, includebranches = False, since = None, until = None, watermarks = None):
+        return self.mineRepo(reponame, AuthorSink(), includebranches=includebranches, since=since, until=until, watermarks=watermarks)
 
-                    #get the diffs
-                    #this code will iterate over the lines trying to pull just the +/- info from the diff output
-                    diffs = []
-                    try:
-                        diff = next(lines)
-                        while len(diff) > 0 and diff.startswith(b'\\') == False:
-                            if diff.startswith(b'diff'):
-                                #next(lines)
-                                #next(lines)
-                                #next(lines)
-                                filenameline = diff.decode("utf-8")
-                                filename = filenameline[11:len(filenameline)]
-                                #print('FILENAME '+ filename)
 
-                                diffheader = diff 
-
-                                line = next(lines)
-                                diffheader += line
-
-                                #skip extra line if this line is seen
-                                if line.startswith(b'new file mode'):
-                                    diffheader += next(lines)
-                                    diff = next(lines)
-                                    diffheader += diff
-                                    if diff.startswith(b'diff'):
-                                        break
-
-                                if not line.startswith(b'deleted file mode') and not line.startswith(b'old mode'):
+    #Feed all commits of a repo to a sink (see logparser) and return its result
+    def mineRepo(self, reponame, sink, **kwargs):
+        """
+        :argument reponame the local repository name (see getRepoVersions)
+        :argument sink object with start(tips), add(commit) and close() methods, e.g. logparser.AuthorSink
+        other keyword arguments are passed on to iterRepoCommitData
+        returns the result of sink.close()
+        """
+        started = False
+        for commit in self.iterRepoCommitData(reponame, **kwargs):
+            if not started:
+                # the ref tips being mined are known once the first commit is yielded
+                sink.start(self.tips)
+                started = True
+            sink.add(commit)
+        return sink.close()
+
+
+    #Streaming version of getRepoCommitData: yields one commit at a time
+    def iterRepoCommitData(self, reponame, includebranches = False, since = None, until = None, watermarks = None, shards = 1, chunksize = 500, numstat = False, tips = None, skip = None, filelimit = FILE_LIMIT, commitlimit = COMMIT_LIMIT):
+        """
+        Stream the commits of a repository without keeping the whole `git log`
+        output in memory. The log is read incrementally from the git process
+        and each commit is parsed and yielded as soon as it is complete, so the
+        peak memory use depends on the largest commit, not the repository size.
+        :argument reponame the local repository name (see getRepoVersions)
+        :argument watermarks dict of ref -> sha of the ref tips mined last time
+        (see getRefTips). If given, since/until are ignored and only the commits
+        reachable from the current tips but not from the watermarks are mined.
+        The current tips are saved in self.tips before the first commit is yielded.
+        :argument shards number of worker processes. With more than one, the commit
+        list from `git rev-list` is cut into contiguous chunks of at most chunksize
+        commits that are logged and parsed in parallel; the commits are still
+        yielded in the same order as with a single process.
+        :argument numstat if True, only the number of added and removed lines of each
+        file are mined with `git log --numstat`; the diffs have no hunks
+        :argument tips dict of ref -> sha to mine up to instead of the current ref tips,
+        e.g. the tips an interrupted run was mining
+        :argument skip set of shas of the commits an interrupted run with the same arguments
+        already stored; they are left out without being logged, wherever they are in the list
+        :argument filelimit, commitlimit maximum size in bytes of the patch text kept per
+        file and per commit (None for no limit); longer diffs are cut off but their line
+        counts stay complete (see logparser.parseCommit)
+        yields logparser.CommitRecord objects in `git log` order
+        """
+        if watermarks is None:
+            if self.isBareRepo(reponame):
+                # mirrors have no working directory to check versions out in
+                os.chdir(self.tmpdir)
+                os.chdir(reponame)
+            else:
+                prefix,versions = self.getRepoVersions(reponame)
+
+                for version in versions:
+                    #checkout the versions
+                    logger.debug('git checkout %s%s' % (prefix,version))
+                    retcode, out, err = Command('git checkout %s%s' % (prefix,version)).run(dryrun=False)
+                    #print(out)
+
+            if tips is None:
+                self.tips = self.getRefTips()
+                revisions = '--branches=* --all'
+            else:
+                self.tips = tips
+                revisions = ' '.join(sorted(self.existingCommits(set(tips.values()))))
+                if not revisions:
+                    logger.debug('%s: None of the ref tips to mine exist any more.' % reponame)
+                    return
+            if since: revisions += f' --since {since}'
+            if until: revisions += f' --until {until}'
+        else:
+            # Checking out old versions does not change what is reachable from the refs
+            os.chdir(self.tmpdir)
+            os.chdir(reponame)
+
+            self.tips = self.getRefTips() if tips is None else tips
+            new = self.existingCommits(set(self.tips.values()))
+            old = self.existingCommits(set(watermarks.values()))
+            if new <= old:
+                logger.debug('%s: No new commits since the last mined ref tips.' % reponame)
+                return
+
+            #only the commits between the old and the new ref tips
+            revisions = '%s --not %s' % (' '.join(sorted(new - old)), ' '.join(sorted(old)))
+
+        options = LOG_NUMSTAT if numstat else LOG_PATCH
+        limits = (filelimit, commitlimit)
+        if shards > 1 or skip:
+            shas = self.getCommitList(revisions, skip)
+            if shards > 1:
+                commits = self.iterShardedCommits(shas, shards, chunksize, options, limits)
+            else:
+                commits = streamCommits(os.getcwd(), shas, options, limits)
+        else:
+            #git log -p # this will list all commits and the code additions in addition to dates and messages.
+            # function-context for python just adds all the surrounding lines of code to the diff output
+            logger.debug(f'git log {options} {revisions}')
+            lines = Command(f'git log {options} {revisions}').stream()
+            commits = parseCommitLog(lines, filelimit, commitlimit)
 
-                                    #skip just one line if this line is seen
-                                    if line.startswith(b'new file mode'):
-                                        diffheader += next(lines)
+        #Walk every branch once instead of running `git branch --contains` for every commit
+        branchindex = None
 
-                                    else:
-                                        diffheader += next(lines)
-                                        diffheader += next(lines)
+        for commit in commits:
 
-                                    #skip ahead until see first + or -
-                                    diff = next(lines)
-                                    diffheader += diff
-                                    while not (diff.startswith(b'+') or diff.startswith(b'-')) or (diff.startswith(b'+++') or diff.startswith(b'---')) :
-                                        diff = next(lines)
+            #Retrieve all branches that contains this commit
+            if includebranches:
+                if branchindex is None:
+                    branchindex = BranchIndex()
+                commit.branches = branchindex.branches(commit.id)
 
-                                    diffinfo = []
-                                    while len(diff) >= 1:
+            yield commit
 
-                                        if (diff.startswith(b'+') or diff.startswith(b'-')):
-                                            diffinfo.append(diff.decode("utf-8", errors='ignore'))
-
-                                        elif diff.startswith(b'diff'):
-                                            break
-                                        elif len(diff) < 2:
-                                            try:
-                                                diff = next(lines)
-                                                if len(diff) < 2:
-                                                    break
-                                            except:
-                                                break
-
-                                        try:
-                                            diff = next(lines)
-                                        except:
-                                            break
-
-                                    diffs.append({'filename':filename, 'diff':diffinfo, 'header':diffheader.decode("utf-8", errors='ignore')})
-
-                                #else:
-                                    #ignore deleted files for now
-                            else:
-                                try:
-                                    diff = next(lines)
-                                except:
-                                    break
-                    except:
-                        print('Done with commits for this repo.')
-
-                    #add the commit to the author's list of commits.
-                    commits.append({'id':commitid, 'date':date, 'message':message, 'diffs':diffs, 'branches':branches})
-
-                elif line.startswith(b'Merge: '):
-                    #ignore merges
-                    next(lines)
-
-            #else:
-                #ignore anything else until next author line
-
-        #print(commits)
-        return commits
 
+    #Run git log and the parser on chunks of the commit list in a process pool
+    def iterShardedCommits(self, shas, shards, chunksize, options = LOG_PATCH, limits = (FILE_LIMIT, COMMIT_LIMIT)):
+        """
+        :argument shas commit shas of the repo in the current directory (see getCommitList)
+        :argument options git log options (LOG_PATCH or LOG_NUMSTAT)
+        :argument limits (filelimit, commitlimit) for the parser
+        yields logparser.CommitRecord objects in `git log` order
+        """
+        chunksize = max(1, min(chunksize, -(-len(shas) // shards)))
+        chunks = (shas[i:i + chunksize] for i in range(0, len(shas), chunksize))
+        logger.debug(f'Mining {len(shas)} commits with {shards} processes in chunks of {chunksize} commits.')
+
+        cwd = os.getcwd()
+        with ProcessPoolExecutor(max_workers=shards) as pool:
+            # keep a bounded number of chunks in flight so memory stays bounded too
+            pending = deque(pool.submit(mineCommits, cwd, chunk, options, limits) for chunk in islice(chunks, 2 * shards))
+            while pending:
+                parsed = pending.popleft().result()
+                for chunk in islice(chunks, 1):
+                    pending.append(pool.submit(mineCommits, cwd, chunk, options, limits))
+                yield from parsed
+
+    #Get the commits git log would show, in the same order
+    def getCommitList(self, revisions, skip = None):
+        """
+        :argument revisions git log revision arguments for the repo in the current directory
+        :argument skip set of commit shas to leave out, e.g. the commits already stored
+        returns list of commit shas
+        """
+        retcode, out, err = Command(f'git rev-list {revisions}').run()
+        if retcode != 0:
+            raise CommandError(f'git rev-list {revisions}', retcode, err)
+        shas = out.decode('utf-8').split()
+        if skip:
+            # by sha, not by position: the order of commits with equal dates depends on the revisions
+            shas = [sha for sha in shas if sha not in skip]
+            logger.debug(f'Skipping the commits stored before, {len(shas)} commits left.')
+        return shas
+
+    #Check whether a repo has no working directory, e.g. a mirror
+    def isBareRepo(self, reponame):
+        retcode, out, err = Command('git rev-parse --is-bare-repository').run(cwd=os.path.join(self.tmpdir, reponame))
+        return out.strip() == b'true'
+
+    #Get the commit every ref of the repo in the current directory points to
+    def getRefTips(self):
+        """
+        Current tips of all refs (branches, remote branches, tags, HEAD), which
+        is what `git log --all` starts from. Annotated tags are peeled and refs
+        that do not point to a commit are left out.
+        returns dict of ref name -> commit sha
+        """
+        tips = {}
+        retcode, out, err = Command("git for-each-ref --format='%(refname)%09%(objecttype)%09%(objectname)%09%(*objecttype)%09%(*objectname)'").run()
+        for line in out.decode('utf-8').splitlines():
+            ref, objecttype, sha, peeledtype, peeled = line.split('\t')
+            if peeledtype == 'commit':
+                tips[ref] = peeled
+            elif objecttype == 'commit':
+                tips[ref] = sha
+
+        retcode, out, err = Command('git rev-parse --verify -q HEAD').run()
+        if out.strip():
+            tips['HEAD'] = out.decode('utf-8').strip()
+        return tips
+
+    #Filter out commits that are not in the repo in the current directory (e.g., after a force push)
+    def existingCommits(self, shas):
+        """
+        :argument shas iterable of commit shas
+        returns the set of the given shas that exist in the repository
+        """
+        if not shas: return set()
+        retcode, out, err = Command('git cat-file --batch-check').run(inputs=('\n'.join(shas) + '\n').encode('utf-8'))
+        # output lines are '<sha> <type> <size>' or '<sha> missing'
+        return set(line.split()[0] for line in out.decode('utf-8').splitlines() if line.split()[1] == 'commit')
 
 
+    #Get all commits in all versions of repo and put in flat list
+    def getAllCommits(self, reponame, includebranches = False):
+        return self.mineRepo(reponame, ListSink(), includebranches=includebranches)
+
+
+class BranchIndex(object):
+    """
+    In-memory commit -> branches map for the repository in the current directory.
+
+    Each branch is walked once with `git rev-list`, so looking up the branches of
+    a commit costs a dictionary access instead of a `git branch -a --contains`
+    call. Branch membership is kept as a bit mask per commit and the formatted
+    result is shared between all commits with the same mask.
+    """
+
+    def __init__(self, cwd=None):
+        self.cwd = cwd
+        self.lines = []   # branch lines as printed by `git branch -a`
+        self.masks = {}   # commit sha -> bit mask of self.lines
+        self.cache = {}   # bit mask -> formatted branches
+        self.build()
+
+    def build(self):
+        retcode, out, err = Command('git branch -a').run(cwd=self.cwd)
+        self.lines = [line for line in out.splitlines() if line.strip()]
+
+        # branches pointing at the same commit only need to be walked once
+        tips = {}
+        for bit, line in enumerate(self.lines):
+            retcode, sha, err = Command('git rev-parse --verify -q %s' % self.getRef(line)).run(cwd=self.cwd)
+            sha = sha.strip()
+            if sha:
+                tips[sha] = tips.get(sha, 0) | (1 << bit)
+
+        for sha, mask in tips.items():
+            logger.debug('git rev-list %s' % sha.decode('utf-8'))
+            for commit in Command('git rev-list %s' % sha.decode('utf-8')).stream(cwd=self.cwd):
+                self.masks[commit] = self.masks.get(commit, 0) | mask
+
+    @staticmethod
+    def getRef(line):
+        """
+        Fully qualified ref for a `git branch -a` output line.
+        """
+        name = line[2:].decode('utf-8').split(' -> ')[0]
+        if name.startswith('('):
+            return 'HEAD'  # (HEAD detached at ...)
+        if name.startswith('remotes/'):
+            return 'refs/' + name
+        return 'refs/heads/' + name
+
+    def branches(self, commitid):
+        """
+        Branches containing a commit, formatted like `git branch -a --contains`.
+        :argument commitid the full commit sha
+        returns bytes, one branch per line
+        """
+        mask = self.masks.get(commitid.encode('utf-8'), 0)
+        if mask not in self.cache:
+            self.cache[mask] = b''.join(line + b'\n' for bit, line in enumerate(self.lines) if mask & (1 << bit))
+        return self.cache[mask]
+
+
+#Mine a fixed list of commits (runs in a worker process for sharded mining)
+def streamCommits(cwd, shas, options = LOG_PATCH, limits = (FILE_LIMIT, COMMIT_LIMIT)):
+    """
+    :argument cwd the repository directory
+    :argument shas list of commit shas, mined in this order
+    :argument options git log options (LOG_PATCH or LOG_NUMSTAT)
+    :argument limits (filelimit, commitlimit) for the parser
+    yields logparser.CommitRecord objects
+    """
+    if not shas:
+        # git log would fall back to HEAD
+        return
+    lines = Command(f'git log {options} --no-walk=unsorted --stdin').stream(cwd=cwd, inputs=('\n'.join(shas) + '\n').encode('utf-8'))
+    yield from parseCommitLog(lines, *limits)
+
+def mineCommits(cwd, shas, options = LOG_PATCH, limits = (FILE_LIMIT, COMMIT_LIMIT)):
+    """
+    Process pool version of streamCommits.
+    returns list of logparser.CommitRecord objects
+    """
+    return list(streamCommits(cwd, shas, options, limits))
 
 
 #Helper Functions
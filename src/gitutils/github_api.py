@@ -3,8 +3,84 @@
 See https://docs.github.com/en/free-pro-team@latest/rest for more details.
 """
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import time
+from urllib.parse import parse_qs, urlparse
+
 import requests
 
+from .httpcache import HTTPCache
+from .scheduler import RequestScheduler
+
+
+def last_page(response):
+    """Returns the number of the last page from the Link header of a response.
+
+    Returns:
+      The page number, or None if the response has no `last` link.
+    """
+
+    link = response.links.get("last") if response.links else None
+    if not link:
+        return None
+    page = parse_qs(urlparse(link["url"]).query).get("page")
+    return int(page[0]) if page else None
+
+
+def has_next(response):
+    return bool(response.links) and "next" in response.links
+
+
+def fetch_pages(get, start_page=1, workers=1, cond=lambda r: False):
+    """Fetches the pages of a paginated GitHub REST API resource.
+
+    The first page is fetched alone. If its Link header gives the last page and
+    more than one worker is allowed, the remaining pages are fetched by a pool of
+    threads, with at most twice as many pages in flight as workers; otherwise the
+    `next` links are followed one page at a time.
+
+    Args:
+      get: function of a page number returning its requests.Response
+      start_page: int (> 0) of which page to start pagination from (default: 1)
+      workers: maximum number of pages fetched at the same time (default: 1)
+      cond: boolean function of a response that stops the traversal after its page
+            (default: returns False)
+
+    Returns:
+      The responses in page order, up to the last page or the first page for
+      which `cond` is true. Pages fetched ahead of that page are dropped.
+    """
+
+    response = get(start_page)
+    responses = [response]
+    last = last_page(response)
+    if workers <= 1 or last is None:
+        page = start_page
+        while not cond(response) and has_next(response):
+            page += 1
+            response = get(page)
+            responses.append(response)
+        return responses
+
+    if cond(response):
+        return responses
+    pages = iter(range(start_page + 1, last + 1))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque(pool.submit(get, page) for page in islice(pages, 2 * workers))
+        while pending:
+            response = pending.popleft().result()
+            responses.append(response)
+            if cond(response):
+                for future in pending:
+                    future.cancel()
+                break
+            for page in islice(pages, 1):
+                pending.append(pool.submit(get, page))
+    return responses
+
+
 class GitHubAPIClient:
     """An interface for accessing the GitHub API Client.
 
@@ -14,13 +90,28 @@ class GitHubAPIClient:
     Attributes:
       username: GitHub username of account with Private Access Token (PAT)
       token: GitHub PAT that has sufficient privileges for API resources
+      scheduler: RequestScheduler spreading the requests over the PATs
+      workers: number of pages fetched at the same time by `fetch_resource`
+      retries: number of times a page is fetched again after a server error or
+               a dropped connection, waiting `backoff` * 2^attempt seconds
+      api_url: root URL of the REST API
+      cache: HTTPCache the GET responses are revalidated against, None for no cache
     """
     # Credentials
     username = None
     token = None
 
+    # Pages fetched concurrently share the connections (keep-alive) of the session
+    workers = 8
+    retries = 3
+    backoff = 1.0
+    api_url = "https://api.github.com"
+
     # Requests Session
     session = requests.Session()
+    session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=2 * workers))
+    scheduler = None
+    cache = None
 
     @classmethod
     def check_credentials(cls):
@@ -30,14 +121,19 @@ class GitHubAPIClient:
           A boolean representing if the currently supplied credentials are valid.
           Credentials should be set via `GitHubAPIClient.set_credentials`.
 
+        The rate limit endpoint is used, which does not count against the rate limit
+        and tells the scheduler how many requests are left.
+
         Raises:
           ConnectionError: An error trying to access the GitHub REST API.
           RuntimeError: Occurs when the credentials are not valid.
         """
 
-        cls.session.auth = (cls.username, cls.token)
+        if cls.scheduler is None:
+            raise RuntimeError("Credentials must be set via "
+                               "`GitHubAPIClient.set_credentials` prior to an API call.")
         try:
-            response = cls.session.get("https://api.github.com/")
+            response = cls.scheduler.request("GET", f"{cls.api_url}/rate_limit")
         except requests.exceptions.ConnectionError:
             raise ConnectionError("Could not establish a connection to the GitHub "
                                   "REST API.")
@@ -48,7 +144,7 @@ class GitHubAPIClient:
                                "to an API call.")
 
     @classmethod
-    def set_credentials(cls, username, token):
+    def set_credentials(cls, username, token, tokens=None):
         """Sets GitHub credentials for accessing the GitHub REST API.
 
         The specified user account should have a Private Access Token (PAT) that has
@@ -58,10 +154,26 @@ class GitHubAPIClient:
         Args:
           username: GitHub username tied with the PAT for leveraging the REST API
           token: GitHub PAT (not password!)
+          tokens: list of more PATs to spread the requests over (default: None)
         """
 
         cls.username = username
         cls.token = token
+        tokens = [token] + [other for other in tokens or [] if other != token]
+        cls.scheduler = RequestScheduler(tokens, scheme="token", session=cls.session)
+
+    @classmethod
+    def set_cache(cls, directory):
+        """Keeps the API responses on disk and revalidates them with conditional requests.
+
+        Pages that did not change are answered 304 Not Modified, which does not count
+        against the rate limit, and served from the cache (see `HTTPCache`).
+
+        Args:
+          directory: where the responses are stored, None to disable the cache
+        """
+
+        cls.cache = HTTPCache(directory) if directory else None
 
     @classmethod
     def get_from_api(cls, url, params, headers):
@@ -72,34 +184,54 @@ class GitHubAPIClient:
           params: dict of keywords for resource, must contain "page" : int > 0
           headers: dict of headers to send to API server
 
+        Server errors (5xx) and dropped connections are retried `retries` times.
+        With a cache (see `set_cache`) the request is conditional and an unchanged
+        page is returned from the cache.
+
         Returns:
           A requests.Response object for the specified API call. Invalid requests
           will still be returned, but failed connections will be raised.
 
         Raises:
           ConnectionError: An error trying to access the GitHub REST API.
+          RuntimeError: Occurs when no credentials were set.
         """
 
-        cls.check_credentials()  # cannot access API without proper credentials
+        if cls.scheduler is None:
+            raise RuntimeError("Credentials must be set via "
+                               "`GitHubAPIClient.set_credentials` prior to an API call.")
+
+        def send(url, params, headers):
+            return cls.scheduler.request("GET", url, params=params, headers=headers)
+
+        for attempt in range(cls.retries + 1):
+            try:
+                if cls.cache is None:
+                    response = send(url, params, headers)
+                else:
+                    response = cls.cache.request(send, url, params, headers)
+            except requests.exceptions.ConnectionError:
+                response = None
+            if response is not None and response.status_code < 500:
+                break
+            if attempt < cls.retries:
+                time.sleep(cls.backoff * 2 ** attempt)
 
-        try:
-            response = cls.session.get(url=url, params=params, headers=headers)
-            if response.status_code != 200:
-                # TODO: better exception for designating error in pagination
-                raise requests.exceptions.ConnectionError
-        except requests.exceptions.ConnectionError:
+        # TODO: better exception for designating error in pagination
+        if response is None or response.status_code != 200:
             raise ConnectionError("Could not establish a connection to the GitHub"
                                   " REST API.")
         return response
 
     @classmethod
     def fetch_resource(cls, owner, repository, resource, params, headers,
-                       start_page=1, cond=lambda r: False):
+                       start_page=1, cond=lambda r: False, workers=None):
         """Fetches target resources of a GitHub repository.
 
         Utilizes pagination to traverse API resources with more than a 100 entries.
         From the `start_page` argument, traverses each API resource page until there
-        are no more resources to fetch.
+        are no more resources to fetch. Once the first page tells the last one, the
+        other pages are fetched by `workers` threads (see `fetch_pages`).
 
         Args:
           owner: GitHub username or organization that owns the target repository
@@ -111,24 +243,22 @@ class GitHubAPIClient:
           start_page: int (> 0) of which page to start pagination from (default: 1)
           cond: boolean function that exists traversal based on response argument
                 (default: returns False)
+          workers: number of pages fetched at the same time (default: `workers`)
 
         Returns:
-          A JSON object API results. A list of dicts.
+          A JSON object API results. A list of dicts, in page order.
         """
 
-        url = f"https://api.github.com/repos/{owner}/{repository}/{resource}"
+        url = f"{cls.api_url}/repos/{owner}/{repository}/{resource}"
+
+        def get(page):
+            return cls.get_from_api(url=url, params=dict(params, page=page), headers=headers)
+
+        responses = fetch_pages(get, start_page=start_page, cond=cond,
+                                workers=cls.workers if workers is None else workers)
         data = []
-        page = start_page
-        while True:  # do while loop to utilize pagination
-            params["page"] = page
-            response = cls.get_from_api(
-                url=url, params=params, headers=headers)
+        for response in responses:
             data += response.json()
-            page += 1
-            if (cond(response) or not response.links or
-                    "next" not in response.links.keys()):
-                break
-
         return data
 
     @classmethod
@@ -1,10 +1,12 @@
 import configparser
+import datetime
 import enum
+import json
 import logging
-import requests
 import time
 
 from .graphql_queries import *
+from .scheduler import RequestScheduler, parse_tokens
 
 logger = logging.getLogger('graphql_interface')
 logger.setLevel(logging.INFO)
@@ -18,13 +20,24 @@ config = configparser.ConfigParser()
 config.read('credentials.ini')
 GITHUB_TOKEN = config.get('github', 'token')
 GITLAB_TOKEN = config.get('gitlab', 'token')
+# optional comma separated lists of tokens to spread the queries over
+GITHUB_TOKENS = parse_tokens(config.get('github', 'tokens', fallback=GITHUB_TOKEN))
+GITLAB_TOKENS = parse_tokens(config.get('gitlab', 'tokens', fallback=GITLAB_TOKEN))
 
 class Source(enum.Enum):
-    GITHUB = {'url': 'https://api.github.com/graphql',
-              'headers': {'Authorization': f'bearer {GITHUB_TOKEN}'}}
+    # the tokens are added by the scheduler of the source (see SCHEDULERS)
+    GITHUB = {'url': 'https://api.github.com/graphql'}
 
-    GITLAB = {'url': 'https://gitlab.com/api/graphql',
-              'headers': {'Authorization': f'Bearer {GITLAB_TOKEN}'}}
+    GITLAB = {'url': 'https://gitlab.com/api/graphql'}
+
+# Shared by all the queries of a run, so the rate limits of the tokens are known
+SCHEDULERS = {
+    Source.GITHUB: RequestScheduler(GITHUB_TOKENS, scheme='bearer'),
+    Source.GITLAB: RequestScheduler(GITLAB_TOKENS, scheme='Bearer'),
+}
+
+# nested connections paged into per follow-up query, one alias each
+NESTED_BATCH = 25
 
 def collect_assignee(node, source):
     return {
@@ -65,11 +78,96 @@ def collect_comment(node, source):
 def collect_commit(node, source):
     return {'sha': node['sha'] if source == Source.GITLAB else node['commit']['oid']}
 
-def fetch_prs(owner, repo, source):
+def updated_at(node):
+    return datetime.datetime.fromisoformat(node['updatedAt'].replace('Z', '+00:00'))
+
+def recent_nodes(nodes, since):
+    '''
+        Returns the nodes of a page (ordered by updatedAt, newest first) up to the first one updated
+        before since, and whether there was one, i.e. the next pages need not be fetched.
+    '''
+    if since is None:
+        return nodes, False
+    for i, node in enumerate(nodes):
+        if updated_at(node) < since:
+            return nodes[:i], True
+    return nodes, False
+
+def nested_pages(nodes, fields):
+    '''
+        Returns (node, connection, cursor) for every nested connection of the nodes that has a next page.
+    '''
+    return [(node, connection, node[connection]['pageInfo']['endCursor'])
+            for node in nodes for connection in fields
+            if node.get(connection) and node[connection]['pageInfo']['hasNextPage']]
+
+def fetch_nested(owner, repo, source, kind, nodes):
+    '''
+        Fetches the next pages of the nested connections (comments, commits, labels, assignees)
+        of a page of PRs or issues and adds their nodes to the nodes, so long threads are not cut
+        off at the first 100. Only the connections reporting hasNextPage are queried, NESTED_BATCH
+        of them per request as aliases, until none has a next page.
+        kind: 'pr' or 'issue'
+        Returns the number of follow-up requests.
+    '''
+    if source == Source.GITHUB:
+        fields, page = GITHUB_NESTED_FIELDS, GITHUB_NESTED_PAGE
+        typename = 'PullRequest' if kind == 'pr' else 'Issue'
+    else:
+        fields, page = GITLAB_NESTED_FIELDS, GITLAB_NESTED_PAGE
+        typename = 'mergeRequest' if kind == 'pr' else 'issue'
+
+    scheduler = SCHEDULERS[source]
+    pending = nested_pages(nodes, fields)
+    if pending:
+        logger.info(f'{repo}: Fetching the next pages of {len(pending)} nested connections...')
+    requests = 0
+    attempt = 0
+
+    while pending and attempt < 100:
+        batch = pending[:NESTED_BATCH]
+        aliases = ''.join(page % {
+            'alias': f'c{i}',
+            'type': typename,
+            'id': json.dumps(node['id'] if source == Source.GITHUB else node['iid']),
+            'connection': connection,
+            'cursor': json.dumps(cursor),
+            'fields': fields[connection]} for i, (node, connection, cursor) in enumerate(batch))
+        query = GITHUB_NESTED % aliases if source == Source.GITHUB else GITLAB_NESTED % (owner, repo, aliases)
+        # waits for the rate limit to reset if needed
+        j = scheduler.graphql(source.value['url'], query)
+        requests += 1
+
+        try:
+            data = j['data'] if source == Source.GITHUB else j['data']['project']
+            # a PR or issue deleted in the meantime comes back as None
+            results = [(data[f'c{i}'] or {}).get(connection) for i, (node, connection, cursor) in enumerate(batch)]
+            attempt = 0
+        except Exception as err:
+            attempt += 1
+            logger.critical(f'{repo}: Connection error with GraphQL: {err}. Retrying...')
+            continue
+
+        pending = pending[len(batch):]
+        for (node, connection, cursor), result in zip(batch, results):
+            if not result:
+                continue
+            node[connection]['nodes'] += result['nodes']
+            if result['pageInfo']['hasNextPage']:
+                pending.append((node, connection, result['pageInfo']['endCursor']))
+
+    return requests
+
+def fetch_prs(owner, repo, source, since=None):
+    '''
+        Fetches the pull requests (merge requests) of a repository, most recently updated first.
+        since: timezone aware datetime; if given, only the PRs updated at or after it are
+        fetched, and paging stops at the first older one
+    '''
     if not isinstance(source, Source):
         raise Exception(f'{repo}: Unknown source: {source}')
 
-    payload = source.value
+    scheduler = SCHEDULERS[source]
     query = GITHUB_PULLREQUEST if source == Source.GITHUB else GITLAB_PULLREQUEST
     stage = 'repository' if source == Source.GITHUB else 'project'
 
@@ -80,21 +178,9 @@ def fetch_prs(owner, repo, source):
     attempt = 0
 
     while True:
-        payload['json'] = {'query': query % (owner, repo),
-                       'variables': {'cursor': cursor}}
-        j = {}
-        while not 'data' in j.keys():
-            logger.info(f'{repo}: Fetching data with graphql: %s' % str(payload['json']))
-            r = requests.post(**payload)
-            j = r.json()
-
-            # When the API rate limit is exceeded, j is a dictionary that looks like this:
-            # {'errors': [{'type': 'RATE_LIMITED', 'message': 'API rate limit exceeded for user ID 3604514.'}]}
-            if 'errors' in j.keys():
-                if j['errors'].get('type') == 'RATE_LIMITED':
-                    logger.warn(f'{repo}: GraphQL API rate limit exceeded (5000 points per hour), going to sleep for an hour')
-                    time.sleep(3600)    
-
+        logger.info(f'{repo}: Fetching data with graphql after cursor {cursor}')
+        # waits for the rate limit to reset if needed
+        j = scheduler.graphql(source.value['url'], query % (owner, repo), {'cursor': cursor})
 
         try:
             if attempt:
@@ -109,9 +195,10 @@ def fetch_prs(owner, repo, source):
             continue
 
         pagination = entry['pageInfo']
+        nodes, done = recent_nodes(entry['nodes'], since)
+        fetch_nested(owner, repo, source, 'pr', nodes)
 
-
-        for node in entry['nodes']:
+        for node in nodes:
             pr = {}
             pr['title'] = node['title']
             pr['description'] = node['description'] if source == Source.GITLAB else node['body']
@@ -167,10 +254,10 @@ def fetch_prs(owner, repo, source):
             pr['commits'] = [collect_commit(commit, source) for commit in node[cmentry]['nodes']]
             prs.append(pr)
 
-        logger.info(f'{repo}: Collected {len(entry["nodes"])} pull requests.')
+        logger.info(f'{repo}: Collected {len(nodes)} pull requests.')
 
         cursor = pagination['endCursor']
-        if not pagination['hasNextPage']:
+        if not pagination['hasNextPage'] or done:
             break
 
     end = time.time()
@@ -179,11 +266,16 @@ def fetch_prs(owner, repo, source):
     return prs
 
 
-def fetch_issues(owner, repo, source):
+def fetch_issues(owner, repo, source, since=None):
+    '''
+        Fetches the issues of a repository, most recently updated first.
+        since: timezone aware datetime; if given, only the issues updated at or after it are
+        fetched, and paging stops at the first older one
+    '''
     if not isinstance(source, Source):
         raise exception(f'{repo}: Unknown source: {source}')
 
-    payload = source.value
+    scheduler = SCHEDULERS[source]
     query = GITHUB_ISSUE if source == Source.GITHUB else GITLAB_ISSUE
     stage = 'repository' if source == Source.GITHUB else 'project'
 
@@ -194,10 +286,8 @@ def fetch_issues(owner, repo, source):
     attempt = 0
 
     while attempt<100:
-        payload['json'] = {'query': query % (owner, repo),
-                       'variables': {'cursor': cursor}}
-        r = requests.post(**payload)
-        j = r.json()
+        # waits for the rate limit to reset if needed
+        j = scheduler.graphql(source.value['url'], query % (owner, repo), {'cursor': cursor})
         try:
             if attempt:
                 logger.warning(f'{repo}: Attempt {attempt}...')
@@ -210,8 +300,10 @@ def fetch_issues(owner, repo, source):
             logger.critical('Connection error with GraphQL')
             continue
         pagination = entry['pageInfo']
+        nodes, done = recent_nodes(entry['nodes'], since)
+        fetch_nested(owner, repo, source, 'issue', nodes)
 
-        for node in entry['nodes']:
+        for node in nodes:
             issue = {}
             issue['title'] = node['title']
             issue['description'] = node['description'] if source == Source.GITLAB else node['body']
@@ -258,10 +350,10 @@ def fetch_issues(owner, repo, source):
 
             issues.append(issue)
 
-        logger.info(f'{repo}: Collected {len(entry["nodes"])} issues.')
+        logger.info(f'{repo}: Collected {len(nodes)} issues.')
 
         cursor = pagination['endCursor']
-        if not pagination['hasNextPage']:
+        if not pagination['hasNextPage'] or done:
             break
 
     end = time.time()
@@ -1,9 +1,15 @@
 GITHUB_ISSUE = '''
     query($cursor: String) {
+        rateLimit {
+            cost
+            remaining
+            resetAt
+        }
         repository(owner: "%s" name: "%s") {
-            issues(first: 100, after: $cursor) {
+            issues(first: 100, after: $cursor, orderBy: {field: UPDATED_AT, direction: DESC}) {
                 totalCount
                 nodes {
+                    id
                     title
                     createdAt
                     updatedAt
@@ -20,6 +26,10 @@ GITHUB_ISSUE = '''
                             email
                             url
                         }
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
                     }
                     author {
                         login
@@ -37,6 +47,10 @@ GITHUB_ISSUE = '''
                         nodes {
                             name
                         }
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
                     }
                     comments(first: 100) {
                         nodes {
@@ -50,6 +64,10 @@ GITHUB_ISSUE = '''
                             url
                             id
                         }
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
                     }
                 }
                 pageInfo {
@@ -69,10 +87,16 @@ GITHUB_ISSUE = '''
 
 GITHUB_PULLREQUEST = '''
     query($cursor: String) {
+        rateLimit {
+            cost
+            remaining
+            resetAt
+        }
         repository(owner: "%s" name: "%s") {
-            pullRequests(first: 100, after: $cursor) {
+            pullRequests(first: 100, after: $cursor, orderBy: {field: UPDATED_AT, direction: DESC}) {
                 totalCount
                 nodes {
+                    id
                     headRefOid
                     commits(first: 100) {
                         nodes {
@@ -80,6 +104,10 @@ GITHUB_PULLREQUEST = '''
                                 oid
                             }
                         }
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
                     }
                     title
                     createdAt
@@ -97,6 +125,10 @@ GITHUB_PULLREQUEST = '''
                             email
                             url
                         }
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
                     }
                     author {
                         login
@@ -114,6 +146,10 @@ GITHUB_PULLREQUEST = '''
                         nodes {
                             name
                         }
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
                     }
                     comments(first: 100) {
                         nodes {
@@ -127,11 +163,19 @@ GITHUB_PULLREQUEST = '''
                             url
                             id
                         }
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
                     }
                     closingIssuesReferences(first: 100) {
                         nodes {
                             url
                         }
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
                     }
                 }
                 pageInfo {
@@ -146,7 +190,7 @@ GITHUB_PULLREQUEST = '''
 GITLAB_ISSUE = '''
     query($cursor: String) {
         project(fullPath: "%s/%s") {
-            issues(first: 100, after: $cursor) {
+            issues(first: 100, after: $cursor, sort: UPDATED_DESC) {
                 count
                 nodes {
                     description
@@ -165,6 +209,10 @@ GITLAB_ISSUE = '''
                             publicEmail
                             webUrl
                         }
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
                     }
                     author {
                         username
@@ -182,6 +230,10 @@ GITLAB_ISSUE = '''
                         nodes {
                             title
                         }
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
                     }
                     notes {
                         nodes {
@@ -195,6 +247,10 @@ GITLAB_ISSUE = '''
                             url
                             id
                         }
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
                     }
                 }
                 pageInfo {
@@ -209,13 +265,17 @@ GITLAB_ISSUE = '''
 GITLAB_PULLREQUEST = '''
     query($cursor: String) {
         project(fullPath: "%s/%s") {
-            mergeRequests(first: 10, after: $cursor) {
+            mergeRequests(first: 10, after: $cursor, sort: UPDATED_DESC) {
                 count
                 nodes {
                     commitsWithoutMergeCommits {
                         nodes {
                             sha
                         }
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
                     }
                     diffHeadSha
                     title
@@ -234,6 +294,10 @@ GITLAB_PULLREQUEST = '''
                             publicEmail
                             webUrl
                         }
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
                     }
                     author {
                         username
@@ -251,6 +315,10 @@ GITLAB_PULLREQUEST = '''
                         nodes {
                             title
                         }
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
                     }
                     notes {
                         nodes {
@@ -264,6 +332,10 @@ GITLAB_PULLREQUEST = '''
                             url
                             id
                         }
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
                     }
                 }
                 pageInfo {
@@ -274,3 +346,62 @@ GITLAB_PULLREQUEST = '''
         }
     }
 '''
+
+# Follow-up queries for the nested connections (comments, commits, labels, assignees) of
+# PRs and issues that have more than one page: one alias per connection, so that the
+# next pages of several PRs or issues are fetched in one request.
+GITHUB_NESTED_FIELDS = {
+    'commits': 'commit { oid }',
+    'assignees': 'name login email url',
+    'labels': 'name',
+    'comments': 'author { login url } body createdAt updatedAt url id',
+    'closingIssuesReferences': 'url',
+}
+
+GITHUB_NESTED_PAGE = '''
+        %(alias)s: node(id: %(id)s) {
+            ... on %(type)s {
+                %(connection)s(first: 100, after: %(cursor)s) {
+                    nodes { %(fields)s }
+                    pageInfo {
+                        endCursor
+                        hasNextPage
+                    }
+                }
+            }
+        }'''
+
+GITHUB_NESTED = '''
+    query {
+        rateLimit {
+            cost
+            remaining
+            resetAt
+        }%s
+    }
+'''
+
+GITLAB_NESTED_FIELDS = {
+    'commitsWithoutMergeCommits': 'sha',
+    'assignees': 'name username publicEmail webUrl',
+    'labels': 'title',
+    'notes': 'author { username webUrl } body createdAt updatedAt url id',
+}
+
+GITLAB_NESTED_PAGE = '''
+            %(alias)s: %(type)s(iid: %(id)s) {
+                %(connection)s(after: %(cursor)s) {
+                    nodes { %(fields)s }
+                    pageInfo {
+                        endCursor
+                        hasNextPage
+                    }
+                }
+            }'''
+
+GITLAB_NESTED = '''
+    query {
+        project(fullPath: "%s/%s") {%s
+        }
+    }
+'''
@@ -0,0 +1,137 @@
+"""On-disk cache of GitHub REST API responses, revalidated with conditional requests.
+
+Each cached GET response is stored with its ETag and Last-Modified values. The next
+request for the same URL sends them as If-None-Match and If-Modified-Since; GitHub
+answers 304 Not Modified, which does not count against the rate limit, and the page
+is served from the cache. Used by GitHubAPIClient and RemoteCommand.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger('httpcache')
+
+DEFAULT_DIR = '~/.ideas-temp/http-cache'
+# headers of a 304 that describe its (empty) body rather than the cached one
+BODY_HEADERS = {'content-length', 'content-type', 'content-encoding', 'transfer-encoding'}
+
+
+class HTTPCache(object):
+    """
+    Cache of HTTP GET responses under a directory, one JSON file per URL.
+    Thread safe, so concurrently fetched pages share it.
+    """
+
+    def __init__(self, directory=DEFAULT_DIR):
+        """
+        :argument directory where the responses are stored
+        """
+        self.directory = os.path.expanduser(directory)
+        self.lock = threading.Lock()
+        self.hits = 0          # requests answered 304 and served from the cache
+        self.misses = 0        # requests answered with a full response
+        self.saved_bytes = 0   # size of the bodies served from the cache
+
+    #File of the cached response of a URL
+    def path(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    #Read the cache entry of a URL, None if there is none
+    def load(self, url):
+        try:
+            with open(self.path(url)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    #Write the cache entry of a URL
+    def store(self, url, response):
+        entry = {'url': url,
+                 'etag': response.headers.get('ETag'),
+                 'last_modified': response.headers.get('Last-Modified'),
+                 'headers': dict(response.headers),
+                 'body': response.text}
+        path = self.path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # written to a temporary file first, so a concurrent reader never sees half an entry
+        temp = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp, 'w') as f:
+            json.dump(entry, f)
+        os.replace(temp, path)
+
+    #Build the response a 304 stands for from a cache entry
+    @staticmethod
+    def cached_response(entry, response):
+        """
+        The headers of the 304 replace the cached ones: the ETag covers the body but
+        not e.g. the Link header, whose last page grows when entries are added.
+        :argument entry the cache entry (see store)
+        :argument response the 304 response
+        returns a requests.Response with status 200
+        """
+        cached = requests.Response()
+        cached.status_code = 200
+        cached.headers = CaseInsensitiveDict(entry['headers'])
+        cached.headers.update((name, value) for name, value in response.headers.items()
+                              if name.lower() not in BODY_HEADERS)
+        cached._content = entry['body'].encode('utf-8')
+        cached.encoding = 'utf-8'
+        cached.url = response.url
+        cached.request = response.request
+        return cached
+
+    #Send a GET request, conditional if the URL is cached
+    def request(self, send, url, params=None, headers=None):
+        """
+        :argument send function of (url, params, headers) sending the request and returning its requests.Response
+        :argument url URL of the resource
+        :argument params dict of query parameters
+        :argument headers dict of headers to send
+        returns the response, or for a 304 the cached response with status 200
+        """
+        key = requests.Request('GET', url, params=params).prepare().url
+        entry = self.load(key)
+        headers = dict(headers or {})
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = send(url, params, headers)
+        if response.status_code == 304 and entry:
+            with self.lock:
+                self.hits += 1
+                self.saved_bytes += len(entry['body'])
+            cached = self.cached_response(entry, response)
+            if cached.headers.get('Link') != entry['headers'].get('Link'):
+                self.store(key, cached)
+            return cached
+
+        with self.lock:
+            self.misses += 1
+        if response.status_code == 200 and (response.headers.get('ETag') or response.headers.get('Last-Modified')):
+            self.store(key, response)
+        return response
+
+    #Get the hits, misses, hit rate and bytes served from the cache
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': round(self.hits / total, 3) if total else None,
+                    'saved_bytes': self.saved_bytes}
+
+    #Log the stats
+    def report(self):
+        stats = self.stats()
+        logger.info(f'HTTP cache: {stats["hits"]} hits, {stats["misses"]} misses, '
+                    f'{stats["saved_bytes"]} bytes served from {self.directory}.')
+        return stats
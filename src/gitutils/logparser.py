@@ -0,0 +1,541 @@
+"""Parser for `git log -p` output.
+
+The log is read one line at a time and the lines of each commit are parsed
+into a compact `CommitRecord` (see `parseCommit`).
+Hunk boundaries come from the line counts in the `@@` hunk headers, so diff
+content that happens to look like a header (e.g. a removed `-- comment` line,
+which shows up as `--- comment`) is never misread.
+
+Memory use per commit is bounded: the patch text kept for a file and for a
+commit is limited, and binary content is dropped; the line counts always
+cover the whole change (see `parseCommit`).
+
+Output of `git log --numstat` is parsed the same way: every numstat line
+becomes a FileDiff with only the added/removed counts and no hunks.
+
+Parsed commits are handed to a sink, an object with a `start(tips)` method
+called with the ref tips being mined before the first commit, an
+`add(commit)` method and a `close()` method returning the result:
+
+  AuthorSink: commits grouped per author (GitCommand.getRepoCommitData layout)
+  ListSink: flat list of commits (GitCommand.getAllCommits layout)
+  ThreadedSink: runs another sink (e.g. the database writer) in its own thread
+
+Run as a script to measure the parser throughput on a local repository:
+
+  python -m src.gitutils.logparser [REPO_DIR] [--max-count N]
+"""
+
+import queue
+import re
+import threading
+import time
+
+# default limits for the patch text kept per file and per commit, in bytes
+FILE_LIMIT = 1 << 20
+COMMIT_LIMIT = 16 << 20
+# last line of a diff whose patch text was cut off
+TRUNCATED = b'\\ Diff truncated, %d lines added and %d lines removed in total'
+
+HUNK_HEADER = re.compile(rb'^@@ -\d+(?:,(\d+))? \+\d+(?:,(\d+))? @@')
+NUMSTAT = re.compile(rb'^(\d+|-)\t(\d+|-)\t(.*)$')
+RENAME = re.compile(r'^(.*)\{(.*) => (.*)\}(.*)$')
+# C escapes of quoted paths (see unquotePath), besides \ooo octal bytes
+ESCAPES = {'a': 7, 'b': 8, 't': 9, 'n': 10, 'v': 11, 'f': 12, 'r': 13, '"': 34, '\\': 92}
+
+
+class FileDiff(object):
+    """
+    Changes to one file in a commit.
+    """
+    __slots__ = ('filename', 'header', 'hunks', 'added', 'removed', 'binary', 'truncated', 'paths')
+
+    def __init__(self, filename, header=None, hunks=None, added=0, removed=0, binary=False, truncated=False, paths=None):
+        # the part of the 'diff --git' line after 'diff --git ' (str), 'a/<old path> b/<new path>' for numstat lines
+        self.filename = filename
+        self.header = header if header is not None else []   # extended header lines up to the first hunk (bytes)
+        self.hunks = hunks if hunks is not None else []      # hunk header and content lines (bytes)
+        self.added = added            # number of added lines
+        self.removed = removed        # number of removed lines
+        self.binary = binary          # True for binary files
+        self.truncated = truncated    # True if hunk lines were left out (see parseCommit)
+        self.paths = paths            # (path, newpath), found on first use (see diffPaths)
+
+    #Path of the file before the change (the a/ side of the diff line)
+    @property
+    def path(self):
+        if self.paths is None:
+            self.paths = diffPaths(self.filename, self.header)
+        return self.paths[0]
+
+    #Path of the file after the change (the b/ side of the diff line), differs from path for renames
+    @property
+    def newpath(self):
+        if self.paths is None:
+            self.paths = diffPaths(self.filename, self.header)
+        return self.paths[1]
+
+    #Hunk lines as text, as stored in the diff table
+    @property
+    def body(self):
+        return b'\n'.join(self.hunks).decode('utf-8', errors='ignore')
+
+    def legacy_header(self):
+        # header lines and the first hunk header, concatenated without separators
+        return b''.join(self.header + self.hunks[:1]).decode('utf-8', errors='ignore')
+
+    def asdict(self):
+        return {'filename': self.filename, 'diff': self.body.split('\n') if self.hunks else [],
+                'header': self.legacy_header()}
+
+
+class CommitRecord(object):
+    """
+    One non-merge commit from `git log -p`.
+    """
+    __slots__ = ('id', 'author', 'date', 'message', 'diffs', 'branches')
+
+    def __init__(self, id, author, date, message, diffs, branches=''):
+        self.id = id                # commit sha (str)
+        self.author = author        # 'Name <email>' (bytes, as printed by git)
+        self.date = date            # ISO 8601 date (bytes, as printed by git)
+        self.message = message      # commit message, one indented line per message line (str)
+        self.diffs = diffs          # list of FileDiff
+        self.branches = branches    # branches containing the commit, filled in by the caller
+
+    def asdict(self):
+        return {'id': self.id, 'date': self.date, 'message': self.message,
+                'diffs': [diff.asdict() for diff in self.diffs], 'branches': self.branches}
+
+
+#Find the closing quote of a quoted path at the start of a string
+def quoteEnd(text):
+    """
+    :argument text a string starting with '"'
+    returns the index of the closing quote, -1 if there is none
+    """
+    i = 1
+    while i < len(text):
+        if text[i] == '\\':
+            i += 2
+        elif text[i] == '"':
+            return i
+        else:
+            i += 1
+    return -1
+
+#Decode a path quoted by git, e.g. "t\303\251st.txt" for a name with special or non-ASCII characters
+def unquotePath(name):
+    """
+    :argument name a path as printed by git, quoted or not
+    returns the path, as is if it is not quoted
+    """
+    if len(name) < 2 or name[0] != '"' or name[-1] != '"':
+        return name
+    data = bytearray()
+    i = 1
+    while i < len(name) - 1:
+        if name[i] == '\\':
+            if name[i + 1] in '01234567':
+                data.append(int(name[i + 1:i + 4], 8))
+                i += 4
+            else:
+                data.append(ESCAPES.get(name[i + 1], ord(name[i + 1])))
+                i += 2
+        else:
+            data += name[i].encode('utf-8')
+            i += 1
+    return data.decode('utf-8', errors='ignore')
+
+#Split two paths printed by git, each of them quoted or not, e.g. 'a/old "b/n\303\251w"'
+def splitPaths(text, separator):
+    """
+    :argument text the two paths
+    :argument separator the separator, e.g. ' ' or ' => '
+    returns (first path, second path) unquoted, or None if text does not hold two paths
+    """
+    if text.startswith('"'):
+        end = quoteEnd(text)
+        if end < 0 or not text.startswith(separator, end + 1):
+            return None
+        return unquotePath(text[:end + 1]), unquotePath(text[end + 1 + len(separator):])
+    if text.endswith('"') and separator + '"' in text:
+        # an unquoted path cannot contain a quote, so the first one starts the second path
+        first, second = text.split(separator + '"', 1)
+        return first, unquotePath('"' + second)
+    return None
+
+#Get the paths of a file before and after the change from its diff
+def diffPaths(filename, header=()):
+    """
+    Both sides of the 'diff --git' line are quoted if they have special characters, but not if they
+    only have spaces, so the line is ambiguous for a renamed file with spaces in its name; the
+    'rename from'/'rename to' (or copy) header lines tell the paths then.
+    :argument filename the part of the 'diff --git' line after 'diff --git '
+    :argument header the extended header lines (bytes)
+    returns (path before, path after)
+    """
+    old = new = None
+    for line in header:
+        for prefix in (b'rename from ', b'copy from '):
+            if line.startswith(prefix):
+                old = unquotePath(line[len(prefix):].decode('utf-8', errors='ignore'))
+        for prefix in (b'rename to ', b'copy to '):
+            if line.startswith(prefix):
+                new = unquotePath(line[len(prefix):].decode('utf-8', errors='ignore'))
+    if old is not None and new is not None:
+        return old, new
+
+    paths = splitPaths(filename, ' ')
+    if paths:
+        return paths[0][2:], paths[1][2:]
+    # 'a/<path> b/<path>' with the same path on both sides
+    half = (len(filename) - 1) // 2
+    if len(filename) % 2 == 1 and filename[half:half + 3] == ' b/' and filename[2:half] == filename[half + 3:]:
+        return filename[2:half], filename[half + 3:]
+    split = filename.rindex(' b/')
+    return filename[2:split], filename[split + 3:]
+
+#Split the path of a numstat line into the paths before and after the change
+def numstatPaths(path):
+    """
+    :argument path the path as printed by numstat, 'old => new' or 'dir/{old => new}/file' for renames,
+    quoted like in diffPaths
+    returns (path before, path after)
+    """
+    if path.startswith('"') or path.endswith('"'):
+        paths = splitPaths(path, ' => ')
+        if paths:
+            return paths
+        return unquotePath(path), unquotePath(path)
+    match = RENAME.match(path)
+    if match:
+        prefix, old, new, suffix = match.groups()
+        # '{ => dir}' or '{dir => }' leave an extra separator behind
+        return ((prefix + old + suffix).replace('//', '/').lstrip('/'),
+                (prefix + new + suffix).replace('//', '/').lstrip('/'))
+    if ' => ' in path:
+        old, new = path.split(' => ', 1)
+        return old, new
+    return path, path
+
+
+#Parse the lines of a single commit from `git log -p` or `git log --numstat` output
+def parseCommit(first, lines, filelimit=FILE_LIMIT, commitlimit=COMMIT_LIMIT):
+    """
+    Every commit starts with a 'commit <sha>' line. Patch and message lines are
+    always prefixed or indented, so such a line can only start the next commit,
+    and parsing one commit can never consume lines of the next one.
+
+    Hunk lines are kept up to filelimit bytes per file and commitlimit bytes per
+    commit (None for no limit), and not at all for binary files. The lines after
+    a limit are still counted. A diff that lost lines ends with a TRUNCATED line,
+    which starts with a backslash like git's own '\\ No newline at end of file'
+    line, so it is counted as neither an added nor a removed line.
+    :argument first the 'commit <sha>' line
+    :argument lines iterator over the following lines (bytes, without line terminators)
+    :argument filelimit maximum size of the hunks kept per file, in bytes
+    :argument commitlimit maximum size of the hunks kept per commit, in bytes
+    returns (CommitRecord or None for merge commits, the 'commit <sha>' line of the
+    next commit or None at the end of the log)
+    """
+    commitid = first.split()[1].decode('utf-8')
+    author = date = b''
+    merge = False
+
+    # commit headers up to the empty line before the message
+    for line in lines:
+        if not line:
+            break
+        elif line.startswith(b'commit '):
+            return None, line
+        elif line.startswith(b'Merge: '):
+            merge = True  # ignore merges, their lines are skipped below
+        elif line.startswith(b'Author: '):
+            author = line[8:]
+        elif line.startswith(b'Date: '):
+            date = line[8:]
+
+    # indented message lines up to the next empty line
+    message = []
+    for line in lines:
+        if not line:
+            break
+        elif line.startswith(b'commit '):
+            return None if merge else CommitRecord(commitid, author, date, b''.join(message).decode('utf-8', errors='ignore'), []), line
+        message.append(line + b'\n')
+    message = b''.join(message).decode('utf-8', errors='ignore')
+
+    diffs = []
+    diff = None
+    filesize = 0
+    commitsize = 0
+    line = next(lines, None)
+    while line is not None:
+        if line.startswith(b'commit '):
+            break
+        elif merge:
+            pass
+        elif line.startswith(b'diff --git '):
+            diff = FileDiff(line[11:].decode('utf-8', errors='ignore'))
+            diffs.append(diff)
+            filesize = 0
+        elif diff is None:
+            match = NUMSTAT.match(line)
+            if match:
+                # binary files have '-' counts
+                added, removed, path = match.groups()
+                paths = numstatPaths(path.decode('utf-8', errors='ignore'))
+                diffs.append(FileDiff('a/%s b/%s' % paths, paths=paths,
+                                      added=int(added) if added != b'-' else 0,
+                                      removed=int(removed) if removed != b'-' else 0,
+                                      binary=added == b'-'))
+        elif line.startswith(b'@@'):
+            match = HUNK_HEADER.match(line)
+            if match:
+                old = int(match.group(1)) if match.group(1) is not None else 1
+                new = int(match.group(2)) if match.group(2) is not None else 1
+
+                # bytes that can still be kept for this file
+                budget = min(filelimit - filesize if filelimit is not None else float('inf'),
+                             commitlimit - commitsize if commitlimit is not None else float('inf'))
+                keep = not diff.truncated
+                used = 0
+                hunk = diff.hunks
+                added = removed = 0
+                size = len(line) + 1
+                if keep and size > budget:
+                    diff.truncated = True
+                    keep = False
+                elif keep:
+                    hunk.append(line)
+                    used = size
+
+                line = None
+                for line in lines:
+                    kind = line[:1]
+                    if kind == b'+':
+                        new -= 1
+                        added += 1
+                    elif kind == b'-':
+                        old -= 1
+                        removed += 1
+                    elif kind == b' ' or not line:
+                        # context line (an empty line is context with trailing whitespace stripped)
+                        old -= 1
+                        new -= 1
+                    elif kind != b'\\':
+                        break  # not a hunk line, the hunk header was wrong
+                    if keep:
+                        if b'\0' in line:
+                            # git only looks for NUL bytes near the start of a file to detect binary files
+                            diff.binary = diff.truncated = True
+                            keep = False
+                        else:
+                            size = len(line) + 1
+                            if used + size > budget:
+                                diff.truncated = True
+                                keep = False
+                            else:
+                                hunk.append(line)
+                                used += size
+                    if old <= 0 and new <= 0:
+                        line = None
+                        break
+                else:
+                    line = None
+
+                diff.added += added
+                diff.removed += removed
+                if diff.binary:
+                    # keep the header of the first hunk, it is part of the legacy header
+                    commitsize -= filesize
+                    filesize = 0
+                    del hunk[1:]
+                else:
+                    filesize += used
+                    commitsize += used
+                if line is not None:
+                    continue  # parse the line that ended the hunk again
+        elif line.startswith(b'\\') and diff.hunks:
+            # \ No newline at end of file, right after the last hunk line
+            if not diff.truncated:
+                diff.hunks.append(line)
+        elif line and not diff.hunks:
+            diff.header.append(line)
+            if line.startswith(b'Binary files ') or line == b'GIT binary patch':
+                diff.binary = True
+        line = next(lines, None)
+
+    if merge:
+        return None, line
+
+    for diff in diffs:
+        if diff.truncated:
+            diff.hunks.append(TRUNCATED % (diff.added, diff.removed))
+
+    return CommitRecord(commitid, author, date, message, diffs), line
+
+
+#Parse `git log -p` or `git log --numstat` output
+def parseCommitLog(lines, filelimit=FILE_LIMIT, commitlimit=COMMIT_LIMIT):
+    """
+    The log is read lazily, only the lines of one commit are kept at a time.
+    :argument lines iterable of lines (bytes, without line terminators)
+    :argument filelimit, commitlimit see parseCommit
+    yields CommitRecord for each non-merge commit, in log order
+    """
+    lines = iter(lines)
+    line = next((line for line in lines if line.startswith(b'commit ')), None)
+    while line is not None:
+        commit, line = parseCommit(line, lines, filelimit, commitlimit)
+        if commit:
+            yield commit
+
+
+class AuthorSink(object):
+    """
+    Groups commits per author. The result maps the author (bytes) to {'total_commits': int, 'commits': [dict]},
+    with the commits in the dict layout of CommitRecord.asdict().
+    """
+
+    def __init__(self):
+        self.commits = {}
+
+    def start(self, tips):
+        pass
+
+    def add(self, commit):
+        #track the number of commits for this author
+        if commit.author in self.commits:
+            self.commits[commit.author]['total_commits'] += 1
+        else:
+            self.commits[commit.author] = {'total_commits': 1, 'commits': []}
+        self.commits[commit.author]['commits'].append(commit.asdict())
+
+    def close(self):
+        return self.commits
+
+
+class ListSink(object):
+    """
+    Collects commits in a flat list of dicts (see CommitRecord.asdict).
+    """
+
+    def __init__(self):
+        self.commits = []
+
+    def start(self, tips):
+        pass
+
+    def add(self, commit):
+        self.commits.append(commit.asdict())
+
+    def close(self):
+        return self.commits
+
+
+class ThreadedSink(object):
+    """
+    Runs another sink in a separate thread, fed through a bounded queue.
+
+    Parsing goes on in the calling thread while the wrapped sink handles the
+    commits parsed so far, e.g. writes them to the database. When `maxsize`
+    commits are waiting, add() blocks until the sink catches up, so memory use
+    stays bounded however fast the commits are parsed. An exception raised by
+    the wrapped sink is raised again by the next add() or by close().
+
+    The time spent in each stage is accumulated in `timings`, in seconds:
+      produce: in the calling thread between two calls, i.e. running git and parsing
+      produce_cpu: CPU time of the calling thread in produce, i.e. parsing; the rest
+        of produce is mostly spent waiting for the output of git
+      wait: blocked in add() on a full queue
+      consume: in the wrapped sink
+    """
+
+    def __init__(self, sink, maxsize=500):
+        self.sink = sink
+        self.queue = queue.Queue(maxsize)
+        self.error = None
+        self.timings = {'produce': 0.0, 'produce_cpu': 0.0, 'wait': 0.0, 'consume': 0.0}
+        self.thread = threading.Thread(target=self._run, name='sink', daemon=True)
+        self.thread.start()
+        self.last = time.perf_counter()
+        self.last_cpu = time.thread_time()
+
+    def _run(self):
+        while True:
+            method, args = self.queue.get()
+            if method is None:
+                return
+            # after an error the queue is still drained so that add() does not block
+            if self.error is None:
+                start = time.perf_counter()
+                try:
+                    getattr(self.sink, method)(*args)
+                except BaseException as e:
+                    self.error = e
+                self.timings['consume'] += time.perf_counter() - start
+
+    def _put(self, method, *args):
+        start = time.perf_counter()
+        self.timings['produce'] += start - self.last
+        self.timings['produce_cpu'] += time.thread_time() - self.last_cpu
+        if self.error is not None:
+            raise self.error
+        self.queue.put((method, args))
+        self.last = time.perf_counter()
+        self.last_cpu = time.thread_time()
+        self.timings['wait'] += self.last - start
+
+    def start(self, tips):
+        self._put('start', tips)
+
+    def add(self, commit):
+        self._put('add', commit)
+
+    def close(self):
+        self._put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        start = time.perf_counter()
+        result = self.sink.close()
+        self.timings['consume'] += time.perf_counter() - start
+        return result
+
+
+#Measure the parser throughput
+def benchmark(lines, repeat=3):
+    """
+    :argument lines list of `git log -p` output lines (bytes)
+    :argument repeat number of runs, the fastest one is reported
+    returns (lines per second, number of commits parsed)
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        commits = sum(1 for commit in parseCommitLog(lines))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(lines) / best if best else float('inf'), commits
+
+
+if __name__ == '__main__':
+    import argparse
+    import subprocess
+
+    parser = argparse.ArgumentParser(description='Measure the git log parser throughput.')
+    parser.add_argument('repo', help='local git repository', nargs='?', default='.')
+    parser.add_argument('--max-count', help='number of commits to parse', type=int, default=5000)
+    parser.add_argument('--numstat', help='parse `git log --numstat` instead of patches', action='store_true')
+    args = parser.parse_args()
+
+    mode = ['--numstat', '-M'] if args.numstat else ['-p', '-M', '--function-context']
+    out = subprocess.run(['git', 'log', '--all', '--date=iso-strict-local'] + mode +
+                         ['--max-count=%d' % args.max_count],
+                         cwd=args.repo, stdout=subprocess.PIPE, check=True).stdout
+    lines = [line.rstrip(b'\r') for line in out.split(b'\n')]
+    rate, commits = benchmark(lines)
+    print('%d commits, %d lines, %.0f lines/sec (%.1f MB/sec)'
+          % (commits, len(lines), rate, rate * len(out) / len(lines) / 1e6))
@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import os
+import re
+from shlex import quote
+
+from .command import Command
+from .utils import err
+
+# Setup Logger
+logger = logging.getLogger('db_interface')
+
+
+class MirrorCache(object):
+    """
+    A directory of bare git mirrors, one per source URL.
+
+    A mirror is cloned once and afterwards only updated with `git fetch --prune`,
+    so an update transfers just the objects that are new upstream. Only branches
+    and tags are mirrored (not e.g. GitHub's refs/pull/*), with the same names as
+    upstream. Nothing is ever checked out in a mirror: the history is read from it
+    directly and files are read with readObject or in a disposable worktree (see
+    addWorktree).
+    """
+
+    def __init__(self, root=None, blobless=False):
+        """
+        :argument root the directory of the mirrors, defaults to ~/.ideas-temp/mirrors
+        :argument blobless if True, new mirrors are partial clones (--filter=blob:none)
+        that download file contents on demand. This is much smaller and faster to clone
+        when only the commit history is needed, but slow for mining patches.
+        """
+        if root is None:
+            root = os.path.join(os.environ['HOME'], '.ideas-temp', 'mirrors')
+        self.root = os.path.abspath(root)
+        self.blobless = blobless
+        if not os.path.exists(self.root): os.makedirs(self.root)
+
+    #Directory of the mirror of a URL
+    def getPath(self, url):
+        """
+        :argument url the repository URL
+        returns the mirror directory, named after the repository and a hash of the URL
+        so forks with the same name do not collide
+        """
+        name = os.path.split(url.rstrip('/'))[-1]
+        if name.endswith('.git'): name = name[:-4]
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', name) or 'repo'
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.root, '%s-%s.git' % (name, digest))
+
+    #Clone or fetch the mirror of a URL
+    def update(self, url):
+        """
+        :argument url the repository URL
+        returns the mirror directory if successful, False otherwise
+        """
+        path = self.getPath(url)
+        if not os.path.exists(os.path.join(path, 'HEAD')):
+            logger.debug('Cloning %s into %s' % (url, path))
+            tmppath = path + '.tmp'
+            if os.path.exists(tmppath):
+                # left over from an interrupted clone
+                Command('rm -rf %s' % quote(tmppath)).run()
+            options = '--bare --quiet' + (' --filter=blob:none' if self.blobless else '')
+            retcode, out, error = Command('git clone %s %s %s' % (options, quote(url), quote(tmppath))).run()
+            if retcode != 0:
+                return err('Could not clone repository %s: %s' % (url, error.decode('utf-8', errors='ignore')))
+            # a bare clone has no fetch refspec; mirror branches and tags under their own names
+            for args in ['config remote.origin.fetch "+refs/heads/*:refs/heads/*"',
+                         'config --add remote.origin.fetch "+refs/tags/*:refs/tags/*"']:
+                Command('git ' + args).run(cwd=tmppath)
+            # only a complete clone becomes visible as a mirror
+            os.rename(tmppath, path)
+            return path
+
+        logger.debug('Fetching %s into %s' % (url, path))
+        retcode, out, error = Command('git fetch --quiet --prune origin').run(cwd=path)
+        if retcode != 0:
+            return err('Could not fetch repository %s: %s' % (url, error.decode('utf-8', errors='ignore')))
+        return path
+
+    #Check out a revision of a mirror into a separate directory
+    def addWorktree(self, url, dest, rev='HEAD'):
+        """
+        Create a worktree of the mirror at dest, or reset the existing one, with a clean
+        detached checkout of rev. Local changes and untracked files in dest are discarded,
+        so a worktree cannot be left dirty by an earlier run. The mirror is not updated.
+        :argument url the repository URL (see update)
+        :argument dest the worktree directory
+        returns dest if successful, False otherwise
+        """
+        path = self.getPath(url)
+        dest = os.path.abspath(dest)
+        if dest in self.getWorktrees(url):
+            commands = ['git checkout --quiet --force --detach %s' % quote(rev), 'git clean --quiet -ffdx']
+            cwd = dest
+        elif os.path.exists(dest):
+            return err('Could not create a worktree in %s: the directory exists and is not a worktree of %s' % (dest, path))
+        else:
+            commands = ['git worktree prune', 'git worktree add --quiet --force --detach %s %s' % (quote(dest), quote(rev))]
+            cwd = path
+        for command in commands:
+            retcode, out, error = Command(command).run(cwd=cwd)
+            if retcode != 0:
+                return err('Could not check out %s in %s: %s' % (rev, dest, error.decode('utf-8', errors='ignore')))
+        return dest
+
+    #Delete a worktree created by addWorktree
+    def removeWorktree(self, url, dest):
+        retcode, out, error = Command('git worktree remove --force %s' % quote(os.path.abspath(dest))).run(cwd=self.getPath(url))
+        return retcode == 0
+
+    #Get the worktree directories of a mirror
+    def getWorktrees(self, url):
+        retcode, out, error = Command('git worktree list --porcelain').run(cwd=self.getPath(url))
+        worktrees = [line[9:] for line in out.decode('utf-8').splitlines() if line.startswith('worktree ')]
+        # the first entry is the mirror itself
+        return [os.path.abspath(worktree) for worktree in worktrees[1:]]
+
+    #Read a file or any other object from a mirror without checking it out
+    def readObject(self, url, obj):
+        """
+        :argument url the repository URL (see update)
+        :argument obj the object name, e.g. '<commit>:<path>' for a file at a commit
+        returns the object contents (bytes), or None if it does not exist
+        """
+        retcode, out, error = Command('git cat-file -p %s' % quote(obj)).run(cwd=self.getPath(url))
+        if retcode != 0:
+            return None
+        return out
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+'''
+    Benchmark of the lookups run most often by the ingestion scripts and the MeerCat views.
+
+    Seeds a scratch MySQL or SQLite database, whose tables were created by the Django migrations,
+    with a synthetic project and prints the EXPLAIN plan and mean time of each query, first
+    without and then with the indexes of migration 0082_ingest_lookup_indexes:
+
+        python3 -m src.gitutils.query_benchmark --username USERNAME --password PASSWORD --database ideas_bench --commits 100000
+        python3 -m src.gitutils.query_benchmark --sqlite bench.sqlite3 --commits 100000
+
+    The indexes are dropped for the first run and created again for the second one, so
+    never run this against the production database.
+'''
+
+import argparse
+import hashlib
+import random
+import time
+
+from .backends import connect_mysql, connect_sqlite
+
+# (name, table, columns) of the indexes added by migration 0082_ingest_lookup_indexes
+INDEXES = [
+    ('author_username_email_idx', 'author', ('username', 'email')),
+    ('author_username_url_idx', 'author', ('username', 'url')),
+    ('commit_hash_idx', 'commit', ('hash',)),
+    ('commit_project_datetime_idx', 'commit', ('project_id', 'datetime')),
+    ('diff_file_path_commit_idx', 'diff', ('file_path', 'commit_id')),
+    ('event_actor_login_url_idx', 'event_actor', ('login', 'url', 'actor_id')),
+]
+
+def commit_args(project_id, rng, commits):
+    return (sha(rng.randrange(commits)),)
+
+def author_email_args(project_id, rng, commits):
+    i = rng.randrange(authors(commits))
+    return ('user%d' % i, 'user%d@example.com' % i)
+
+def author_url_args(project_id, rng, commits):
+    i = rng.randrange(authors(commits))
+    return ('user%d' % i, 'https://github.com/user%d' % i)
+
+def actor_args(project_id, rng, commits):
+    i = rng.randrange(authors(commits))
+    return ('user%d' % i, 'https://api.github.com/users/user%d' % i, i)
+
+def file_args(project_id, rng, commits):
+    return (project_id, path(rng.randrange(files(commits))))
+
+def range_args(project_id, rng, commits):
+    # about two months of the hourly seeded commits
+    start = rng.randrange(max(commits - 1440, 1))
+    return (project_id, date(start), date(start + 1440))
+
+# (description, query, function of (project id, random number generator, seeded commits) -> parameters)
+# pr.url is not here: it has had a unique key since migration 0081_unique_pr_issue_keys
+QUERIES = [
+    ('commit by hash (CommitWriter)',
+     'select id from commit where hash=%s', commit_args),
+    ('author by username and email (CommitWriter)',
+     'select id from author where username=%s and email=%s', author_email_args),
+    ('author by username and url (add_prs, add_issues)',
+     'select id from author where username=%s and url=%s', author_url_args),
+    ('event actor by login, url and id (add_events)',
+     'select id from event_actor where login=%s and url=%s and actor_id=%s', actor_args),
+    ('diffs of a file in a project (dashboard file views)',
+     'select diff.id from diff join commit on diff.commit_id=commit.id where commit.project_id=%s and diff.file_path=%s', file_args),
+    ('commits of a project in a date range (dashboard activity)',
+     'select id, datetime from commit where project_id=%s and datetime between %s and %s order by datetime', range_args),
+]
+
+def sha(i):
+    return hashlib.sha1(b'benchmark-%d' % i).hexdigest()
+
+def authors(commits):
+    return max(commits // 20, 1)
+
+def files(commits):
+    return max(commits // 10, 1)
+
+def path(i):
+    return 'src/module%d/file%d.py' % (i % 50, i)
+
+def date(i):
+    # one commit per hour from 2010-01-01
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(1262304000 + i * 3600))
+
+def init_cmdline_parser():
+    parser = argparse.ArgumentParser(description='Time the hot ingest and dashboard queries with and without their indexes.')
+    parser.add_argument('--host', help='host for mysql connection', type=str, default='localhost')
+    parser.add_argument('--username', help='username for mysql connection', type=str)
+    parser.add_argument('--password', help='password for mysql connection', type=str)
+    parser.add_argument('--port', help='port for mysql connection', type=int, default=3306)
+    parser.add_argument('--database', help='scratch database for the benchmark', type=str, default='ideas_bench')
+    parser.add_argument('--sqlite', help='scratch SQLite database file to use instead of MySQL', type=str)
+    parser.add_argument('--commits', help='number of commits to seed (with 3 diffs each)', type=int, default=100000)
+    parser.add_argument('--repeat', help='number of times each query is run', type=int, default=200)
+    return parser
+
+def seed(db, commits, batch=1000):
+    '''
+        Inserts the benchmark project with its authors, commits, diffs and event actors,
+        unless it exists already. Returns the project id.
+    '''
+    url = 'https://github.com/benchmark/benchmark.git'
+    with db.cursor() as cursor:
+        cursor.execute('select id from project where source_url=%s', (url,))
+        row = cursor.fetchone()
+        if row:
+            return row[0]
+
+        print(f'Seeding {commits} commits...')
+        query = 'insert into project (name, source_url, last_updated, fork_of_id, child_of_id, has_github, has_gitlab, github_last_updated, gitlab_last_updated, ' \
+                'complete_ignore_extensions, complete_ignore_filenames, documentation_ignore_extensions, documentation_ignore_filenames, doctypes) ' \
+                'values (%s, %s, utc_timestamp(), NULL, NULL, 0, 0, utc_timestamp(), utc_timestamp(), \'[]\', \'[]\', \'[]\', \'[]\', \'{}\')'
+        cursor.execute(query, ('benchmark', url,))
+        project_id = cursor.lastrowid
+
+        query = 'insert into author (username, email, name, url) values (%s, %s, %s, %s)'
+        rows = [('user%d' % i, 'user%d@example.com' % i, 'User %d' % i, 'https://github.com/user%d' % i) for i in range(authors(commits))]
+        cursor.executemany(query, rows)
+        cursor.execute('select min(id) from author where username=%s', ('user0',))
+        first_author = cursor.fetchone()[0]
+
+        query = 'insert into event_actor (actor_id, login, url, avatar_url, gravatar_id) values (%s, %s, %s, %s, %s)'
+        rows = [(i, 'user%d' % i, 'https://api.github.com/users/user%d' % i, 'https://avatars.githubusercontent.com/u/%d' % i, '') for i in range(authors(commits))]
+        cursor.executemany(query, rows)
+
+        rng = random.Random(0)
+        for start in range(0, commits, batch):
+            ids = range(start, min(start + batch, commits))
+            query = 'insert into commit (hash, datetime, author_id, project_id, message, branch) values (%s, %s, %s, %s, %s, %s)'
+            rows = [(sha(i), date(i), first_author + i % authors(commits), project_id, 'Commit %d' % i, 'main') for i in ids]
+            cursor.executemany(query, rows)
+            cursor.execute('select hash, id from commit where project_id=%s and hash in (%s)' % ('%s', ', '.join(['%s'] * len(rows))), [project_id] + [row[0] for row in rows])
+            commit_ids = dict(cursor.fetchall())
+
+            query = 'insert into diff (file_path, language, commit_id, body, header, lines_added, lines_removed) values (%s, %s, %s, %s, %s, %s, %s)'
+            rows = [(path(rng.randrange(files(commits))), 'PLACEHOLDER', commit_ids[sha(i)], '+line', None, 1, 0) for i in ids for _ in range(3)]
+            cursor.executemany(query, rows)
+            db.commit()
+        return project_id
+
+def set_indexes(db, create):
+    sqlite = getattr(db, 'dialect', 'mysql') == 'sqlite'
+    with db.cursor() as cursor:
+        for name, table, columns in INDEXES:
+            if sqlite:
+                cursor.execute("select name from sqlite_master where type='index' and name=%s", (name,))
+            else:
+                cursor.execute('show index from %s where key_name=%%s' % table, (name,))
+            exists = bool(cursor.fetchall())
+            if create and not exists:
+                cursor.execute('create index %s on %s (%s)' % (name, table, ', '.join(columns)))
+            elif not create and exists:
+                cursor.execute('drop index %s' % name if sqlite else 'drop index %s on %s' % (name, table))
+        if sqlite:
+            cursor.execute('analyze')
+        else:
+            for table in set(table for name, table, columns in INDEXES):
+                cursor.execute('analyze table %s' % table)
+                cursor.fetchall()
+
+def run(db, project_id, commits, repeat):
+    '''
+        Prints the plan of each query and returns the mean time of each query in ms.
+    '''
+    sqlite = getattr(db, 'dialect', 'mysql') == 'sqlite'
+    timings = []
+    with db.cursor() as cursor:
+        for description, query, params in QUERIES:
+            rng = random.Random(1)
+            cursor.execute(('explain query plan ' if sqlite else 'explain ') + query, params(project_id, rng, commits))
+            columns = [column[0] for column in cursor.description]
+            print(f'\n{description}\n  {query}')
+            for row in cursor.fetchall():
+                plan = dict(zip(columns, row))
+                if sqlite:
+                    print(f"  {plan['detail']}")
+                else:
+                    print(f"  table={plan.get('table')} type={plan.get('type')} key={plan.get('key')} rows={plan.get('rows')} extra={plan.get('Extra')}")
+
+            elapsed = 0
+            for _ in range(repeat):
+                args = params(project_id, rng, commits)
+                start = time.perf_counter()
+                cursor.execute(query, args)
+                cursor.fetchall()
+                elapsed += time.perf_counter() - start
+            timings.append(elapsed / repeat * 1000)
+            print(f'  {timings[-1]:.3f} ms')
+    return timings
+
+def main():
+    args = init_cmdline_parser().parse_args()
+    if args.sqlite:
+        db = connect_sqlite(args.sqlite, bulk=True)
+    else:
+        db = connect_mysql(args.host, args.port, args.username, args.password, args.database)
+    project_id = seed(db, args.commits)
+
+    print('\n=== Without indexes ===')
+    set_indexes(db, create=False)
+    before = run(db, project_id, args.commits, args.repeat)
+
+    print('\n=== With indexes ===')
+    set_indexes(db, create=True)
+    after = run(db, project_id, args.commits, args.repeat)
+
+    print('\n=== Mean time per query (ms) ===')
+    for (description, query, params), old, new in zip(QUERIES, before, after):
+        print(f'{old:10.3f} {new:10.3f} {old / new if new else 0:8.1f}x  {description}')
+    db.close()
+
+if __name__ == '__main__':
+    main()
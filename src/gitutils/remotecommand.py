@@ -5,6 +5,9 @@ from bs4 import BeautifulSoup
 import gzip
 import mailbox
 
+from .github_api import fetch_pages
+from .httpcache import HTTPCache
+
 class RemoteCommand(object):
 
     def __init__(self):
@@ -27,129 +30,73 @@ class RemoteCommand(object):
         if not self.GITHUB_USER or self.GITHUB_PASSWORD:
             'You must specify the username and password to access the issues of the desired github repository.'
             #parser.print_usage(sys.stderr)
-        pass
+
+        #One session for all the requests, so the connections are kept alive
+        self.workers = 8
+        self.session = requests.Session()
+        self.session.auth = (self.GITHUB_USER, self.GITHUB_PASSWORD)
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=2 * self.workers))
+        #Responses kept on disk, unchanged pages are revalidated and not downloaded again
+        self.cache = HTTPCache()
+
+
+    #Get all the pages of a GitHub REST API resource
+    def getPages(self, url, params):
+        """
+        Once the first page tells the last one, the other pages are fetched
+        concurrently by self.workers threads over the connections of self.session.
+        Pages that did not change since the last call are served from self.cache.
+        :argument url GitHub REST API url of a paginated resource
+        :argument params query parameters, without the page
+        returns the entries of all the pages, in page order
+        """
+        def get(page):
+            print('Link accessing: ', url, 'page', page)
+            response = self.cache.request(self.send, url, dict(params, page=page))
+            if not response.status_code == 200:
+                raise Exception(response.status_code)
+            return response
+
+        result = []
+        for response in fetch_pages(get, workers=self.workers):
+            result.extend(response.json())
+
+        print('RESULTS '+str(len(result)))
+        stats = self.cache.stats()
+        print('Cache hits: '+str(stats['hits'])+', misses: '+str(stats['misses']))
+        return result
+
+
+    #Send a GET request with the session
+    def send(self, url, params, headers):
+        return self.session.get(url, params=params, headers=headers)
 
 
     #Get all of the issues for a repo
     def getIssues(self, reponame):
         
         print('Checking: ' + reponame)
-        
-        page = 1
-        result = [];
-
-        PULLS_FOR_REPO_URL = 'https://api.github.com/repos/%s/issues' % reponame
-        ARGS = '?state=all&page=1'
-        AUTH = (self.GITHUB_USER, self.GITHUB_PASSWORD)
-        print('Link accessing: ', PULLS_FOR_REPO_URL + ARGS)
-        response = requests.get(PULLS_FOR_REPO_URL + ARGS, auth=AUTH)
-        print('Request successful...... ', response)
-        print('Request length...... ', str(len(response.json())))
-        if not response.status_code == 200:
-            raise Exception(response.status_code)
-
-        #if there is a result add it 
-        result.extend(response.json())
-
-
-        while len(response.json()) > 0:
-            page = page+1
-            ARGS = '?state=all&page='+str(page)
-            print('Link accessing: ', PULLS_FOR_REPO_URL + ARGS)
-            response = requests.get(PULLS_FOR_REPO_URL + ARGS, auth=AUTH)
-            #print('Request successful...... ', response)
-            #print('Request length...... ', str(len(response.json())))
-            
-            #if there is a result add it 
-            result.extend(response.json())
-
-        #Need to iterate over all pages (link)
-        #&page=1
-        #for issue in response.json():
-        #    print(issue)
-
-        print('RESULTS '+str(len(result)))
 
         #need to return a dict of all the issues eventually
-        return result
+        return self.getPages('https://api.github.com/repos/%s/issues' % reponame, {'state': 'all', 'per_page': 100})
 
 
     #Get all of the comments for a repo
     def getComments(self, reponame):
         
         print('Checking: ' + reponame)
-        
-        page = 1
-        result = [];
-
-        PULLS_FOR_REPO_URL = 'https://api.github.com/repos/%s/issues/comments' % reponame
-        ARGS = '?state=all&page=1&per_page=100'
-        AUTH = (self.GITHUB_USER, self.GITHUB_PASSWORD)
-        print('Link accessing: ', PULLS_FOR_REPO_URL + ARGS)
-        response = requests.get(PULLS_FOR_REPO_URL + ARGS, auth=AUTH)
-        print('Request successful...... ', response)
-        print('Request length...... ', str(len(response.json())))
-        if not response.status_code == 200:
-            raise Exception(response.status_code)
-
-        #if there is a result add it 
-        result.extend(response.json())
-
-
-        while len(response.json()) > 0:
-            page = page+1
-            ARGS = '?state=all&page='+str(page)+'&per_page=100'
-            print('Link accessing: ', PULLS_FOR_REPO_URL + ARGS)
-            response = requests.get(PULLS_FOR_REPO_URL + ARGS, auth=AUTH)
-            #print('Request successful...... ', response)
-            print('Request length...... ', str(len(response.json())))
-            
-            #if there is a result add it 
-            result.extend(response.json())
-
-        print('RESULTS '+str(len(result)))
 
         #need to return a dict of all the comments
-        return result
+        return self.getPages('https://api.github.com/repos/%s/issues/comments' % reponame, {'state': 'all', 'per_page': 100})
 
 
     #Get all of the comments for a specific issue
     def getCommentsForIssue(self, reponame, issueNumber):
         
         print('Checking: ' + reponame)
-        
-        page = 1
-        result = [];
-
-        PULLS_FOR_REPO_URL = 'https://api.github.com/repos/%s/issues/%s/comments' % (reponame,str(issueNumber))
-        ARGS = '?state=all&page=1&per_page=100'
-        AUTH = (self.GITHUB_USER, self.GITHUB_PASSWORD)
-        print('Link accessing: ', PULLS_FOR_REPO_URL + ARGS)
-        response = requests.get(PULLS_FOR_REPO_URL + ARGS, auth=AUTH)
-        print('Request successful...... ', response)
-        print('Request length...... ', str(len(response.json())))
-        if not response.status_code == 200:
-            raise Exception(response.status_code)
-
-        #if there is a result add it 
-        result.extend(response.json())
-
-
-        while len(response.json()) > 0:
-            page = page+1
-            ARGS = '?state=all&page='+str(page)+'&per_page=100'
-            print('Link accessing: ', PULLS_FOR_REPO_URL + ARGS)
-            response = requests.get(PULLS_FOR_REPO_URL + ARGS, auth=AUTH)
-            #print('Request successful...... ', response)
-            print('Request length...... ', str(len(response.json())))
-            
-            #if there is a result add it 
-            result.extend(response.json())
-
-        print('RESULTS '+str(len(result)))
 
         #need to return a dict of all the comments
-        return result
+        return self.getPages('https://api.github.com/repos/%s/issues/%s/comments' % (reponame, str(issueNumber)), {'state': 'all', 'per_page': 100})
 
 
 
@@ -0,0 +1,177 @@
+"""Rate-limit-aware scheduling of GitHub and GitLab API requests.
+
+The REST and GraphQL clients (github_api, graphql_interface) send their requests
+through a RequestScheduler, which keeps the remaining requests and the reset time
+of every token from the rate limit headers (X-RateLimit-* on GitHub, RateLimit-*
+on GitLab) and the GraphQL `rateLimit { cost remaining resetAt }` field. Each
+request goes out with the token that has the most requests left; when all are used
+up the scheduler sleeps until the earliest reset instead of a fixed hour.
+"""
+
+import datetime
+import logging
+import threading
+import time
+
+logger = logging.getLogger('scheduler')
+
+# requests kept in reserve per token, so that concurrent requests do not overshoot the limit
+MARGIN = 1
+# seconds to wait after a rate limit error that does not tell when the limit resets
+DEFAULT_WAIT = 60
+
+
+#Split a comma separated list of tokens, e.g. the `tokens` of credentials.ini
+def parse_tokens(value):
+    return [token.strip() for token in value.split(',') if token.strip()]
+
+
+class RateLimit(object):
+    """
+    Requests left for one token on one API resource (e.g. core or graphql).
+    """
+
+    def __init__(self):
+        self.remaining = None   # requests left before the reset, None until a response tells
+        self.reset = 0.0        # time of the next reset, in seconds since the epoch
+
+    #Get the requests left at time now, infinite if unknown or reset
+    def left(self, now):
+        if self.remaining is None or now >= self.reset:
+            return float('inf')
+        return self.remaining
+
+
+class RequestScheduler(object):
+    """
+    Sends API requests with several tokens, respecting their rate limits.
+    Thread safe, so concurrent requests share the token budget.
+    """
+
+    def __init__(self, tokens, scheme='token', session=None):
+        """
+        :argument tokens API tokens to spread the requests over (none for unauthenticated requests)
+        :argument scheme authorization scheme, e.g. 'token' or 'bearer'
+        :argument session requests.Session the requests are sent with, a new one by default
+        """
+        if session is None:
+            import requests
+            session = requests.Session()
+        self.tokens = list(tokens) or [None]
+        self.scheme = scheme
+        self.session = session
+        self.limits = {}   # (token, resource) -> RateLimit
+        self.lock = threading.Lock()
+        self.sleeps = 0
+        self.slept = 0.0
+
+    def limit(self, token, resource):
+        return self.limits.setdefault((token, resource), RateLimit())
+
+    #Get the token with the most requests left on a resource
+    def acquire(self, resource):
+        """
+        Sleeps until the earliest reset if all tokens are used up. The request is
+        counted right away, so concurrent callers get different tokens when the
+        budget runs low.
+        """
+        while True:
+            with self.lock:
+                now = time.time()
+                token = max(self.tokens, key=lambda token: self.limit(token, resource).left(now))
+                limit = self.limit(token, resource)
+                if limit.left(now) > MARGIN:
+                    if limit.remaining is not None and now < limit.reset:
+                        limit.remaining -= 1
+                    return token
+                wait = min(self.limit(token, resource).reset for token in self.tokens) - now + 1
+                self.sleeps += 1
+                self.slept += wait
+            logger.warning(f'Rate limit of {resource} used up for all {len(self.tokens)} tokens, sleeping {wait:.0f} s until the reset.')
+            time.sleep(wait)
+
+    def update(self, token, resource, remaining, reset):
+        with self.lock:
+            limit = self.limit(token, resource)
+            limit.remaining = int(remaining)
+            limit.reset = float(reset)
+
+    #Read the rate limit headers of a response, if it has any
+    def update_headers(self, token, resource, response):
+        headers = response.headers
+        remaining = headers.get('X-RateLimit-Remaining', headers.get('RateLimit-Remaining'))
+        reset = headers.get('X-RateLimit-Reset', headers.get('RateLimit-Reset'))
+        if remaining is not None and reset is not None:
+            self.update(token, resource, remaining, reset)
+
+    #Mark a token as used up after a rate limit error response
+    def exhausted(self, token, resource, response):
+        retry_after = response.headers.get('Retry-After')
+        with self.lock:
+            limit = self.limit(token, resource)
+            now = time.time()
+            limit.remaining = 0
+            if retry_after is not None:
+                limit.reset = max(limit.reset, now + float(retry_after))
+            elif limit.reset <= now:
+                limit.reset = now + DEFAULT_WAIT
+
+    #Check whether a response is a (primary or secondary) rate limit error
+    @staticmethod
+    def rate_limited(response):
+        if response.status_code == 429:
+            return True
+        return response.status_code == 403 and (response.headers.get('X-RateLimit-Remaining') == '0' or 'Retry-After' in response.headers)
+
+    def send(self, token, method, url, headers=None, **kwargs):
+        headers = dict(headers or {})
+        if token:
+            headers['Authorization'] = f'{self.scheme} {token}'
+        return self.session.request(method, url, headers=headers, **kwargs)
+
+    #Send a request, retrying it with another token (or after the reset) when rate limited
+    def request(self, method, url, resource='core', **kwargs):
+        """
+        :argument method HTTP method, e.g. 'GET'
+        :argument url URL of the API resource
+        :argument resource rate limit the request counts against, e.g. 'core' or 'graphql'
+        other keyword arguments are passed on to requests.Session.request, e.g. params and headers
+        returns the requests.Response
+        """
+        while True:
+            token = self.acquire(resource)
+            response = self.send(token, method, url, **kwargs)
+            self.update_headers(token, resource, response)
+            if not self.rate_limited(response):
+                return response
+            logger.warning(f'Rate limited on {url} ({response.status_code}), retrying.')
+            self.exhausted(token, resource, response)
+
+    #Run a GraphQL query, retrying it when rate limited
+    def graphql(self, url, query, variables=None):
+        """
+        The `rateLimit { remaining resetAt }` of the response, if the query asks for
+        it, updates the budget of the token, which is more accurate than the headers
+        since GraphQL queries cost different numbers of points.
+        returns the decoded JSON response
+        """
+        while True:
+            token = self.acquire('graphql')
+            response = self.send(token, 'POST', url, json={'query': query, 'variables': variables or {}})
+            self.update_headers(token, 'graphql', response)
+            if self.rate_limited(response):
+                logger.warning(f'GraphQL rate limited ({response.status_code}), retrying.')
+                self.exhausted(token, 'graphql', response)
+                continue
+
+            j = response.json()
+            rate_limit = (j.get('data') or {}).get('rateLimit')
+            if rate_limit:
+                reset = datetime.datetime.fromisoformat(rate_limit['resetAt'].replace('Z', '+00:00')).timestamp()
+                self.update(token, 'graphql', rate_limit['remaining'], reset)
+            # e.g. {'errors': [{'type': 'RATE_LIMITED', 'message': 'API rate limit exceeded for user ID 3604514.'}]}
+            if any(error.get('type') == 'RATE_LIMITED' for error in j.get('errors') or []):
+                logger.warning('GraphQL API rate limit exceeded, retrying.')
+                self.exhausted(token, 'graphql', response)
+                continue
+            return j
@@ -0,0 +1,181 @@
+'''
+    Instrumentation of the ingestion runs of db_interface: time and rows per stage,
+    database round trips and slow queries, summarized in a JSON file at the end of
+    each run so nightly updates can be compared.
+
+    Timers are only taken around whole stages, batches and queries, never per row,
+    so the instrumentation stays on in production.
+'''
+
+from contextlib import contextmanager
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+
+# Setup Logger
+logger = logging.getLogger('db_interface')
+
+# queries taking longer than this many seconds are logged (see --slow_query)
+SLOW_QUERY = 1.0
+
+
+class Telemetry:
+    '''
+        Accumulates the seconds, calls and rows of named stages (e.g. 'commit insert') and
+        the database round trips of the connections returned by connect. Stages may be
+        timed from several threads, e.g. the writer thread of a ThreadedSink.
+    '''
+
+    def __init__(self, slow_query=SLOW_QUERY):
+        self.slow_query = slow_query
+        self.lock = threading.Lock()
+        self.started = datetime.datetime.now(datetime.timezone.utc)
+        self.clock = time.perf_counter()
+        # name -> {'seconds', 'calls', 'rows'}, in the order the stages first ran
+        self.stages = {}
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.commits = 0
+        self.commit_seconds = 0.0
+        self.slow_queries = 0
+
+    def add(self, name, seconds, rows=0, calls=1):
+        with self.lock:
+            stage = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'rows': 0})
+            stage['seconds'] += seconds
+            stage['calls'] += calls
+            stage['rows'] += rows
+
+    def count(self, name, rows):
+        '''
+            Adds rows to a stage without timing it, e.g. once the rows of a timed block are known.
+        '''
+        self.add(name, 0.0, rows, calls=0)
+
+    @contextmanager
+    def stage(self, name, rows=0):
+        '''
+            Times a block as one call of a stage:
+
+                with telemetry.stage('pr write', rows=len(prs)):
+                    ...
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, rows)
+
+    def query(self, query, seconds):
+        with self.lock:
+            self.queries += 1
+            self.query_seconds += seconds
+            slow = seconds >= self.slow_query
+            if slow:
+                self.slow_queries += 1
+        if slow:
+            logger.warning(f'Slow query ({seconds:.2f} s): {" ".join(query.split())[:500]}')
+
+    def connect(self, db):
+        '''
+            Returns the connection db, counting and timing its queries and commits.
+        '''
+        return InstrumentedConnection(db, self)
+
+    def summary(self, **info):
+        '''
+            Returns the totals as a dict ready for JSON, with rows/sec for each stage.
+            info: other items to include, e.g. the project and mode of the run
+        '''
+        elapsed = time.perf_counter() - self.clock
+        with self.lock:
+            stages = {}
+            for name, stage in self.stages.items():
+                rate = round(stage['rows'] / stage['seconds'], 1) if stage['rows'] and stage['seconds'] else None
+                stages[name] = dict(stage, seconds=round(stage['seconds'], 3), rows_per_sec=rate)
+            database = {'queries': self.queries, 'query_seconds': round(self.query_seconds, 3),
+                        'commits': self.commits, 'commit_seconds': round(self.commit_seconds, 3),
+                        'slow_queries': self.slow_queries, 'slow_query_threshold': self.slow_query}
+        return dict(info, started=self.started.isoformat(), seconds=round(elapsed, 3), stages=stages, database=database)
+
+    def write(self, path, **info):
+        '''
+            Writes the summary to a new JSON file, creating its directory. If the file exists,
+            e.g. from another run started in the same second, a -1, -2, ... suffix is added
+            to the name. Returns the path written and the summary.
+        '''
+        summary = self.summary(**info)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        base, ext = os.path.splitext(path)
+        suffix = 0
+        while True:
+            try:
+                # 'x' fails instead of overwriting the summary of another run
+                with open(path, 'x') as f:
+                    json.dump(summary, f, indent=2)
+                return path, summary
+            except FileExistsError:
+                suffix += 1
+                path = f'{base}-{suffix}{ext}'
+
+
+class InstrumentedCursor:
+    '''
+        Cursor that reports the duration of every execute and executemany (one round trip
+        each, MySQLdb sends the rows of an executemany insert as one statement).
+    '''
+
+    def __init__(self, cursor, telemetry):
+        self.cursor = cursor
+        self.telemetry = telemetry
+
+    def execute(self, query, args=None):
+        start = time.perf_counter()
+        try:
+            return self.cursor.execute(query, args) if args is not None else self.cursor.execute(query)
+        finally:
+            self.telemetry.query(query, time.perf_counter() - start)
+
+    def executemany(self, query, args):
+        start = time.perf_counter()
+        try:
+            return self.cursor.executemany(query, args)
+        finally:
+            self.telemetry.query(query, time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cursor.close()
+
+
+class InstrumentedConnection:
+    '''
+        Connection whose cursors are InstrumentedCursors, otherwise the wrapped connection.
+    '''
+
+    def __init__(self, db, telemetry):
+        self.db = db
+        self.telemetry = telemetry
+
+    def cursor(self):
+        return InstrumentedCursor(self.db.cursor(), self.telemetry)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            self.db.commit()
+        finally:
+            with self.telemetry.lock:
+                self.telemetry.commits += 1
+                self.telemetry.commit_seconds += time.perf_counter() - start
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
@@ -0,0 +1,37 @@
+import datetime
+from gitutils.backends import SQLiteCursor, connect_sqlite
+
+def test_translate():
+    assert SQLiteCursor.translate('select id from commit where hash=%s') == 'select id from "commit" where hash=?'
+    assert SQLiteCursor.translate('update diff set file_id=%s where commit_id=(select id from commit where hash=%s)') == \
+        'update diff set file_id=? where commit_id=(select id from "commit" where hash=?)'
+    assert SQLiteCursor.translate('select diff.commit_id from diff join commit on diff.commit_id=commit.id') == \
+        'select diff.commit_id from diff join "commit" on diff.commit_id="commit".id'
+    assert SQLiteCursor.translate('insert into label (name) values (%s) on duplicate key update name=name') == \
+        'insert into label (name) values (?) on conflict do update set name=name'
+
+def test_sqlite(tmp_path):
+    db = connect_sqlite(str(tmp_path / 'ideas.sqlite3'), bulk=True)
+    cursor = db.cursor()
+    cursor.execute('pragma journal_mode')
+    assert cursor.fetchone()[0] == 'wal'
+
+    cursor.execute('create table "commit" (id integer primary key, hash varchar(128) not null, datetime datetime not null)')
+    cursor.execute('insert into commit (hash, datetime) values (%s, utc_timestamp())', ('abc',))
+    cursor.execute('select hash, datetime from commit')
+    sha, date = cursor.fetchone()
+    assert sha == 'abc' and isinstance(date, datetime.datetime)
+
+    # upserts, including the update expressions of DatabaseInterface.store_issues
+    cursor.execute('create table issue (id integer primary key, url varchar(256) not null unique, title text, closed_at datetime)')
+    query = 'insert into issue (url, title, closed_at) values (%s, %s, %s) ' \
+            "on duplicate key update title=values(title), closed_at=if(values(closed_at)='9999-01-01 00:00:00', closed_at, values(closed_at))"
+    cursor.executemany(query, [('u1', 'First', '2021-01-01 00:00:00'), ('u2', 'Second', '9999-01-01 00:00:00')])
+    cursor.executemany(query, [('u1', 'First, reopened', '9999-01-01 00:00:00'), ('u2', 'Second, closed', '2022-01-01 00:00:00')])
+    db.commit()
+    cursor.execute('select url, title, closed_at from issue order by id')
+    assert cursor.fetchall() == [('u1', 'First, reopened', datetime.datetime(2021, 1, 1)),
+                                 ('u2', 'Second, closed', datetime.datetime(2022, 1, 1))]
+    cursor.close()
+    db.close()
+    assert not db.open
@@ -0,0 +1,144 @@
+from gitutils.tests.testutils import *
+from gitutils.utils import *
+from gitutils.gitcommand import GitCommand
+
+SINCE = '2000-01-01'
+UNTIL = '2099-01-01'
+
+def test_iterRepoCommitData(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    makeTestRepo(str(tmp_path / 'repo'))
+    gitcmd = GitCommand(str(tmp_path))
+    streamed = list(gitcmd.iterRepoCommitData('repo', since=SINCE, until=UNTIL))
+    assert [commit.message.split()[0:2] for commit in streamed] == \
+        [['Remove', 'README'], ['Add', 'feature'], ['Add', 'bye'], ['Add', 'hello']]
+    assert streamed[2].author == b'Bob <bob@example.com>'
+    assert [diff.filename for diff in streamed[2].diffs] == \
+        ['a/README.md b/README.md', 'a/hello.py b/hello.py']
+
+def test_getRepoCommitData(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    makeTestRepo(str(tmp_path / 'repo'))
+    gitcmd = GitCommand(str(tmp_path))
+    data = gitcmd.getRepoCommitData('repo', since=SINCE, until=UNTIL)
+    assert sorted(data.keys()) == [b'Alice <alice@example.com>', b'Bob <bob@example.com>']
+    assert data[b'Alice <alice@example.com>']['total_commits'] == 2
+    assert len(data[b'Bob <bob@example.com>']['commits']) == 2
+
+def test_branchIndex(tmp_path, monkeypatch):
+    from gitutils.command import Command
+    from gitutils.gitcommand import BranchIndex
+    repo = makeTestRepo(str(tmp_path / 'repo'))
+    monkeypatch.chdir(repo)
+    index = BranchIndex()
+    retcode, out, err = Command('git rev-list --all').run()
+    for sha in out.decode('utf-8').split():
+        retcode, expected, err = Command('git branch -a --contains %s' % sha).run()
+        assert index.branches(sha) == expected
+
+def test_watermarks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    repo = makeTestRepo(str(tmp_path / 'repo'))
+    gitcmd = GitCommand(str(tmp_path))
+    assert len(list(gitcmd.iterRepoCommitData('repo', since=SINCE, until=UNTIL))) == 4
+    watermarks = gitcmd.tips
+    assert sorted(watermarks.keys()) == ['HEAD', 'refs/heads/feature', 'refs/heads/main']
+
+    # nothing new since the last run
+    assert list(gitcmd.iterRepoCommitData('repo', watermarks=watermarks)) == []
+    assert gitcmd.tips == watermarks
+
+    # only the new commits, even if their dates are older than the last run
+    commitFile(repo, 'feature.c', 'int main() {\n  return 1;\n}\n', 'Old change', date='2020-01-01T00:00:00')
+    streamed = list(gitcmd.iterRepoCommitData('repo', watermarks=watermarks))
+    assert [commit.message.strip() for commit in streamed] == ['Old change']
+    assert gitcmd.tips['refs/heads/main'] != watermarks['refs/heads/main']
+
+def test_shardedCommitData(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    repo = makeTestRepo(str(tmp_path / 'repo'))
+    runGit(repo, 'merge -q --no-edit feature')
+    runGit(repo, 'commit -q --allow-empty -m "Empty"')
+    gitcmd = GitCommand(str(tmp_path))
+    serial = list(gitcmd.iterRepoCommitData('repo', includebranches=True, since=SINCE, until=UNTIL))
+    sharded = list(gitcmd.iterRepoCommitData('repo', includebranches=True, since=SINCE, until=UNTIL, shards=3, chunksize=1))
+    assert len(serial) == 5
+    assert [commit.asdict() for commit in sharded] == [commit.asdict() for commit in serial]
+
+def test_numstatCommitData(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    repo = makeTestRepo(str(tmp_path / 'repo'))
+    runGit(repo, 'mv hello.py greeting.py')
+    runGit(repo, 'commit -q -m "Rename hello"')
+    gitcmd = GitCommand(str(tmp_path))
+    patches = list(gitcmd.iterRepoCommitData('repo', since=SINCE, until=UNTIL))
+    counts = list(gitcmd.iterRepoCommitData('repo', since=SINCE, until=UNTIL, numstat=True))
+    assert [commit.id for commit in counts] == [commit.id for commit in patches]
+    for patch, count in zip(patches, counts):
+        assert [(diff.path, diff.added, diff.removed) for diff in count.diffs] == \
+            [(diff.path, diff.added, diff.removed) for diff in patch.diffs]
+        assert all(diff.hunks == [] for diff in count.diffs)
+    renamed = [commit for commit in counts if commit.message.strip() == 'Rename hello'][0]
+    assert renamed.diffs[0].filename == 'a/hello.py b/greeting.py'
+    renamed = [commit for commit in patches if commit.id == renamed.id][0]
+    assert (renamed.diffs[0].path, renamed.diffs[0].newpath) == ('hello.py', 'greeting.py')
+
+def test_resumeCommitData(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    repo = makeTestRepo(str(tmp_path / 'repo'))
+    gitcmd = GitCommand(str(tmp_path))
+    ids = [commit.id for commit in gitcmd.iterRepoCommitData('repo', since=SINCE, until=UNTIL)]
+    tips = gitcmd.tips
+
+    # commits made after the interrupted run started are left for the next run
+    commitFile(repo, 'new.txt', 'new\n', 'Add new', date='2024-01-01T00:00:00')
+    resumed = list(gitcmd.iterRepoCommitData('repo', since=SINCE, until=UNTIL, tips=tips, skip=set(ids[:2])))
+    assert [commit.id for commit in resumed] == ids[2:]
+    assert gitcmd.tips == tips
+    sharded = list(gitcmd.iterRepoCommitData('repo', since=SINCE, until=UNTIL, tips=tips, skip=set(ids[:2]), shards=2, chunksize=1))
+    assert [commit.id for commit in sharded] == ids[2:]
+    assert list(gitcmd.iterRepoCommitData('repo', tips=tips, skip=set(ids))) == []
+
+    # resuming an incremental run
+    watermarks = dict(tips)
+    ids = [commit.id for commit in gitcmd.iterRepoCommitData('repo', watermarks=watermarks)]
+    assert len(ids) == 1
+    assert list(gitcmd.iterRepoCommitData('repo', watermarks=watermarks, tips=gitcmd.tips, skip=set(ids))) == []
+
+def test_resumeTiedDates(tmp_path, monkeypatch):
+    # commits with the same date on several branches come in a different order when
+    # resuming from the sorted tips, none is skipped or mined twice
+    monkeypatch.chdir(tmp_path)
+    repo = str(tmp_path / 'repo')
+    os.makedirs(repo)
+    runGit(repo, 'init -q -b main')
+    commitFile(repo, 'base.txt', 'base\n', 'Base')
+    for branch in ['zeta', 'alpha', 'mid']:
+        runGit(repo, 'checkout -q -b %s main' % branch)
+        for i in range(3):
+            commitFile(repo, '%s.txt' % branch, '%d\n' % i, '%s %d' % (branch, i))
+    runGit(repo, 'checkout -q main')
+    gitcmd = GitCommand(str(tmp_path))
+    ids = [commit.id for commit in gitcmd.iterRepoCommitData('repo')]
+    tips = gitcmd.tips
+    assert len(ids) == 10
+
+    for stored in range(1, len(ids)):
+        # the checkpoint sha of the interrupted run may not even be reachable any more
+        skip = set(ids[:stored]) | {'0' * 40}
+        resumed = [commit.id for commit in gitcmd.iterRepoCommitData('repo', tips=tips, skip=skip)]
+        assert sorted(resumed) == sorted(ids[stored:])
+
+def test_streamError(tmp_path, monkeypatch):
+    # a failing git log raises instead of looking like a shorter history
+    import pytest
+    from gitutils.command import Command, CommandError
+    monkeypatch.chdir(tmp_path)
+    repo = makeTestRepo(str(tmp_path / 'repo'))
+    assert len(list(Command('git log --oneline').stream(cwd=repo))) == 3
+    with pytest.raises(CommandError) as error:
+        list(Command('git log --oneline nosuchbranch').stream(cwd=repo))
+    assert error.value.returncode != 0 and b'nosuchbranch' in error.value.stderr
+    monkeypatch.chdir(repo)
+    with pytest.raises(CommandError):
+        GitCommand(str(tmp_path)).getCommitList('nosuchbranch')
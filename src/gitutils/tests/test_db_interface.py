@@ -0,0 +1,162 @@
+import datetime
+import importlib
+import sys
+
+import pytest
+
+from gitutils.tests.testutils import *
+from gitutils.backends import connect_sqlite
+
+pytest.importorskip('requests')
+
+# the tables written by add_prs and add_issues, with the unique keys of the MeerCat models
+SCHEMA = [
+    'create table project (id integer primary key, name text, source_url text, last_updated datetime)',
+    'create table project_sync (id integer primary key, project_id int, resource varchar(16), updated_at datetime, unique (project_id, resource))',
+    'create table author (id integer primary key, username text, email text, name text, url text)',
+    'create table label (id integer primary key, name text)',
+    'create table issue_tag (id integer primary key, url text)',
+    'create table commit_tag (id integer primary key, sha text)',
+    'create table pr (id integer primary key, title text, description text, updated_at datetime, merged_at datetime, locked bool, number int, state text, url varchar(256) unique, author_id int, project_id int, head_sha text, created_at datetime)',
+    'create table issue (id integer primary key, title text, description text, updated_at datetime, closed_at datetime, locked bool, number int, state text, url varchar(256) unique, author_id int, project_id int, created_at datetime)',
+    'create table milestone (id integer primary key, state text, description text, title text, due_on datetime, created_at datetime, updated_at datetime, issue_id int unique, pr_id int unique)',
+    'create table pr_has_issue (id integer primary key, pr_id int, issue_id int, unique (pr_id, issue_id))',
+    'create table pr_has_label (id integer primary key, pr_id int, label_id int, unique (pr_id, label_id))',
+    'create table pr_has_assignee (id integer primary key, pr_id int, assignee_id int, unique (pr_id, assignee_id))',
+    'create table pr_has_commit (id integer primary key, pr_id int, commit_id int, unique (pr_id, commit_id))',
+    'create table issue_has_label (id integer primary key, issue_id int, label_id int, unique (issue_id, label_id))',
+    'create table issue_has_assignee (id integer primary key, issue_id int, assignee_id int, unique (issue_id, assignee_id))',
+    'create table comment (id integer primary key, pr_id int, issue_id int, author_id int, created_at datetime, updated_at datetime, body text, unique (pr_id, author_id, created_at), unique (issue_id, author_id, created_at))',
+    "insert into project (name, source_url, last_updated) values ('test', 'https://github.com/HPCL/test.git', '2021-03-01 10:00:00')",
+]
+
+URL = 'https://github.com/HPCL/test.git'
+UTC = datetime.timezone.utc
+
+@pytest.fixture
+def interface(tmp_path, monkeypatch):
+    """
+    A DatabaseInterface for --add_prs on a SQLite database with the tables of the PRs and issues.
+    """
+    # the modules read the tokens from credentials.ini in the working directory
+    (tmp_path / 'credentials.ini').write_text('[github]\nlogin = login\ntoken = token\n\n[gitlab]\ntoken = token\n')
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / 'ideas.sqlite3')
+    monkeypatch.setattr(sys, 'argv', ['db_interface', '--sqlite', path, '--add_prs', URL, '--incremental'])
+    db_interface = importlib.import_module('gitutils.db_interface')
+    interface = db_interface.DatabaseInterface()
+    interface.db = connect_sqlite(path)
+    cursor = interface.db.cursor()
+    for query in SCHEMA:
+        cursor.execute(query)
+    interface.db.commit()
+    return interface
+
+def makeAuthor(username):
+    return {'username': username, 'url': 'https://github.com/' + username, 'email': None, 'name': username.title()}
+
+def makeComment(username, created, body):
+    return {'author': makeAuthor(username), 'createdAt': created, 'updatedAt': created, 'body': body}
+
+def makeItem(number, updated, title, comments):
+    milestone = {'state': 'OPEN', 'description': None, 'title': 'v1', 'dueOn': None,
+                 'createdAt': '2021-01-01T00:00:00Z', 'updatedAt': '2021-01-01T00:00:00Z'}
+    return {'number': number, 'url': f'https://github.com/HPCL/test/pull/{number}', 'title': title, 'description': '',
+            'state': 'OPEN', 'locked': False, 'createdAt': '2021-02-01T00:00:00Z', 'updatedAt': updated,
+            'mergedAt': None, 'closedAt': None, 'head_sha': 'f00', 'author': makeAuthor('alice'), 'milestone': milestone,
+            'assignees': [makeAuthor('bob')], 'labels': [{'name': 'bug'}], 'comments': comments,
+            'linked_issues': [{'url': 'https://github.com/HPCL/test/issues/1'}], 'commits': [{'sha': 'abc'}]}
+
+def store(interface, kind, items):
+    cursor = interface.db.cursor()
+    interface.add_dimensions(cursor, items)
+    if kind == 'pr':
+        interface.store_prs(cursor, 1, items)
+    else:
+        interface.store_issues(cursor, 1, items)
+    interface.db.commit()
+
+def rows(interface, query):
+    cursor = interface.db.cursor()
+    cursor.execute(query)
+    return cursor.fetchall()
+
+def counts(interface, tables):
+    return {table: rows(interface, f'select count(*) from {table}')[0][0] for table in tables}
+
+PR_TABLES = ['author', 'label', 'issue_tag', 'commit_tag', 'pr', 'milestone', 'pr_has_issue', 'pr_has_label', 'pr_has_assignee', 'pr_has_commit', 'comment']
+ISSUE_TABLES = ['author', 'label', 'issue', 'milestone', 'issue_has_label', 'issue_has_assignee', 'comment']
+
+def test_storePrsRerun(interface):
+    comments = [makeComment('alice', '2021-03-01T10:00:00Z', 'First'), makeComment('bob', '2021-03-02T10:00:00Z', 'Second')]
+    prs = [makeItem(1, '2021-03-02T10:00:00Z', 'Fix', comments), makeItem(2, '2021-03-01T10:00:00Z', 'Feature', [])]
+    store(interface, 'pr', prs)
+    stored = counts(interface, PR_TABLES)
+    assert stored == {'author': 2, 'label': 1, 'issue_tag': 1, 'commit_tag': 1, 'pr': 2, 'milestone': 2, 'pr_has_issue': 2,
+                      'pr_has_label': 2, 'pr_has_assignee': 2, 'pr_has_commit': 2, 'comment': 2}
+    ids = rows(interface, 'select id, url from pr order by id')
+    comment_ids = rows(interface, 'select id, created_at from comment order by id')
+
+    # the same PRs again, the first one retitled with an edited comment
+    comments = [makeComment('alice', '2021-03-01T10:00:00Z', 'First, edited'), makeComment('bob', '2021-03-02T10:00:00Z', 'Second')]
+    prs = [makeItem(1, '2021-03-03T10:00:00Z', 'Fix crash', comments), makeItem(2, '2021-03-01T10:00:00Z', 'Feature', [])]
+    store(interface, 'pr', prs)
+    assert counts(interface, PR_TABLES) == stored
+    assert rows(interface, 'select id, url from pr order by id') == ids
+    assert rows(interface, 'select id, created_at from comment order by id') == comment_ids
+    assert rows(interface, 'select title from pr order by id') == [('Fix crash',), ('Feature',)]
+    assert rows(interface, 'select body from comment order by id') == [('First, edited',), ('Second',)]
+
+def test_storeIssuesRerun(interface):
+    issues = [makeItem(1, '2021-03-02T10:00:00Z', 'Crash', [makeComment('bob', '2021-03-01T10:00:00Z', 'Seen it')])]
+    issues[0]['closedAt'] = '2021-03-02T10:00:00Z'
+    store(interface, 'issue', issues)
+    stored = counts(interface, ISSUE_TABLES)
+    assert stored == {'author': 2, 'label': 1, 'issue': 1, 'milestone': 1, 'issue_has_label': 1, 'issue_has_assignee': 1, 'comment': 1}
+    ids = rows(interface, 'select id from issue')
+
+    # reopened: the issue keeps the date it was last closed
+    issues = [makeItem(1, '2021-03-04T10:00:00Z', 'Crash on exit', [makeComment('bob', '2021-03-01T10:00:00Z', 'Seen it too')])]
+    store(interface, 'issue', issues)
+    assert counts(interface, ISSUE_TABLES) == stored
+    assert rows(interface, 'select id from issue') == ids
+    assert [(title, str(closed_at)) for title, closed_at in rows(interface, 'select title, closed_at from issue')] == [('Crash on exit', '2021-03-02 10:00:00')]
+    assert rows(interface, 'select body from comment') == [('Seen it too',)]
+
+def test_syncTime(interface, monkeypatch):
+    db_interface = sys.modules['gitutils.db_interface']
+    cursor = interface.db.cursor()
+    # first run: ten days before the last update of the project
+    assert interface.get_sync_time(cursor, URL, 1, 'issues', 'null') == datetime.datetime(2021, 2, 19, 10, tzinfo=UTC)
+
+    issues = [makeItem(3, '2021-03-05T10:00:00Z', 'No author', []), makeItem(2, '2021-03-04T10:00:00Z', 'Newest', []),
+              makeItem(1, '2021-03-02T10:00:00Z', 'Oldest', [])]
+    issues[0]['author']['username'] = None
+    fetched = []
+    def fetch_issues(owner, repo, source, since=None):
+        fetched.append(since)
+        return [dict(issue, author=dict(issue['author'])) for issue in issues]
+    monkeypatch.setattr(db_interface, 'fetch_issues', fetch_issues)
+
+    interface.add_issues(URL, 'null', None)
+    assert rows(interface, 'select title from issue order by number') == [('Oldest',), ('Newest',)]
+    # the issue without author is not stored, so the sync stops at the newest stored one
+    assert [str(updated_at) for updated_at, in rows(interface, "select updated_at from project_sync where project_id=1 and resource='issues'")] == ['2021-03-04 10:00:00']
+
+    interface.add_issues(URL, 'null', None)
+    assert fetched == [datetime.datetime(2021, 2, 19, 10, tzinfo=UTC), datetime.datetime(2021, 3, 4, 10, tzinfo=UTC)]
+
+    # an older page does not move the sync back; the next run starts at the newest stored update, which recent_nodes keeps
+    interface.set_sync(cursor, 1, 'issues', issues[2:])
+    assert interface.get_sync_time(cursor, URL, 1, 'issues', 'null') == datetime.datetime(2021, 3, 4, 10, tzinfo=UTC)
+    assert interface.get_sync_time(cursor, URL, 1, 'prs', 'null') == datetime.datetime(2021, 2, 19, 10, tzinfo=UTC)
+
+def test_writeTelemetry(interface, tmp_path):
+    interface.args.telemetry_dir = str(tmp_path / 'telemetry')
+    interface.write_telemetry()
+    interface.write_telemetry()
+    # the runs started in the same second
+    assert len(list((tmp_path / 'telemetry').iterdir())) == 2
+    interface.args.no_telemetry = True
+    interface.write_telemetry()
+    assert len(list((tmp_path / 'telemetry').iterdir())) == 2
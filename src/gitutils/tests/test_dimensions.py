@@ -0,0 +1,61 @@
+from gitutils.tests.testutils import *
+from gitutils.dimensions import DimensionCache
+from gitutils.telemetry import Telemetry
+
+SCHEMA = '''
+create table author (id integer primary key, username text, email text, name text, url text);
+insert into author (username, email, url) values ('alice', 'alice@example.com', 'https://github.com/alice');
+insert into author (username, email, url) values (NULL, NULL, 'https://github.com/ghost');
+'''
+
+def test_dimensionCache(tmp_path):
+    # the telemetry counts the queries
+    telemetry = Telemetry()
+    db = telemetry.connect(makeSQLiteDB(tmp_path / 'ideas.sqlite3', SCHEMA))
+    cursor = db.cursor()
+    authors = DimensionCache('author', ('username', 'url'))
+
+    # existing rows are found case insensitively and with NULL keys
+    authors.request(cursor, ('Alice', 'https://github.com/alice'))
+    authors.request(cursor, (None, 'https://github.com/ghost'))
+    assert authors.flush(cursor) == 0
+    assert authors[('alice', 'https://github.com/alice')] == 1
+    assert authors[(None, 'https://github.com/ghost')] == 2
+
+    # missing rows are inserted once, with the columns they were requested with
+    for i in range(3):
+        authors.request(cursor, ('bob', 'https://github.com/bob'), email='bob@example.com', name='Bob')
+        authors.request(cursor, ('carol', 'https://github.com/carol'))
+    queries = telemetry.queries
+    assert authors.flush(cursor) == 2
+    assert telemetry.queries - queries == 4
+    assert authors.get(cursor, ('bob', 'https://github.com/bob')) == 3
+    assert authors[('carol', 'https://github.com/carol')] == 4
+    cursor.execute('select name, email from author where id=3')
+    assert cursor.fetchone() == ('Bob', 'bob@example.com')
+
+    # the table is only loaded once
+    queries = telemetry.queries
+    assert authors.get(cursor, ('dave', None)) == 5
+    assert authors.get(cursor, ('dave', None)) == 5
+    assert telemetry.queries - queries == 3
+
+def test_dimensionCacheShared(tmp_path):
+    db = makeSQLiteDB(tmp_path / 'ideas.sqlite3', SCHEMA)
+    cursor = db.cursor()
+    first, second = DimensionCache('author', ('username', 'url')), DimensionCache('author', ('username', 'url'))
+    first.request(cursor, ('alice', 'https://github.com/alice'))
+    second.request(cursor, ('alice', 'https://github.com/alice'))
+
+    # both caches loaded the table before either inserted erin or the ghost
+    assert second.get(cursor, ('erin', 'https://github.com/erin')) == 3
+    assert second.get(cursor, (None, 'https://github.com/other-ghost')) == 4
+    first.request(cursor, ('erin', 'https://github.com/erin'), name='Erin')
+    first.request(cursor, (None, 'https://github.com/other-ghost'))
+    first.request(cursor, ('frank', None))
+    assert first.flush(cursor) == 1
+    assert first[('erin', 'https://github.com/erin')] == 3
+    assert first[(None, 'https://github.com/other-ghost')] == 4
+    assert first[('frank', None)] == 5
+    cursor.execute('select count(*) from author')
+    assert cursor.fetchone()[0] == 5
@@ -0,0 +1,62 @@
+from gitutils.tests.testutils import *
+from gitutils.events import EventWriter
+from gitutils.telemetry import Telemetry
+
+SCHEMA = '''
+create table event_actor (id integer primary key, actor_id int, login text, gravatar_id text, avatar_url text, url text);
+create table event_repo (id integer primary key, repo_id int, name text, url text);
+create table event_org (id integer primary key, org_id int, login text, gravatar_id text, avatar_url text, url text);
+create table event_payload (id integer primary key, action text, ref text, ref_type text, master_branch text, description text,
+    forkee_url text, issue_url text, comment_url text, member_login text, pr_number int, pr_url text, pr_review_url text,
+    push_id int, size int, distinct_size int, head_sha text, before_sha text, release_url text, effective_date text);
+create table event_page (id integer primary key, name text, title text, action text, sha text, url text);
+create table event_has_page (id integer primary key, payload_id int, page_id int);
+create table event (id integer primary key, api_id int, type text, public bool, created_at text, payload_id int, repo_id int, actor_id int, org_id int, project_id int);
+insert into event_actor (actor_id, login, gravatar_id, avatar_url, url) values (1, 'alice', '', 'https://a/1', 'https://api.github.com/users/alice');
+'''
+
+def makeEvent(api_id, login, payload, type='PushEvent'):
+    return {
+        'id': str(api_id), 'type': type, 'public': True, 'created_at': '2021-03-01T10:00:00Z', 'payload': payload,
+        'actor': {'id': 1 if login == 'alice' else 2, 'login': login, 'url': 'https://api.github.com/users/' + login, 'avatar_url': 'https://a/', 'gravatar_id': ''},
+        'repo': {'id': 10, 'name': 'HPCL/test', 'url': 'https://api.github.com/repos/HPCL/test'},
+        'org': {'id': 20, 'login': 'HPCL', 'url': 'https://api.github.com/orgs/HPCL', 'avatar_url': 'https://a/', 'gravatar_id': ''},
+    }
+
+def test_eventWriter(tmp_path):
+    # the telemetry counts the queries
+    telemetry = Telemetry()
+    db = telemetry.connect(makeSQLiteDB(tmp_path / 'ideas.sqlite3', SCHEMA))
+    cursor = db.cursor()
+    page = {'name': 'Home', 'title': 'Home', 'action': 'edited', 'sha': 'abc', 'html_url': 'https://github.com/HPCL/test/wiki/Home'}
+    events = [makeEvent(1, 'alice', {'push_id': 5, 'size': 2, 'head': 'f00'}),
+              makeEvent(2, 'bob', {'pages': [page]}, type='GollumEvent'),
+              makeEvent(3, 'bob', {'action': 'opened', 'pull_request': {'html_url': 'https://github.com/HPCL/test/pull/1'}, 'number': 1}, type='PullRequestEvent'),
+              makeEvent(2, 'bob', {'pages': [page]}, type='GollumEvent')]
+
+    writer = EventWriter(db, 7, 'test')
+    assert writer.store(cursor, events) == 3
+    # one query per payload, the other tables are written with one query each
+    assert telemetry.queries <= 22
+
+    cursor.execute('select api_id, type, created_at, actor_id, repo_id, org_id, project_id from event order by api_id')
+    assert cursor.fetchall() == [(1, 'PushEvent', '2021-03-01 10:00:00', 1, 1, 1, 7),
+                                 (2, 'GollumEvent', '2021-03-01 10:00:00', 2, 1, 1, 7),
+                                 (3, 'PullRequestEvent', '2021-03-01 10:00:00', 2, 1, 1, 7)]
+    cursor.execute('select push_id, size, head_sha, pr_number, pr_url, action from event_payload order by id')
+    assert cursor.fetchall() == [(5, 2, 'f00', None, None, None), (None, None, None, None, None, None),
+                                 (None, None, None, 1, 'https://github.com/HPCL/test/pull/1', 'opened')]
+    # each event points to its own payload
+    cursor.execute('select e.api_id, p.push_id, p.pr_number from event e join event_payload p on (e.payload_id = p.id) order by e.api_id')
+    assert cursor.fetchall() == [(1, 5, None), (2, None, None), (3, None, 1)]
+    cursor.execute('select payload_id, page_id from event_has_page')
+    assert cursor.fetchall() == [(2, 1)]
+    cursor.execute('select count(*) from event_actor')
+    assert cursor.fetchone()[0] == 2
+
+    # a refresh stores only the new events, reusing the actors, repos, orgs and pages
+    events.append(makeEvent(4, 'alice', {'pages': [page]}, type='GollumEvent'))
+    assert writer.store(cursor, events) == 1
+    for table, count in [('event', 4), ('event_payload', 4), ('event_actor', 2), ('event_repo', 1), ('event_org', 1), ('event_page', 1), ('event_has_page', 2)]:
+        cursor.execute('select count(*) from %s' % table)
+        assert cursor.fetchone()[0] == count
@@ -0,0 +1,43 @@
+import zlib
+
+import pytest
+
+from gitutils.backends import connect_sqlite
+from gitutils.export import ParquetExporter, diff_row
+
+SCHEMA = [
+    'create table "commit" (id integer primary key, hash text, datetime datetime, author_id int, branch text, message text, project_id int)',
+    'create table diff (id integer primary key, commit_id int, file_path text, language text, lines_added int, lines_removed int, body text, blob_id int)',
+    'create table diff_blob (id integer primary key, data blob)',
+    'create table author (id integer primary key, username text, email text, name text, url text)',
+    'create table project_has_author (id integer primary key, project_id int, author_id int)',
+    'create table pr (id integer primary key, number int, title text, description text, state text, locked bool, url text, head_sha text, author_id int, created_at datetime, updated_at datetime, merged_at datetime, project_id int)',
+    'create table issue (id integer primary key, number int, title text, description text, state text, locked bool, url text, author_id int, created_at datetime, updated_at datetime, closed_at datetime, project_id int)',
+    'create table comment (id integer primary key, issue_id int, pr_id int, author_id int, created_at datetime, updated_at datetime, body text)',
+]
+
+def test_diffRow():
+    # counts win over the body, which may be cut off
+    row = (1, 1, 'abc', None, 'a.py', 'Python', 3, 1, '+a', None)
+    assert diff_row(row)[-2:] == (4, '+a')
+    # compressed bodies are decompressed and counted without numstat counts
+    row = (1, 1, 'abc', None, 'a.py', 'Python', None, None, '', zlib.compress(b'\n+a\n+b\n-c'))
+    assert diff_row(row)[-2:] == (3, '\n+a\n+b\n-c')
+
+def test_parquetExporter(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    db = connect_sqlite(':memory:')
+    with db.cursor() as cursor:
+        for query in SCHEMA:
+            cursor.execute(query)
+        query = 'insert into commit (hash, datetime, author_id, branch, message, project_id) values (%s, %s, 1, %s, %s, %s)'
+        cursor.executemany(query, [('a', '2021-03-01 10:00:00', 'main', 'm', 1), ('b', '2021-04-01 10:00:00', 'main', 'm', 1), ('c', '2021-04-01 10:00:00', 'main', 'm', 2)])
+        query = 'insert into diff (commit_id, file_path, language, lines_added, lines_removed, body) values (%s, %s, %s, %s, %s, %s)'
+        cursor.executemany(query, [(1, 'a.py', 'Python', 1, 0, '+a'), (2, 'a.py', 'Python', 2, 1, '+b'), (3, 'b.py', 'Python', 1, 0, '+c')])
+
+    counts = ParquetExporter(db, str(tmp_path), batch_size=1).export(1, 'test')
+    assert counts['commits'] == 2 and counts['diffs'] == 2 and counts['prs'] == 0
+    assert sorted(path.name for path in (tmp_path / 'commits' / 'project=test').iterdir()) == ['month=2021-03', 'month=2021-04']
+
+    diffs = pq.read_table(str(tmp_path / 'diffs'), columns=['hash', 'locc']).to_pydict()
+    assert sorted(zip(diffs['hash'], diffs['locc'])) == [('a', 1), ('b', 3)]
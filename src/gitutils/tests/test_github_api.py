@@ -0,0 +1,117 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+from gitutils.github_api import GitHubAPIClient
+
+PAGES = 7
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Paginated GitHub events API: page n holds the events 10n..10n+9. The later
+    pages answer first, and the first request of page 3 fails with a server error.
+    Pages are tagged with an ETag and answered 304 when it is sent back, with
+    the current Link header.
+    """
+    requests = []
+    not_modified = []
+    pages = PAGES
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        page = int(parse_qs(url.query).get('page', ['1'])[0])
+        self.requests.append(page)
+        if page == 3 and self.requests.count(3) == 1:
+            self.send_response(502)
+            self.end_headers()
+            return
+
+        base = f'http://127.0.0.1:{self.server.server_port}{url.path}?per_page=10'
+        links = [f'<{base}&page={self.pages}>; rel="last"']
+        if page < self.pages:
+            links.append(f'<{base}&page={page + 1}>; rel="next"')
+        etag = f'"page-{page}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.not_modified.append(page)
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Link', ', '.join(links))
+            self.end_headers()
+            return
+
+        time.sleep((self.pages - page) * 0.02)
+        body = json.dumps([{'id': page * 10 + i} for i in range(10)]).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Link', ', '.join(links))
+        self.send_header('ETag', etag)
+        self.send_header('X-RateLimit-Remaining', '4000')
+        self.send_header('X-RateLimit-Reset', str(int(time.time()) + 3600))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    StubHandler.requests = []
+    StubHandler.not_modified = []
+    StubHandler.pages = PAGES
+    monkeypatch.setattr(GitHubAPIClient, 'api_url', f'http://127.0.0.1:{server.server_port}')
+    monkeypatch.setattr(GitHubAPIClient, 'backoff', 0)
+    GitHubAPIClient.set_credentials(username='alice', token='token')
+    yield server
+    server.shutdown()
+
+def test_fetchResource(stub):
+    # pages come back in order although the later ones answer first, page 3 is retried
+    events = GitHubAPIClient.fetch_events(owner='HPCL', repository='test')
+    assert [event['id'] for event in events] == [page * 10 + i for page in range(1, PAGES + 1) for i in range(10)]
+    assert sorted(StubHandler.requests) == [1, 2, 3, 3, 4, 5, 6, 7]
+
+    # the sequential mode follows the next links and gives the same result
+    StubHandler.requests = []
+    events = GitHubAPIClient.fetch_resource('HPCL', 'test', 'events', {'per_page': 10}, {}, workers=1)
+    assert [event['id'] for event in events] == [page * 10 + i for page in range(1, PAGES + 1) for i in range(10)]
+    assert StubHandler.requests == [1, 2, 3, 3, 4, 5, 6, 7]
+
+def test_fetchResourceCond(stub):
+    # traversal stops after the page cond is true for, pages fetched ahead are dropped
+    stop = lambda response: response.json()[0]['id'] == 40
+    events = GitHubAPIClient.fetch_resource('HPCL', 'test', 'events', {'per_page': 10}, {}, cond=stop, workers=2)
+    assert [event['id'] for event in events] == list(range(10, 50))
+
+def test_fetchResourceCache(stub, tmp_path, monkeypatch):
+    # the second traversal is revalidated page by page and read from the cache
+    monkeypatch.setattr(GitHubAPIClient, 'cache', None)
+    GitHubAPIClient.set_cache(str(tmp_path))
+    first = GitHubAPIClient.fetch_events(owner='HPCL', repository='test')
+    assert StubHandler.not_modified == []
+    second = GitHubAPIClient.fetch_events(owner='HPCL', repository='test')
+    assert second == first
+    assert sorted(StubHandler.not_modified) == list(range(1, PAGES + 1))
+    stats = GitHubAPIClient.cache.stats()
+    assert stats['hits'] == PAGES and stats['misses'] == PAGES + 1
+
+def test_fetchResourceCacheGrowing(stub, tmp_path, monkeypatch):
+    # page 1 is unchanged, but the pages added since it was cached are fetched
+    monkeypatch.setattr(GitHubAPIClient, 'cache', None)
+    GitHubAPIClient.set_cache(str(tmp_path))
+    GitHubAPIClient.fetch_events(owner='HPCL', repository='test')
+    StubHandler.pages = PAGES + 2
+    for workers in (8, 1):
+        StubHandler.not_modified = []
+        events = GitHubAPIClient.fetch_resource('HPCL', 'test', 'events', {'per_page': 100}, {}, workers=workers)
+        assert [event['id'] for event in events] == [page * 10 + i for page in range(1, PAGES + 3) for i in range(10)]
+        assert 1 in StubHandler.not_modified
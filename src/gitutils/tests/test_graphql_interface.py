@@ -0,0 +1,99 @@
+import datetime
+import importlib
+import re
+
+import pytest
+
+pytest.importorskip('requests')
+
+@pytest.fixture
+def graphql(tmp_path, monkeypatch):
+    # the module reads the tokens from credentials.ini in the working directory
+    (tmp_path / 'credentials.ini').write_text('[github]\ntoken = token\n\n[gitlab]\ntoken = token\n')
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module('gitutils.graphql_interface')
+
+class Scheduler:
+    """
+    Answers the follow-up queries: connection `name` of PR `id` has `size` comments,
+    served 100 at a time with the index as cursor.
+    """
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.queries = []
+
+    def graphql(self, url, query, variables=None):
+        self.queries.append(query)
+        data = {}
+        pattern = r'(c\d+): node\(id: "(\w+)"\) \{\s*\.\.\. on PullRequest \{\s*comments\(first: 100, after: "(\d+)"\)'
+        for alias, id, cursor in re.findall(pattern, query):
+            end = min(int(cursor) + 100, self.sizes[id])
+            data[alias] = {'comments': {
+                'nodes': [{'id': f'{id}-{i}'} for i in range(int(cursor), end)],
+                'pageInfo': {'endCursor': str(end), 'hasNextPage': end < self.sizes[id]}}}
+        return {'data': data}
+
+def test_fetchNested(graphql, monkeypatch):
+    sizes = {'a': 100, 'b': 250, 'c': 430}
+    nodes = [{'id': id, 'comments': {
+        'nodes': [{'id': f'{id}-{i}'} for i in range(min(size, 100))],
+        'pageInfo': {'endCursor': '100', 'hasNextPage': size > 100}}} for id, size in sizes.items()]
+    scheduler = Scheduler(sizes)
+    monkeypatch.setitem(graphql.SCHEDULERS, graphql.Source.GITHUB, scheduler)
+    monkeypatch.setattr(graphql, 'NESTED_BATCH', 2)
+
+    requests = graphql.fetch_nested('HPCL', 'test', graphql.Source.GITHUB, 'pr', nodes)
+    for node in nodes:
+        assert [comment['id'] for comment in node['comments']['nodes']] == [f'{node["id"]}-{i}' for i in range(sizes[node['id']])]
+    # only b and c are paged into, two connections per request: (b, c), (b, c), (c), (c)
+    assert requests == 4
+    assert all(query.count('node(id:') <= 2 for query in scheduler.queries)
+    assert '"a"' not in ''.join(scheduler.queries)
+
+def test_recentNodes(graphql):
+    since = datetime.datetime(2021, 3, 2, 10, tzinfo=datetime.timezone.utc)
+    nodes = [{'updatedAt': '2021-03-03T10:00:00Z'}, {'updatedAt': '2021-03-02T10:00:00Z'},
+             {'updatedAt': '2021-03-01T10:00:00Z'}, {'updatedAt': '2021-03-04T10:00:00Z'}]
+    assert graphql.recent_nodes(nodes, None) == (nodes, False)
+    # the boundary is included, the nodes after the first older one are not
+    assert graphql.recent_nodes(nodes, since) == (nodes[:2], True)
+    assert graphql.recent_nodes(nodes[:2], since) == (nodes[:2], False)
+    assert graphql.recent_nodes(nodes[2:], since) == ([], True)
+
+EMPTY = {'nodes': [], 'pageInfo': {'endCursor': None, 'hasNextPage': False}}
+
+class IssueScheduler:
+    """
+    Answers the issue queries with pages of 2 issues, the cursor being the page number.
+    """
+    def __init__(self, dates):
+        self.dates = dates
+        self.cursors = []
+
+    def graphql(self, url, query, variables=None):
+        self.cursors.append(variables['cursor'])
+        page = int(variables['cursor'] or 0)
+        nodes = [{'title': f'Issue {i}', 'body': '', 'updatedAt': date, 'closedAt': None, 'createdAt': date, 'locked': False,
+                  'url': f'https://github.com/HPCL/test/issues/{i}', 'number': i, 'state': 'OPEN',
+                  'author': {'login': 'alice', 'url': 'https://github.com/alice'}, 'milestone': None,
+                  'labels': EMPTY, 'assignees': EMPTY, 'comments': EMPTY}
+                 for i, date in enumerate(self.dates[2 * page:2 * page + 2], 2 * page)]
+        pageInfo = {'endCursor': str(page + 1), 'hasNextPage': 2 * page + 2 < len(self.dates)}
+        return {'data': {'repository': {'issues': {'nodes': nodes, 'pageInfo': pageInfo}}}}
+
+def test_fetchIssuesSince(graphql, monkeypatch):
+    dates = ['2021-03-06T10:00:00Z', '2021-03-05T10:00:00Z', '2021-03-04T10:00:00Z', '2021-03-03T10:00:00Z',
+             '2021-03-02T10:00:00Z', '2021-03-01T10:00:00Z']
+    scheduler = IssueScheduler(dates)
+    monkeypatch.setitem(graphql.SCHEDULERS, graphql.Source.GITHUB, scheduler)
+
+    issues = graphql.fetch_issues('HPCL', 'test', graphql.Source.GITHUB)
+    assert [issue['updatedAt'] for issue in issues] == dates
+    assert scheduler.cursors == [None, '1', '2']
+
+    # the second page ends with since, the third one is not fetched
+    scheduler.cursors = []
+    since = datetime.datetime(2021, 3, 3, 10, tzinfo=datetime.timezone.utc)
+    issues = graphql.fetch_issues('HPCL', 'test', graphql.Source.GITHUB, since=since)
+    assert [issue['updatedAt'] for issue in issues] == dates[:4]
+    assert scheduler.cursors == [None, '1', '2']
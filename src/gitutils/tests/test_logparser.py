@@ -0,0 +1,183 @@
+import pytest
+from gitutils.logparser import TRUNCATED, ListSink, ThreadedSink, parseCommitLog
+
+LOG = b'''commit 1111111111111111111111111111111111111111
+Author: Alice <alice@example.com>
+Date:   2021-01-01T00:00:00+00:00
+
+    Drop a comment
+
+diff --git a/schema.sql b/schema.sql
+index 1234567..89abcde 100644
+--- a/schema.sql
++++ b/schema.sql
+@@ -1,3 +1,2 @@
+ create table t (
+--- comment
+ );
+@@ -10 +9,2 @@ create table u (
+-x
++y
++z
+\\ No newline at end of file
+diff --git a/empty.txt b/empty.txt
+new file mode 100644
+index 0000000..e69de29
+commit 2222222222222222222222222222222222222222
+Merge: 1111111 3333333
+Author: Bob <bob@example.com>
+Date:   2021-01-02T00:00:00+00:00
+
+    Merge branch 'feature'
+
+commit 3333333333333333333333333333333333333333
+Author: Bob <bob@example.com>
+Date:   2021-01-03T00:00:00+00:00
+
+    Empty commit
+'''.split(b'\n')
+
+def test_parseCommitLog():
+    commits = list(parseCommitLog(LOG))
+    assert [commit.id[0] for commit in commits] == ['1', '3']
+    first, last = commits
+    assert first.author == b'Alice <alice@example.com>'
+    assert first.message.strip() == 'Drop a comment'
+    assert [diff.path for diff in first.diffs] == ['schema.sql', 'empty.txt']
+    schema = first.diffs[0]
+    assert (schema.added, schema.removed) == (2, 2)
+    assert schema.body.split('\n')[2] == '--- comment'
+    assert schema.body.endswith('\\ No newline at end of file')
+    assert schema.legacy_header().endswith('+++ b/schema.sql@@ -1,3 +1,2 @@')
+    assert first.diffs[1].hunks == []
+    assert last.message.strip() == 'Empty commit' and last.diffs == []
+
+def test_listSink():
+    sink = ListSink()
+    for commit in parseCommitLog(LOG):
+        sink.add(commit)
+    commits = sink.close()
+    assert commits[0]['diffs'][0]['filename'] == 'a/schema.sql b/schema.sql'
+    assert commits[1]['diffs'] == []
+
+class FailingSink(ListSink):
+    def add(self, commit):
+        raise ValueError(commit.id)
+
+def test_threadedSink():
+    sink = ThreadedSink(ListSink(), maxsize=1)
+    sink.start({})
+    for commit in parseCommitLog(LOG):
+        sink.add(commit)
+    commits = sink.close()
+    assert [commit['id'] for commit in commits] == [commit.id for commit in parseCommitLog(LOG)]
+    assert set(sink.timings) == {'produce', 'produce_cpu', 'wait', 'consume'}
+
+    # errors of the wrapped sink stop the producer
+    sink = ThreadedSink(FailingSink())
+    with pytest.raises(ValueError):
+        for commit in parseCommitLog(LOG):
+            sink.add(commit)
+        sink.close()
+
+BIG = b'''commit 4444444444444444444444444444444444444444
+Author: Alice <alice@example.com>
+Date:   2021-01-04T00:00:00+00:00
+
+    Add generated files
+
+diff --git a/big.txt b/big.txt
+new file mode 100644
+index 0000000..1234567
+--- /dev/null
++++ b/big.txt
+@@ -0,0 +1,4 @@
++line 1
++line 2
++line 3
++line 4
+diff --git a/data.bin b/data.bin
+new file mode 100644
+index 0000000..89abcde
+--- /dev/null
++++ b/data.bin
+@@ -0,0 +1,2 @@
++abc
++d\x00ef
+diff --git a/image.png b/image.png
+new file mode 100644
+index 0000000..fedcba9
+Binary files /dev/null and b/image.png differ
+'''.split(b'\n')
+
+def test_limits():
+    commit, = parseCommitLog(BIG, filelimit=32)
+    big, data, image = commit.diffs
+    assert big.truncated and (big.added, big.removed) == (4, 0)
+    assert big.hunks[1:] == [b'+line 1', b'+line 2', TRUNCATED % (4, 0)]
+    assert big.body.count('\n+') == 2
+    assert data.binary and data.truncated and data.added == 2
+    assert data.hunks == [b'@@ -0,0 +1,2 @@', TRUNCATED % (2, 0)]
+    assert image.binary and not image.truncated and image.hunks == []
+
+    # the commit limit applies to all files together
+    commit, = parseCommitLog(BIG, commitlimit=60)
+    assert [diff.truncated for diff in commit.diffs] == [False, True, False]
+    commit, = parseCommitLog(BIG, filelimit=None, commitlimit=None)
+    assert len(commit.diffs[0].hunks) == 5
+
+PATHS = b'''commit 5555555555555555555555555555555555555555
+Author: Alice <alice@example.com>
+Date:   2021-01-01T00:00:00+00:00
+
+    Odd names
+
+diff --git a/my file.txt b/my file.txt
+index 587be6b..23a2420 100644
+--- a/my file.txt\t
++++ b/my file.txt\t
+@@ -1 +1,2 @@
+ x
++x2
+diff --git a/plain.txt b/new name.txt
+similarity index 100%
+rename from plain.txt
+rename to new name.txt
+diff --git "a/t\\303\\251st.txt" "b/t\\303\\251st.txt"
+deleted file mode 100644
+index 975fbec..0000000
+--- "a/t\\303\\251st.txt"
++++ /dev/null
+@@ -1 +0,0 @@
+-y
+diff --git "a/t\\303\\253st two.txt" "b/d/t\\303\\253st 3.txt"
+similarity index 100%
+rename from "t\\303\\253st two.txt"
+rename to "d/t\\303\\253st 3.txt"
+diff --git a/a b/c b/a b/c
+index 587be6b..23a2420 100644
+'''
+
+NUMSTAT = b'''commit 5555555555555555555555555555555555555555
+Author: Alice <alice@example.com>
+Date:   2021-01-01T00:00:00+00:00
+
+    Odd names
+
+1\t0\tmy file.txt
+0\t0\tplain.txt => new name.txt
+0\t1\t"t\\303\\251st.txt"
+0\t0\t"t\\303\\253st two.txt" => "d/t\\303\\253st 3.txt"
+0\t0\tsrc/{old dir => new dir}/a b.c
+'''
+
+def test_paths():
+    # names with spaces, quoted non-ASCII names and renames of both
+    commit, = parseCommitLog(PATHS.split(b'\n'))
+    assert [(diff.path, diff.newpath) for diff in commit.diffs] == [
+        ('my file.txt', 'my file.txt'), ('plain.txt', 'new name.txt'), ('tést.txt', 'tést.txt'),
+        ('tëst two.txt', 'd/tëst 3.txt'), ('a b/c', 'a b/c')]
+    commit, = parseCommitLog(NUMSTAT.split(b'\n'))
+    assert [(diff.path, diff.newpath) for diff in commit.diffs] == [
+        ('my file.txt', 'my file.txt'), ('plain.txt', 'new name.txt'), ('tést.txt', 'tést.txt'),
+        ('tëst two.txt', 'd/tëst 3.txt'), ('src/old dir/a b.c', 'src/new dir/a b.c')]
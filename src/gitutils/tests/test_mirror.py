@@ -0,0 +1,58 @@
+import os
+from gitutils.tests.testutils import *
+from gitutils.gitcommand import GitCommand
+from gitutils.mirror import MirrorCache
+
+def getRefs(path):
+    return sorted(runGit(path, 'for-each-ref --format="%(refname)"').decode('utf-8').split())
+
+def test_mirrorUpdate(tmp_path):
+    repo = makeTestRepo(str(tmp_path / 'repo'))
+    mirrors = MirrorCache(str(tmp_path / 'mirrors'))
+    path = mirrors.update(repo)
+    assert path == mirrors.getPath(repo)
+    assert getRefs(path) == ['refs/heads/feature', 'refs/heads/main']
+
+    # new commits and deleted branches are fetched
+    commitFile(repo, 'new.txt', 'new\n', 'Add new', date='2024-01-01T00:00:00')
+    runGit(repo, 'branch -q -D feature')
+    runGit(repo, 'tag v1')
+    assert mirrors.update(repo) == path
+    assert getRefs(path) == ['refs/heads/main', 'refs/tags/v1']
+    assert mirrors.readObject(repo, 'main:new.txt') == b'new\n'
+    assert mirrors.readObject(repo, 'main:missing.txt') is None
+
+    # the history is mined from the mirror without a checkout
+    gitcmd = GitCommand(os.path.dirname(path))
+    messages = [commit.message.strip() for commit in gitcmd.iterRepoCommitData(os.path.basename(path), since='2000-01-01', until='2099-01-01')]
+    assert messages[0] == 'Add new' and len(messages) == 4
+
+def test_mirrorWorktree(tmp_path):
+    repo = makeTestRepo(str(tmp_path / 'repo'))
+    mirrors = MirrorCache(str(tmp_path / 'mirrors'))
+    mirrors.update(repo)
+    dest = str(tmp_path / 'checkout')
+    assert mirrors.addWorktree(repo, dest) == dest
+    assert sorted(os.listdir(dest)) == ['.git', 'hello.py']
+
+    # a dirty worktree is reset by the next checkout
+    with open(os.path.join(dest, 'hello.py'), 'w') as f:
+        f.write('broken\n')
+    with open(os.path.join(dest, 'junk.txt'), 'w') as f:
+        f.write('junk\n')
+    assert mirrors.addWorktree(repo, dest, rev='feature') == dest
+    assert sorted(os.listdir(dest)) == ['.git', 'README.md', 'feature.c', 'hello.py']
+    assert open(os.path.join(dest, 'hello.py')).read().startswith('def hello')
+
+    assert mirrors.removeWorktree(repo, dest)
+    assert not os.path.exists(dest)
+
+def test_bloblessMirror(tmp_path):
+    repo = makeTestRepo(str(tmp_path / 'repo'))
+    runGit(repo, 'config uploadpack.allowFilter true')
+    url = 'file://' + repo
+    mirrors = MirrorCache(str(tmp_path / 'mirrors'), blobless=True)
+    path = mirrors.update(url)
+    assert runGit(path, 'config remote.origin.promisor').strip() == b'true'
+    # file contents are fetched on demand
+    assert mirrors.readObject(url, 'main:hello.py').startswith(b'def hello')
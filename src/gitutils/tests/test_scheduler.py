@@ -0,0 +1,86 @@
+import datetime
+
+from gitutils import scheduler
+from gitutils.scheduler import RequestScheduler
+
+class Clock(object):
+    """
+    Stand-in for the time module of the scheduler: sleeping advances the clock.
+    """
+    def __init__(self):
+        self.now = 1600000000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class Response(object):
+    def __init__(self, status_code=200, headers=None, data=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.data = data
+
+    def json(self):
+        return self.data
+
+class Session(object):
+    """
+    Replays canned responses and records the token of each request.
+    """
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.tokens = []
+
+    def request(self, method, url, headers=None, **kwargs):
+        self.tokens.append(headers.get('Authorization'))
+        return self.responses.pop(0)
+
+def limits(remaining, reset):
+    return {'X-RateLimit-Remaining': str(remaining), 'X-RateLimit-Reset': str(reset)}
+
+def test_requestScheduler(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler, 'time', clock)
+    reset = clock.now + 600
+
+    # the token with the most requests left is used
+    session = Session([Response(headers=limits(10, reset)), Response(headers=limits(100, reset)), Response(headers=limits(99, reset))])
+    requests = RequestScheduler(['a', 'b'], session=session)
+    for _ in range(3):
+        requests.request('GET', 'https://api.github.com/repos/HPCL/test/events')
+    assert session.tokens == ['token a', 'token b', 'token b']
+
+    # once all are used up, sleep until the earliest reset only
+    requests.update('a', 'core', 0, reset)
+    requests.update('b', 'core', 1, reset + 60)
+    session.responses.append(Response(headers=limits(4999, reset + 3600)))
+    requests.request('GET', 'https://api.github.com/repos/HPCL/test/events')
+    assert clock.sleeps == [601]
+    assert session.tokens[-1] == 'token a'
+
+    # a rate limit error is retried with the other token
+    requests.update('b', 'core', 5000, reset + 3600)
+    session.responses += [Response(403, limits(0, reset + 3600)), Response(headers=limits(4998, reset + 3600))]
+    assert requests.request('GET', 'https://api.github.com/rate_limit').status_code == 200
+    assert session.tokens[-2:] == ['token b', 'token a']
+
+def test_graphqlRateLimit(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler, 'time', clock)
+    reset_at = datetime.datetime.fromtimestamp(clock.now + 120, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    session = Session([Response(data={'errors': [{'type': 'RATE_LIMITED', 'message': 'API rate limit exceeded'}]}),
+                       Response(data={'data': {'rateLimit': {'cost': 1, 'remaining': 0, 'resetAt': reset_at}, 'repository': {}}}),
+                       Response(data={'data': {'rateLimit': {'cost': 1, 'remaining': 4999, 'resetAt': reset_at}, 'repository': {}}})])
+    requests = RequestScheduler(['a'], scheme='bearer', session=session)
+    assert 'repository' in requests.graphql('https://api.github.com/graphql', 'query { repository }')['data']
+    # the first error has no reset time, the default wait applies
+    assert clock.sleeps == [scheduler.DEFAULT_WAIT + 1]
+    # the rateLimit field says the points are used up until resetAt
+    requests.graphql('https://api.github.com/graphql', 'query { repository }')
+    assert clock.sleeps[1:] == [121 - scheduler.DEFAULT_WAIT - 1]
+    assert session.tokens == ['bearer a'] * 3
@@ -0,0 +1,48 @@
+import json
+
+from gitutils.tests.testutils import *
+from gitutils.telemetry import Telemetry
+
+SCHEMA = '''
+create table author (id integer primary key, username text);
+'''
+
+def test_telemetry(tmp_path):
+    telemetry = Telemetry(slow_query=60)
+    db = telemetry.connect(makeSQLiteDB(tmp_path / 'ideas.sqlite3', SCHEMA))
+    cursor = db.cursor()
+    with telemetry.stage('author insert', rows=2):
+        cursor.executemany('insert into author (username) values (%s)', [('alice',), ('bob',)])
+        cursor.execute('select count(*) from author')
+        assert cursor.fetchone()[0] == 2
+        db.commit()
+    with telemetry.stage('author insert'):
+        pass
+    telemetry.count('author insert', 1)
+
+    path, summary = telemetry.write(str(tmp_path / 'runs' / 'test.json'), project='test')
+    assert path == str(tmp_path / 'runs' / 'test.json')
+    assert json.load(open(path)) == summary
+    assert summary['project'] == 'test'
+    stage = summary['stages']['author insert']
+    assert stage['calls'] == 2 and stage['rows'] == 3 and stage['rows_per_sec'] > 0
+    assert summary['database']['queries'] == 2
+    assert summary['database']['commits'] == 1
+    assert summary['database']['slow_queries'] == 0
+
+def test_writeTwice(tmp_path):
+    # two runs started in the same second keep their own summaries
+    first, second = Telemetry(), Telemetry()
+    path = str(tmp_path / 'test-add_prs-20210301T100000.json')
+    assert first.write(path, project='first')[0] == path
+    assert second.write(path, project='second')[0] == str(tmp_path / 'test-add_prs-20210301T100000-1.json')
+    assert second.write(path, project='second')[0] == str(tmp_path / 'test-add_prs-20210301T100000-2.json')
+    assert json.load(open(path))['project'] == 'first'
+    assert json.load(open(tmp_path / 'test-add_prs-20210301T100000-1.json'))['project'] == 'second'
+
+def test_slowQuery(tmp_path, caplog):
+    telemetry = Telemetry(slow_query=0)
+    cursor = telemetry.connect(makeSQLiteDB(tmp_path / 'ideas.sqlite3', SCHEMA)).cursor()
+    cursor.execute('select count(*)\n  from author')
+    assert telemetry.slow_queries == 1
+    assert 'select count(*) from author' in caplog.text
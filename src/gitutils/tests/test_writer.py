@@ -0,0 +1,156 @@
+import zlib
+
+from gitutils.tests.testutils import *
+from gitutils.backends import connect_sqlite
+from gitutils.gitcommand import GitCommand
+from gitutils.writer import CommitWriter
+
+SCHEMA = [
+    'create table author (id integer primary key, username text, email text, name text, url text)',
+    'create table project_has_author (id integer primary key, author_id int, project_id int)',
+    'create table "commit" (id integer primary key, hash varchar(128) not null unique, datetime datetime, author_id int, project_id int, message text, branch text)',
+    'create table file (id integer primary key, project_id int)',
+    'create table file_path (id integer primary key, project_id int, path text, file_id int)',
+    'create table diff (id integer primary key, file_path text, language text, commit_id int, body text, header text, lines_added int, lines_removed int, file_id int, blob_id int)',
+    'create table diff_blob (id integer primary key, hash varchar(64) not null unique, data blob, size int)',
+    'create table project_checkpoint (id integer primary key, project_id int unique, sha text, commits int, tips text, watermarks text, since text, until text)',
+]
+
+def makeDB(path):
+    db = connect_sqlite(str(path))
+    cursor = db.cursor()
+    for query in SCHEMA:
+        cursor.execute(query)
+    db.commit()
+    return db
+
+def makeRenameRepo(path):
+    """
+    The test repository with a last commit renaming hello.py to greeting.py.
+    """
+    repo = makeTestRepo(path)
+    runGit(repo, 'mv hello.py greeting.py')
+    commitFile(repo, 'greeting.py', 'def hello():\n    print("hello, world")\n', 'Rename hello', date='2023-02-05T14:00:00')
+    return repo
+
+def rows(db, query):
+    cursor = db.cursor()
+    cursor.execute(query)
+    return cursor.fetchall()
+
+def test_commitWriter(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    makeRenameRepo(str(tmp_path / 'repo'))
+    gitcmd = GitCommand(str(tmp_path))
+    commits = list(gitcmd.iterRepoCommitData('repo'))
+    ids = [commit.id for commit in commits]
+    db = makeDB(tmp_path / 'ideas.sqlite3')
+
+    writer = CommitWriter(db, 1, 'repo', batch_size=2)
+    writer.start(gitcmd.tips)
+    for commit in commits[:3]:
+        writer.add(commit)
+    # the first batch is stored together with its checkpoint, the third commit is pending
+    assert rows(db, 'select sha, commits from project_checkpoint where project_id=1') == [(ids[1], 2)]
+    assert rows(db, 'select count(*) from commit') == [(2,)]
+    for commit in commits[3:]:
+        writer.add(commit)
+    writer.close()
+    assert rows(db, 'select count(*) from project_checkpoint') == [(0,)]
+
+    assert sorted(rows(db, 'select hash, project_id from commit')) == sorted((sha, 1) for sha in ids)
+    assert rows(db, 'select username, email from author order by username') == [('Alice', 'alice@example.com'), ('Bob', 'bob@example.com')]
+    assert rows(db, 'select count(*) from project_has_author where project_id=1') == [(2,)]
+
+    # the rename is stored under the new name, and both names are the same file
+    diffs = rows(db, 'select commit.message, diff.file_path, diff.lines_added, diff.lines_removed, diff.file_id from diff join commit on diff.commit_id=commit.id')
+    assert len(diffs) == sum(len(commit.diffs) for commit in commits)
+    renamed = [diff for diff in diffs if diff[0].strip() == 'Rename hello']
+    assert [diff[1:4] for diff in renamed] == [('greeting.py', 0, 4)]
+    hello = set(diff[4] for diff in diffs if diff[1] in ('hello.py', 'greeting.py'))
+    assert len(hello) == 1
+    assert dict(rows(db, 'select path, file_id from file_path where project_id=1'))['hello.py'] == hello.pop()
+    assert [diff[1:4] for diff in diffs if diff[0].strip() == 'Remove README'] == [('README.md', 0, 1)]
+
+def test_commitWriterRerun(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    makeRenameRepo(str(tmp_path / 'repo'))
+    db = makeDB(tmp_path / 'ideas.sqlite3')
+    tables = ['author', 'project_has_author', 'commit', 'file', 'file_path', 'diff']
+
+    stored = []
+    for run in range(2):
+        # mined from scratch each time, as by a second --add_project of the project
+        gitcmd = GitCommand(str(tmp_path))
+        commits = list(gitcmd.iterRepoCommitData('repo'))
+        writer = CommitWriter(db, 1, 'repo', batch_size=2)
+        writer.start(gitcmd.tips)
+        for commit in commits:
+            writer.add(commit)
+        writer.close()
+        stored.append(({table: rows(db, f'select count(*) from {table}') for table in tables},
+                       rows(db, 'select id, hash from commit order by id'),
+                       rows(db, 'select id, commit_id, file_path, file_id from diff order by id'),
+                       rows(db, 'select id, username from author order by id')))
+    assert stored[0][0]['commit'] == [(len(stored[0][1]),)]
+    assert stored[1] == stored[0]
+
+def test_commitWriterCompress(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    repo = makeTestRepo(str(tmp_path / 'repo'))
+    # the same change on both branches
+    runGit(repo, 'cherry-pick feature', date='2023-02-05T14:00:00')
+    gitcmd = GitCommand(str(tmp_path))
+    commits = list(gitcmd.iterRepoCommitData('repo'))
+    bodies = {(commit.id, diff.newpath): diff.body for commit in commits for diff in commit.diffs}
+    db = makeDB(tmp_path / 'ideas.sqlite3')
+
+    writer = CommitWriter(db, 1, 'repo', compress=True)
+    writer.start(gitcmd.tips)
+    for commit in commits:
+        writer.add(commit)
+    writer.close()
+
+    diffs = rows(db, 'select commit.hash, diff.file_path, diff.body, diff.blob_id from diff join commit on diff.commit_id=commit.id')
+    assert len(diffs) == len(bodies)
+    assert all(body == '' for sha, path, body, blob_id in diffs)
+    # the cherry-picked diff shares the blob of the original
+    picked = set(blob_id for sha, path, body, blob_id in diffs if path == 'feature.c')
+    assert len(picked) == 1
+    blobs = dict((id, (data, size)) for id, data, size in rows(db, 'select id, data, size from diff_blob'))
+    assert len(blobs) == len(set(body for body in bodies.values() if body)) < len(diffs)
+    for sha, path, body, blob_id in diffs:
+        data, size = blobs[blob_id]
+        assert zlib.decompress(data).decode('utf-8') == bodies[(sha, path)]
+        assert size == len(bodies[(sha, path)].encode('utf-8'))
+
+def test_commitWriterPaths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    repo = str(tmp_path / 'repo')
+    os.makedirs(repo)
+    runGit(repo, 'init -q -b main')
+    commitFile(repo, 'my file.txt', 'x\n', 'Add my file')
+    commitFile(repo, 'my other.txt', 'y\n', 'Add my other', date='2021-03-02T10:00:00')
+    commitFile(repo, 'tést.txt', 'z\n', 'Add test', date='2021-03-03T10:00:00')
+    commitFile(repo, 'my file.txt', 'x\nx2\n', 'Change my file', date='2021-03-04T10:00:00')
+    runGit(repo, 'mv "tést.txt" "new tëst.txt"')
+    runGit(repo, 'commit -q -m "Rename test"', date='2021-03-05T10:00:00')
+    gitcmd = GitCommand(str(tmp_path))
+    commits = list(gitcmd.iterRepoCommitData('repo'))
+    db = makeDB(tmp_path / 'ideas.sqlite3')
+
+    writer = CommitWriter(db, 1, 'repo')
+    writer.start(gitcmd.tips)
+    for commit in commits:
+        writer.add(commit)
+    writer.close()
+
+    file_ids = dict(rows(db, 'select path, file_id from file_path where project_id=1'))
+    assert sorted(file_ids) == ['my file.txt', 'my other.txt', 'new tëst.txt', 'tést.txt']
+    # files whose names share a prefix stay apart, the renamed file keeps its id
+    assert len(set(file_ids[path] for path in ['my file.txt', 'my other.txt', 'tést.txt'])) == 3
+    assert file_ids['new tëst.txt'] == file_ids['tést.txt']
+    assert sorted(rows(db, 'select file_path, file_id from diff')) == sorted([
+        ('my file.txt', file_ids['my file.txt']), ('my file.txt', file_ids['my file.txt']),
+        ('my other.txt', file_ids['my other.txt']), ('tést.txt', file_ids['tést.txt']),
+        ('new tëst.txt', file_ids['tést.txt'])])
@@ -1,4 +1,4 @@
-import sys, os
+import os, shlex, sys
 
 
 def err(msg):
@@ -8,3 +8,62 @@ def err(msg):
 def getGitCommandInstance():
     from gitutils.gitcommand import GitCommand
     return GitCommand()
+
+def runGit(path, args, author='Alice <alice@example.com>', date='2021-03-01T10:00:00'):
+    """
+    Run a git command in a test repository with a fixed identity and date.
+    """
+    from gitutils.command import Command
+    name, email = author[:author.index('<') - 1], author[author.index('<') + 1:-1]
+    env = dict(os.environ, GIT_CONFIG_GLOBAL=os.devnull, GIT_CONFIG_NOSYSTEM='1',
+               GIT_AUTHOR_NAME=name, GIT_AUTHOR_EMAIL=email, GIT_COMMITTER_NAME=name,
+               GIT_COMMITTER_EMAIL=email, GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date)
+    retcode, out, err = Command('git ' + args).run(cwd=path, env=env)
+    assert retcode == 0, err
+    return out
+
+def commitFile(path, name, text, message, **kwargs):
+    """
+    Write a file in a test repository and commit it.
+    """
+    with open(os.path.join(path, name), 'w') as f:
+        f.write(text)
+    runGit(path, 'add ' + shlex.quote(name))
+    runGit(path, 'commit -q -m "%s"' % message, **kwargs)
+
+def makeTestRepo(path):
+    """
+    Create a small local git repository with a few commits by two authors.
+    :argument path the directory to create the repository in
+    returns the repository path
+    """
+    os.makedirs(path)
+    runGit(path, 'init -q -b main')
+    commitFile(path, 'hello.py', 'def hello():\n    print("hello")\n', 'Add hello')
+    with open(os.path.join(path, 'README.md'), 'w') as f:
+        f.write('# Test\n')
+    runGit(path, 'add README.md')
+    commitFile(path, 'hello.py', 'def hello():\n    print("hello, world")\n\n\ndef bye():\n    print("bye")\n',
+               'Add bye" -m "And a README.', author='Bob <bob@example.com>', date='2022-05-02T11:00:00')
+    runGit(path, 'checkout -q -b feature')
+    commitFile(path, 'feature.c', 'int main() {\n  return 0;\n}\n', 'Add feature', date='2022-06-03T12:00:00')
+    runGit(path, 'checkout -q main')
+    runGit(path, 'rm -q README.md')
+    runGit(path, 'commit -q -m "Remove README"', author='Bob <bob@example.com>', date='2023-01-04T13:00:00')
+    return path
+
+def makeSQLiteDB(path, schema):
+    """
+    Create a SQLite database for the tables used by a test, opened like the ingestion scripts open it.
+    :argument path the database file
+    :argument schema SQL statements creating the tables, separated by semicolons
+    returns the connection (see gitutils.backends.connect_sqlite)
+    """
+    from gitutils.backends import connect_sqlite
+    db = connect_sqlite(str(path))
+    cursor = db.cursor()
+    for query in schema.split(';'):
+        if query.strip():
+            cursor.execute(query)
+    db.commit()
+    return db
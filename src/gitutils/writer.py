@@ -0,0 +1,307 @@
+import hashlib
+import json
+import logging
+import time
+import zlib
+
+import arrow
+
+from .dimensions import DimensionCache
+from .telemetry import Telemetry
+
+# Setup Logger
+logger = logging.getLogger('db_interface')
+
+
+class CommitWriter:
+    '''
+        Sink for GitCommand.mineRepo that stores the authors, commits and diffs of a project.
+
+        Commits are buffered and stored in batches of batch_size commits (or fewer if their
+        patch text gets large), each batch with a few executemany statements in a single
+        transaction. The hashes of the commits of the project are loaded once; only the
+        hashes of a batch are looked up to find commits stored by other projects (forks)
+        and the ids of the new commits.
+
+        With every batch the sha of its last commit is saved in project_checkpoint together
+        with what is being mined, so that an interrupted run can be resumed from there
+        (see DatabaseInterface.get_checkpoint). The checkpoint is removed once all commits
+        are stored.
+    '''
+
+    def __init__(self, db, project_id, name, since=None, until=None, watermarks=None, checkpoint=None, authors=None, compress=False, telemetry=None, batch_size=500, batch_bytes=64 << 20):
+        '''
+            since, until, watermarks: what is being mined, stored with the checkpoint
+            checkpoint: the checkpoint of the interrupted run being resumed, if any
+            authors: DimensionCache of the authors by (username, email)
+            compress: if True, diff bodies are stored compressed in diff_blob (see get_blob_ids)
+            telemetry: Telemetry the time and rows of each stage of a batch are added to
+            batch_size, batch_bytes: a batch is stored once it has this many commits or
+            this much patch text
+        '''
+        self.db = db
+        self.cursor = db.cursor()
+        self.project_id = project_id
+        self.name = name
+        self.since = str(since) if since else None
+        self.until = str(until) if until else None
+        self.watermarks = watermarks
+        self.checkpoint = checkpoint
+        self.compress = compress
+        self.telemetry = telemetry if telemetry is not None else Telemetry()
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.mined = checkpoint['commits'] if checkpoint else 0
+        # (username, email) -> author id, shared with the other ingestion methods
+        self.authors = authors if authors is not None else DimensionCache('author', ('username', 'email'))
+        # ids of the authors linked to the project, loaded on first use
+        self.project_authors = None
+        # path -> file id (see get_file_id), loaded on first use
+        self.file_ids = None
+        # hashes of the commits of the project, loaded on first use
+        self.hashes = None
+        # (commit, author (username, email)) waiting to be stored, (commit, author id) once flushed
+        self.pending = []
+        self.pending_bytes = 0
+        # for the throughput report
+        self.stored_commits = 0
+        self.stored_diffs = 0
+        self.started = time.time()
+
+    def start(self, tips):
+        if self.checkpoint:
+            return
+
+        query = 'delete from project_checkpoint where project_id=%s'
+        self.cursor.execute(query, (self.project_id,))
+        query = 'insert into project_checkpoint (project_id, sha, commits, tips, watermarks, since, until) values (%s, NULL, 0, %s, %s, %s, %s)'
+        watermarks = json.dumps(self.watermarks) if self.watermarks is not None else None
+        self.cursor.execute(query, (self.project_id, json.dumps(tips), watermarks, self.since, self.until,))
+        self.db.commit()
+
+    @staticmethod
+    def author_key(author):
+        '''
+            Returns the (username, email) of an author as printed by git, e.g. b'Name <email>'.
+        '''
+        entry = author.decode('utf-8')
+        return entry[:entry.index('<') - 1], entry[entry.index('<') + 1:-1]
+
+    def add_authors(self, author_ids):
+        '''
+            Links the authors of a batch to the project in project_has_author.
+        '''
+        cursor = self.cursor
+        if self.project_authors is None:
+            query = 'select author_id from project_has_author where project_id=%s'
+            cursor.execute(query, (self.project_id,))
+            self.project_authors = set(row[0] for row in cursor.fetchall())
+
+        new = sorted(set(author_ids) - self.project_authors)
+        if new:
+            query = 'insert into project_has_author (author_id, project_id) values (%s, %s)'
+            cursor.executemany(query, [(author_id, self.project_id,) for author_id in new])
+            self.project_authors.update(new)
+            logger.debug(f'{self.name}: Inserted {len(new)} authors working on project {self.project_id}.')
+
+    def get_file_id(self, diff):
+        '''
+            Returns the id of the file changed by a diff. All the paths a file had are mapped
+            to the same id in file_path: a rename links the old and the new path, joining
+            their files if both were seen before, so the order commits come in does not matter.
+        '''
+        cursor = self.cursor
+        if self.file_ids is None:
+            query = 'select path, file_id from file_path where project_id=%s'
+            cursor.execute(query, (self.project_id,))
+            self.file_ids = dict(cursor.fetchall())
+
+        paths = [diff.path, diff.newpath] if diff.newpath != diff.path else [diff.path]
+        file_ids = [self.file_ids[path] for path in paths if path in self.file_ids]
+        if not file_ids:
+            query = 'insert into file (project_id) values (%s)'
+            cursor.execute(query, (self.project_id,))
+            file_id = cursor.lastrowid
+        else:
+            file_id = file_ids[0]
+
+        for other in file_ids[1:]:
+            if other != file_id:
+                # both names were already known as different files
+                query = 'update file_path set file_id=%s where file_id=%s'
+                cursor.execute(query, (file_id, other,))
+                query = 'update diff set file_id=%s where file_id=%s'
+                cursor.execute(query, (file_id, other,))
+                query = 'delete from file where id=%s'
+                cursor.execute(query, (other,))
+                for path, known in self.file_ids.items():
+                    if known == other:
+                        self.file_ids[path] = file_id
+                logger.debug(f'{self.name}: Joined file {other} into file {file_id}.')
+
+        for path in paths:
+            if path not in self.file_ids:
+                query = 'insert into file_path (project_id, path, file_id) values (%s, %s, %s)'
+                cursor.execute(query, (self.project_id, path, file_id,))
+                self.file_ids[path] = file_id
+
+        return file_id
+
+    def get_blob_ids(self, bodies):
+        '''
+            Returns a dict of body -> id of its zlib compressed copy in diff_blob, storing the
+            bodies that are not there yet. A body is stored once, under the sha256 of its text,
+            however many commits (cherry-picks, forks) have it.
+        '''
+        cursor = self.cursor
+        hashes = {}
+        for body in bodies:
+            if body not in hashes:
+                hashes[body] = hashlib.sha256(body.encode('utf-8')).hexdigest()
+        if not hashes:
+            return {}
+
+        query = 'select hash, id from diff_blob where hash in (%s)' % ', '.join(['%s'] * len(hashes))
+        cursor.execute(query, list(hashes.values()))
+        blob_ids = dict(cursor.fetchall())
+
+        rows = []
+        for body, digest in hashes.items():
+            if digest not in blob_ids:
+                data = body.encode('utf-8')
+                rows.append((digest, zlib.compress(data), len(data),))
+                blob_ids[digest] = None
+        if rows:
+            query = 'insert into diff_blob (hash, data, size) values (%s, %s, %s)'
+            cursor.executemany(query, rows)
+            query = 'select hash, id from diff_blob where hash in (%s)' % ', '.join(['%s'] * len(rows))
+            cursor.execute(query, [row[0] for row in rows])
+            blob_ids.update(cursor.fetchall())
+            logger.debug(f'{self.name}: Stored {len(rows)} compressed diff bodies.')
+
+        return {body: blob_ids[digest] for body, digest in hashes.items()}
+
+    def add(self, commit):
+        key = self.author_key(commit.author)
+        self.authors.request(self.cursor, key)
+        self.pending.append((commit, key))
+        self.pending_bytes += sum(sum(map(len, diff.hunks)) for diff in commit.diffs)
+        if len(self.pending) >= self.batch_size or self.pending_bytes >= self.batch_bytes:
+            self.flush()
+
+    def flush(self):
+        '''
+            Stores the pending commits and their diffs in one transaction.
+        '''
+        if not self.pending:
+            return
+        cursor = self.cursor
+        name = self.name
+
+        telemetry = self.telemetry
+
+        # Create the new authors of the batch
+        with telemetry.stage('author resolution', rows=len(self.pending)):
+            self.authors.flush(cursor)
+            self.pending = [(commit, self.authors[key]) for commit, key in self.pending]
+            self.add_authors(author_id for commit, author_id in self.pending)
+
+        with telemetry.stage('commit insert', rows=len(self.pending)):
+            if self.hashes is None:
+                query = 'select hash from commit where project_id=%s'
+                cursor.execute(query, (self.project_id,))
+                self.hashes = set(row[0] for row in cursor.fetchall())
+
+            # Skip existing commits, including those stored by other projects
+            existing = set(commit.id for commit, author_id in self.pending if commit.id in self.hashes)
+            unknown = [commit.id for commit, author_id in self.pending if commit.id not in self.hashes]
+            if unknown:
+                query = 'select hash from commit where hash in (%s)' % ', '.join(['%s'] * len(unknown))
+                cursor.execute(query, unknown)
+                existing.update(row[0] for row in cursor.fetchall())
+            new = [(commit, author_id) for commit, author_id in self.pending if commit.id not in existing]
+            old = [commit for commit, author_id in self.pending if commit.id in existing]
+
+            if old:
+                logger.debug(f'{name}: {len(old)} commits already exist.')
+                query = 'update commit set branch=%s where hash=%s'
+                cursor.executemany(query, [(commit.branches, commit.id,) for commit in old])
+
+                # Link diffs stored before renames were tracked to their files, under the path after
+                # the change; commits of other projects (forks share hashes) keep their own files
+                for commit in old:
+                    for diff in commit.diffs:
+                        self.get_file_id(diff)
+                query = 'update diff set file_id=%s, file_path=%s where commit_id=(select id from commit where hash=%s and project_id=%s) and file_path in (%s, %s) and file_id is null'
+                cursor.executemany(query, [(self.file_ids[diff.newpath], diff.newpath, commit.id, self.project_id, diff.path, diff.newpath,) for commit in old for diff in commit.diffs])
+
+            if new:
+                # Insert commits
+                rows = []
+                for commit, author_id in new:
+                    date = commit.date.decode('utf-8')
+                    dt = arrow.get(date).datetime.strftime('%Y-%m-%d %H:%M:%S')
+                    #dt = datetime.datetime.strptime(date, '%Y-%m-%dT%H:%M:%S%z').strftime('%Y-%m-%d %H:%M:%S')
+                    rows.append((commit.id, dt, author_id, self.project_id, commit.message.strip(), commit.branches,))
+                query = 'insert into commit (hash, datetime, author_id, project_id, message, branch) values (%s, %s, %s, %s, %s, %s)'
+                cursor.executemany(query, rows)
+
+                # Get commit ids
+                hashes = [commit.id for commit, author_id in new]
+                query = 'select hash, id from commit where hash in (%s)' % ', '.join(['%s'] * len(hashes))
+                cursor.execute(query, hashes)
+                commit_ids = dict(cursor.fetchall())
+                self.hashes.update(hashes)
+
+        if new:
+            with telemetry.stage('diff insert'):
+                # Insert diffs (numstat mode has only the line counts, no body or header)
+                # file ids first: a rename later in the batch may join the files of earlier diffs
+                for commit, author_id in new:
+                    for diff in commit.diffs:
+                        self.get_file_id(diff)
+                rows = []
+                for commit, author_id in new:
+                    for diff in commit.diffs:
+                        diffheader = diff.legacy_header() if diff.hunks or diff.header else None
+                        # TODO: Source analysis - programming language
+                        language = 'PLACEHOLDER'
+                        # stored under the path after the change, e.g. the new name of a renamed file
+                        rows.append([diff.newpath, language, commit_ids[commit.id], diff.body, diffheader, diff.added, diff.removed, self.file_ids[diff.newpath], None])
+                if self.compress:
+                    # the body column is left empty for the diffs whose body is in diff_blob
+                    blob_ids = self.get_blob_ids(row[3] for row in rows if row[3])
+                    for row in rows:
+                        if row[3]:
+                            row[8] = blob_ids[row[3]]
+                            row[3] = ''
+                query = 'insert into diff (file_path, language, commit_id, body, header, lines_added, lines_removed, file_id, blob_id) values (%s, %s, %s, %s, %s, %s, %s, %s, %s)'
+                cursor.executemany(query, rows)
+            telemetry.count('diff insert', len(rows))
+
+            self.stored_commits += len(new)
+            self.stored_diffs += len(rows)
+            logger.debug(f'{name}: Inserted {len(new)} new commits and {len(rows)} diffs.')
+
+        with telemetry.stage('checkpoint'):
+            self.mined += len(self.pending)
+            last = self.pending[-1][0].id
+            query = 'update project_checkpoint set sha=%s, commits=%s where project_id=%s'
+            cursor.execute(query, (last, self.mined, self.project_id,))
+
+            # The batch and the checkpoint are stored together
+            self.db.commit()
+        logger.debug(f'{name}: Checkpoint after {self.mined} commits at {last}.')
+        self.pending = []
+        self.pending_bytes = 0
+
+    def close(self):
+        self.flush()
+        query = 'delete from project_checkpoint where project_id=%s'
+        self.cursor.execute(query, (self.project_id,))
+        self.db.commit()
+        self.cursor.close()
+
+        elapsed = time.time() - self.started
+        rows = self.stored_commits + self.stored_diffs
+        logger.info(f'{self.name}: Stored {self.stored_commits} commits and {self.stored_diffs} diffs in {elapsed:.1f} s ({rows / elapsed if elapsed else 0:.0f} rows/sec).')
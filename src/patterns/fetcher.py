@@ -1,13 +1,14 @@
 import pandas as pd 
-import MySQLdb 
 import datetime 
 import calendar 
 from dateutil import parser
+from gitutils.backends import connect_mysql, connect_sqlite
 from gitutils.utils import err
 import getpass
 import os
 from os.path import abspath, dirname 
 import glob
+import zlib
 
 class Fetcher:
 
@@ -31,7 +32,12 @@ class Fetcher:
             for filename in filenames:
                 return os.path.join(root, filename)
 
-    def fetch(self, db=None, cache=True, dbpwd=None):
+    def fetch(self, db=None, cache=True, dbpwd=None, sqlite=None):
+        """
+        Load the commits and diffs of the project, from the local cache if there is one.
+        :argument db an open database connection to use instead of connecting to the IDEAS database
+        :argument sqlite path of a local SQLite database to use instead (see gitutils.backends)
+        """
         if cache:
             the_cache = self.find_cache()
             if the_cache:
@@ -40,14 +46,15 @@ class Fetcher:
                 print("INFO: Loaded local cached copy of %s data." % self.project)
                 return True
 
-        # Do not save the database password in publicly visible files, e.g, scripts, notebooks, etc!
-        if dbpwd: db_pwd = dbpwd
-        else: db_pwd = getpass.getpass(prompt='Database password:')
-        if not db:
-            self.db = MySQLdb.connect(host='sansa.cs.uoregon.edu', port=3331, user='ideas_user', passwd=db_pwd,
-                                      db='ideas_db', charset='utf8')
-        else:
+        if db:
             self.db = db
+        elif sqlite:
+            self.db = connect_sqlite(sqlite)
+        else:
+            # Do not save the database password in publicly visible files, e.g, scripts, notebooks, etc!
+            if dbpwd: db_pwd = dbpwd
+            else: db_pwd = getpass.getpass(prompt='Database password:')
+            self.db = connect_mysql('sansa.cs.uoregon.edu', 3331, 'ideas_user', db_pwd, 'ideas_db')
         self.cursor = self.db.cursor()
         print("INFO: Loading %s data from database. This can take a while..." % self.project)
         if self.project_url:
@@ -57,7 +64,7 @@ class Fetcher:
                 self.close_session()
                 err("This project URL was not found in the database. Available URLs are: %s" % '\n'.join(all_project_urls))
             else:
-                _ = self.cursor.execute('select name from project where source_url = "%s"' % self.project_url)
+                _ = self.cursor.execute('select name from project where source_url = %s', (self.project_url,))
                 self.project = self.cursor.fetchall()[0][0]
 
         if not self.project_url:
@@ -73,19 +80,28 @@ class Fetcher:
         # TODO: eventually add d.language, a.email, and project url (to identify forks) to select
         commit_query =\
         '''select c.id as commit_id, c.hash as sha, c.branch as branch, c.datetime as datetime, 
-            a.username as author, a.email as email, c.message as message, d.file_path, d.body 
+            a.username as author, a.email as email, c.message as message, d.file_path, d.body, 
+            d.lines_added, d.lines_removed, b.data 
         from commit c join author a on(c.author_id = a.id) 
-            join project p on(c.project_id = p.id) join diff d on(c.id = d.commit_id) '''
+            join project p on(c.project_id = p.id) join diff d on(c.id = d.commit_id) 
+            left join diff_blob b on(d.blob_id = b.id) '''
         if self.project_url is None:
-            commit_query += ' where p.name = "%s"' % self.project
+            commit_query += ' where p.name = %s'
             if self.exclude_forks: commit_query += ' and p.fork_of_id is null'
             elif self.forks_only: commit_query += ' and p.child_of_id is null'
+            params = (self.project,)
         else:
-            commit_query += 'where p.source_url = "%s" ' % self.project_url
-        comm_ans = self.cursor.execute(commit_query)
+            commit_query += 'where p.source_url = %s '
+            params = (self.project_url,)
+        comm_ans = self.cursor.execute(commit_query, params)
         self.commit_data = pd.DataFrame(self.cursor.fetchall())
         self.commit_data.columns = ['index', 'sha', 'branch', 'datetime', 'author', 'email', 'message', 'filepath',
-                                    'diff']
+                                    'diff', 'lines_added', 'lines_removed', 'blob']
+        # bodies stored with --compress_diffs are in diff_blob
+        compressed = self.commit_data['blob'].notna()
+        self.commit_data.loc[compressed, 'diff'] = self.commit_data.loc[compressed, 'blob'].map(
+            lambda data: zlib.decompress(bytes(data)).decode('utf-8'))
+        self.commit_data = self.commit_data.drop(columns=['blob'])
         self.commit_data.index = self.commit_data['datetime']
         temp_d = self.commit_data['datetime'].map(lambda x: x.date())
         self.commit_data[['year', 'month', 'day', 'doy', 'dow']] = pd.DataFrame(
@@ -74,6 +74,9 @@ class Patterns(Fetcher):
     # edits_summary_re.findall('--++-+-+--++--++-+--') produces ['--++', '-+', '-+', '--++', '--++', '-+']
     edits_summary_re = re.compile(r"(-+\++)")
 
+    # the last line of a diff body that lost lines to the size limits (see gitutils.logparser.TRUNCATED)
+    truncated_re = re.compile(r"^\\ Diff truncated, \d+ lines added and \d+ lines removed in total$", re.M)
+
     # TODO: create per-project configurations, the opposite of .gitignore
     doc_suffixes = ["rst", "md", "txt", "rtf"]
     code_suffixes = [
@@ -276,8 +279,27 @@ class Patterns(Fetcher):
                 ),
                 index=self.commit_data.index,
             )
+            self.use_stored_counts()
         self.update_data()
 
+    def use_stored_counts(self):
+        # Diffs mined with --numstat have no body, and truncated or binary diffs only part of it,
+        # so their LOCC comes from the line counts stored with them
+        if "lines_added" not in self.commit_data.columns:
+            return  # cached before the counts were fetched
+        bodies = self.commit_data["diff"].fillna("")
+        stored = (
+            (bodies.eq("") | bodies.str.contains(Patterns.truncated_re))
+            & self.commit_data["lines_added"].notna()
+            & self.commit_data["lines_removed"].notna()
+        ).to_numpy()
+        added = self.commit_data.loc[stored, "lines_added"].to_numpy(dtype=int)
+        removed = self.commit_data.loc[stored, "lines_removed"].to_numpy(dtype=int)
+        self.commit_data.loc[stored, "locc+"] = added
+        self.commit_data.loc[stored, "locc-"] = removed
+        self.commit_data.loc[stored, "locc"] = added + removed
+        self.commit_data.loc[stored, "locc-basic"] = added + removed
+
     def annotate_metrics(self, diff_alg="cos"):
         # Add columns with commonly used metrics
         # avoid recomputing the default metrics if they are already there
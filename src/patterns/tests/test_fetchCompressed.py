@@ -0,0 +1,36 @@
+import pytest
+
+from gitutils.tests.testutils import *
+from gitutils.tests.test_writer import makeDB
+from gitutils.gitcommand import GitCommand
+from gitutils.writer import CommitWriter
+
+pytest.importorskip('pandas')
+
+from patterns.fetcher import Fetcher
+
+def test_fetchCompressed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    makeTestRepo(str(tmp_path / 'compressed'))
+    gitcmd = GitCommand(str(tmp_path))
+    commits = list(gitcmd.iterRepoCommitData('compressed'))
+    bodies = {(commit.id, diff.newpath): diff.body for commit in commits for diff in commit.diffs}
+
+    db = makeDB(tmp_path / 'ideas.sqlite3')
+    cursor = db.cursor()
+    cursor.execute('create table project (id integer primary key, name text, source_url text, fork_of_id int, child_of_id int)')
+    cursor.execute("insert into project (name, source_url) values ('compressed', 'compressed')")
+    db.commit()
+    writer = CommitWriter(db, 1, 'compressed', compress=True)
+    writer.start(gitcmd.tips)
+    for commit in commits:
+        writer.add(commit)
+    writer.close()
+
+    fetcher = Fetcher('compressed')
+    # the loaded data is cached in a pickle under top_dir
+    fetcher.top_dir = str(tmp_path)
+    assert fetcher.fetch(cache=False, sqlite=str(tmp_path / 'ideas.sqlite3')) is True
+    data = fetcher.commit_data
+    assert 'blob' not in data.columns
+    assert dict(((sha, path), diff) for sha, path, diff in zip(data['sha'], data['filepath'], data['diff'])) == bodies
@@ -0,0 +1,66 @@
+import pytest
+
+from gitutils.tests.testutils import *
+from gitutils.tests.test_writer import makeDB
+from gitutils.gitcommand import GitCommand
+from gitutils.writer import CommitWriter
+
+pytest.importorskip('pandas')
+pytest.importorskip('textdistance')
+pytest.importorskip('fuzzywuzzy')
+
+from patterns.patterns import Patterns
+
+def loadPatterns(tmp_path, name, **kwargs):
+    """
+    Mines the repository under tmp_path into a new SQLite database and loads it with Patterns.
+    :argument kwargs passed to iterRepoCommitData
+    returns (the Patterns object, the mined commits)
+    """
+    gitcmd = GitCommand(str(tmp_path))
+    commits = list(gitcmd.iterRepoCommitData(name, **kwargs))
+    db = makeDB(tmp_path / ('%s.sqlite3' % name))
+    cursor = db.cursor()
+    cursor.execute('create table project (id integer primary key, name text, source_url text, fork_of_id int, child_of_id int)')
+    cursor.execute('insert into project (name, source_url) values (?, ?)', (name, name))
+    db.commit()
+    writer = CommitWriter(db, 1, name)
+    writer.start(gitcmd.tips)
+    for commit in commits:
+        writer.add(commit)
+    writer.close()
+
+    patterns = Patterns(name)
+    # the loaded data is cached in a pickle under top_dir
+    patterns.top_dir = str(tmp_path)
+    assert patterns.fetch(cache=False, sqlite=str(tmp_path / ('%s.sqlite3' % name))) is True
+    patterns.annotate_metrics()
+    return patterns, commits
+
+def counts(patterns):
+    data = patterns.commit_data
+    return {(sha, path): (int(added), int(removed), int(locc))
+            for sha, path, added, removed, locc in zip(data['sha'], data['filepath'], data['locc+'], data['locc-'], data['locc'])}
+
+def test_patternsNumstat(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    makeTestRepo(str(tmp_path / 'numstat'))
+    patterns, commits = loadPatterns(tmp_path, 'numstat', numstat=True)
+    assert (patterns.commit_data['diff'] == '').all()
+    expected = {(commit.id, diff.newpath): (diff.added, diff.removed, diff.added + diff.removed)
+                for commit in commits for diff in commit.diffs}
+    assert counts(patterns) == expected
+    assert sum(locc for _, _, locc in expected.values()) > 0
+
+def test_patternsTruncated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    repo = makeTestRepo(str(tmp_path / 'truncated'))
+    # indented lines, so the lines kept in the body are counted too
+    commitFile(repo, 'long.py', ''.join('    x%d = %d\n' % (i, i) for i in range(100)), 'Add long', date='2023-02-05T14:00:00')
+    patterns, commits = loadPatterns(tmp_path, 'truncated', filelimit=200)
+    data = patterns.commit_data
+    assert data.loc[data['filepath'] == 'long.py', 'diff'].str.contains(Patterns.truncated_re).all()
+    ids = {commit.message.strip(): commit.id for commit in commits}
+    assert counts(patterns)[(ids['Add long'], 'long.py')] == (100, 0, 100)
+    # the bodies that were kept whole are still counted from their text
+    assert counts(patterns)[(ids['Add hello'], 'hello.py')][:2] != (0, 0)